@@ -1,13 +1,34 @@
 import openai
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from dateutil import parser
 import re
+import time
 import json
+import copy
+import functools
+import atexit
+import importlib.util
+import threading
+from collections import defaultdict
+from bisect import insort
+from cachetools import TTLCache
 from config import Config
 import calendar
-import pytz
+from zoneinfo import ZoneInfo
 import logging
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import orjson
+    _json_loads = orjson.loads  # orjson.JSONDecodeError は json.JSONDecodeError のサブクラス
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
 logger = logging.getLogger("ai_service")
 logger.setLevel(logging.INFO)
 if not logger.hasHandlers():
@@ -16,140 +37,464 @@ if not logger.hasHandlers():
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
+_JST = ZoneInfo('Asia/Tokyo')
+_JST_OFFSET = timedelta(hours=9)
+_WEEKDAYS = ('月', '火', '水', '木', '金', '土', '日')
+
+# _supplement_times などで使う正規表現（毎回のコンパイル・キャッシュ参照を避けるため事前にコンパイル）
+_RANGE_RE = re.compile(r'(\d{1,2})[\-〜~](\d{1,2})時')
+_AFTER_RE = re.compile(r'(\d{1,2})時以降')
+_TODAY_HOUR_RE = re.compile(r'今日(\d{1,2})時')
+_HONJITSU_HOUR_RE = re.compile(r'本日(\d{1,2})時')
+# 日付（M/D または D日）＋時間帯、または日付なしの時間帯（例：7/10 9:00-10:00、・7/10 9-10時、7/10 9時-10時、16日11:30-14:00、15:00-17:00）
+# 時は0〜23、分は「:」の後の2桁だけを認め、前後に数字や「-」が続くもの（電話番号や年の範囲など）は時間帯とみなさない
+_SLOT_RE = re.compile(
+    r'(?:(?<!\d)(?P<month>\d{1,2})/(?P<mday>\d{1,2})[\s　]*|(?<!\d)(?P<day>\d{1,2})日\s*)?'
+    r'(?<![\d\-:])(?P<sh>[01]?\d|2[0-3])(?::(?P<sm>[0-5]\d))?時?'
+    r'[\-〜~](?P<eh>[01]?\d|2[0-3])(?::(?P<em>[0-5]\d))?(?![\d\-:])'
+)
+_TODAY_TIME_RE = re.compile(r'(本日|今日)(\d{1,2})時')
+_HOUR_ONLY_RE = re.compile(r'^\d{1,2}時$')
+# _supplement_times の補完処理が必要になるキーワードと時間帯の区切り文字
+_SUPPLEMENT_KEYWORDS = ('明日', '今日', '本日', '来週', '移動')
+# date_range を日ごとに展開する最大日数
+_MAX_RANGE_DAYS = 31
+_RANGE_SEPARATORS = ('-', '〜', '~')
+# 移動キーワード（長いものから順に並べた選択パターン）
+_TRAVEL_RE = re.compile('|'.join(map(re.escape, ['移動あり', '移動時間', '移動必要', '移動'])))
+
+# extract_dates_and_times の静的なシステムプロンプト（プロンプトキャッシュ対象）
+# 出力のJSON構造は _DATES_RESPONSE_FORMAT のスキーマで渡すため、ここではルールと代表例だけを書く
+_DATES_SYSTEM_PROMPT = (
+    "あなたは予定とタスクを管理するAIです。ユーザーのテキストから日時を抽出し、JSONで返してください。\n"
+    "\n"
+    "ルール:\n"
+    "- 箇条書き・改行・スペース・句読点で区切られた日時や、1日に複数ある時間帯も、枠ごとに全て個別に抽出する\n"
+    "- 今日・明日・来週月曜日などは具体的な日付に変換する。月の指定がない「16日」は今月\n"
+    "- 「来週」など連続した期間の空き時間確認は、datesを空にしてdate_range（start・endに来週月曜日〜日曜日の日付）1件で返す\n"
+    "- 時刻は24時間表記のHH:MM（例：9-10時→09:00〜10:00、18時以降→18:00〜23:59、終日→00:00〜23:59、今日→現在時刻〜23:59、今日から1週間→今日〜7日後の23:59）\n"
+    "- 終了時刻がなければ開始の1時間後。時刻の指定がない場合（例：明日の空き時間）はtime・end_timeを空にする\n"
+    "- 終日枠は「終日」と明示された場合のみ、同じ日付に1件だけ。同じ日に部分枠があればその日の終日枠は出さない\n"
+    "- task_type: 日時のみ（予定の内容がない）はavailability_check、予定の内容がある（例：会議、田中さんとMTG）はadd_event\n"
+    "- add_eventではtitle（会議名など）とdescription（議題・「〜の件」「〜について」など）を抽出する\n"
+    "- 場所（例：東京）はlocation、移動時間（例：移動時間は1時間）は分単位でtravel_time_minutesに入れる\n"
+    "\n"
+    "例:\n"
+    "「7/8 18時以降」→ {\"task_type\":\"availability_check\",\"dates\":[{\"date\":\"2025-07-08\",\"time\":\"18:00\",\"end_time\":\"23:59\"}]}\n"
+    "「来週の空き時間」→ {\"task_type\":\"availability_check\",\"date_range\":{\"start\":\"2025-01-20\",\"end\":\"2025-01-26\",\"time\":\"08:00\",\"end_time\":\"23:59\"},\"dates\":[]}\n"
+    "「7/14 20時 田中さんMTG 新作アプリの件」→ {\"task_type\":\"add_event\",\"dates\":[{\"date\":\"2025-07-14\",\"time\":\"20:00\",\"end_time\":\"21:00\",\"title\":\"田中さんMTG\",\"description\":\"新作アプリの件\"}]}\n"
+    "「7/8 東京で空いてる？移動時間は1時間」→ {\"task_type\":\"availability_check\",\"location\":\"東京\",\"travel_time_minutes\":60,\"dates\":[{\"date\":\"2025-07-08\",\"time\":\"\",\"end_time\":\"\"}]}\n"
+)
+
+# extract_dates_and_times の応答スキーマ（strict=Falseのため省略可能な項目はそのまま省略できる）
+_DATES_RESULT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "task_type": {"type": "string", "enum": ["availability_check", "add_event"]},
+        "location": {"type": "string"},
+        "date_range": {
+            "type": "object",
+            "description": "連続した期間（例：来週）。日ごとの展開はアプリ側で行う",
+            "properties": {
+                "start": {"type": "string", "description": "YYYY-MM-DD"},
+                "end": {"type": "string", "description": "YYYY-MM-DD"},
+                "time": {"type": "string", "description": "HH:MM"},
+                "end_time": {"type": "string", "description": "HH:MM"},
+            },
+            "required": ["start", "end"],
+        },
+        "travel_time_minutes": {"type": "integer"},
+        "dates": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "date": {"type": "string", "description": "YYYY-MM-DD"},
+                    "time": {"type": "string", "description": "HH:MM"},
+                    "end_time": {"type": "string", "description": "HH:MM"},
+                    "title": {"type": "string"},
+                    "description": {"type": "string"},
+                },
+                "required": ["date"],
+            },
+        },
+    },
+    "required": ["task_type", "dates"],
+}
+
+_DATES_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "dates_extraction", "schema": _DATES_RESULT_SCHEMA, "strict": False},
+}
+
+# OpenAIクライアントで共有するHTTPクライアント（接続を使い回し、h2が入っていればHTTP/2で多重化する）
+_http_client = None
+
+def get_shared_http_client():
+    """AIService / AIServiceDebug で共有するhttpxクライアントを返します（httpxが無い環境ではNone＝OpenAIの既定）"""
+    global _http_client
+    if _http_client is None and httpx is not None:
+        _http_client = httpx.Client(
+            http2=importlib.util.find_spec('h2') is not None,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+        )
+        atexit.register(_http_client.close)
+    return _http_client
+
+def _now_prompt(now_jst):
+    """現在日時を伝えるシステムメッセージ（毎回変わる部分）"""
+    return (
+        f"現在の日時（日本時間）は {now_jst} です。  \n"
+        "この日時は、すべての自然言語の解釈において**常に絶対的な基準**としてください。  \n"
+        "会話の流れや前回の入力に引きずられることなく、**毎回この現在日時を最優先にしてください。**\n"
+    )
+
+# extract_event_info の静的なシステムプロンプト（現在日時は別メッセージで渡す）
+_EVENT_SYSTEM_PROMPT = (
+    "あなたは予定とタスクを管理するAIです。\n"
+    "\n"
+    "あなたはイベント情報抽出の専門家です。ユーザーのテキストからイベントのタイトルと日時を抽出し、以下のJSON形式で返してください。\n\n"
+    "抽出ルール:\n"
+    "1. イベントのタイトルは、直前の人名や主語、会議名なども含めて、できるだけ長く・具体的に抽出してください。\n"
+    "   例:『田中さんとMTG 新作アプリの件』→タイトル:『田中さんとMTG』、説明:『新作アプリの件』\n"
+    "2. 開始日時と終了日時を抽出（終了時間が明示されていない場合は1時間後をデフォルトとする）\n"
+    "3. 日本語の日付表現を具体的な日付に変換\n"
+    "4. 時間表現を24時間形式に変換\n"
+    "5. タイムゾーンは日本時間（JST）を想定\n"
+    "6. start_datetime・end_datetimeは必ずISO 8601形式（YYYY-MM-DDTHH:MM:SS）で出力\n\n"
+    "出力形式:\n"
+    "{\n  \"title\": \"イベントタイトル\",\n  \"start_datetime\": \"2024-01-15T09:00:00\",\n  \"end_datetime\": \"2024-01-15T10:00:00\",\n  \"description\": \"説明（オプション）\"\n}\n"
+    "\n"
+    "タイトルの例（「MTG」「会議」だけにせず、人名や主語を含める）:\n"
+    "入力「田中さんとMTG 新作アプリの件」→ {\"title\":\"田中さんとMTG\",\"description\":\"新作アプリの件\"}\n"
+    "入力「佐藤さん会議 来期予算について」→ {\"title\":\"佐藤さん会議\",\"description\":\"来期予算について\"}\n"
+    "入力「山田さんMTG」→ {\"title\":\"山田さんMTG\"}\n"
+)
+
+# check_multiple_dates_availability の静的なシステムプロンプト（現在日時は別メッセージで渡す）
+_AVAILABILITY_SYSTEM_PROMPT = (
+    "あなたは予定とタスクを管理するAIです。\n"
+    "\n"
+    "複数の日付の空き時間確認リクエストを処理してください。以下のJSON形式で返してください。\n\n"
+    "出力形式:\n"
+    "{\n  \"dates\": [\n    {\n      \"date\": \"2024-01-15\",\n      \"time_range\": \"09:00-18:00\"\n    }\n  ]\n}\n"
+)
+
+# _request_json で使う静的プロンプト
+_JSON_PROMPTS = {
+    'event': _EVENT_SYSTEM_PROMPT,
+    'availability': _AVAILABILITY_SYSTEM_PROMPT,
+}
+
+# 日時抽出結果のキャッシュ（同じ文言はJSTの同じ日のうち1時間まで再利用する。相対的な時刻表現を含む文言は分単位でしか再利用しない）
+EXTRACTION_CACHE_SIZE = 2000
+EXTRACTION_CACHE_TTL_SECONDS = 3600
+# 「今日」「本日」はシステムプロンプトで「現在時刻〜23:59」に変換されるため、「今」を含む文言とあわせて分単位のキーにする
+_RELATIVE_TIME_RE = re.compile(r'今|本日|分後|時間後|さっき|この後|このあと')
+
+_EXTRACT_ERROR_MESSAGE = "イベント情報を正しく認識できませんでした。\n\n・日時を打つと空き時間を返します\n・予定を打つとカレンダーに追加します\n\n例：\n『明日の午前9時から会議を追加して』\n『来週月曜日の14時から打ち合わせ』"
+
+@functools.lru_cache(maxsize=4)
+def _jst_str_for_minute(epoch_minute):
+    """UNIX分をJSTの "YYYY-MM-DDTHH:MM:00+0900" 文字列に変換（同じ分の呼び出しはキャッシュを返す）"""
+    return datetime.fromtimestamp(epoch_minute * 60, _JST).strftime('%Y-%m-%dT%H:%M:%S%z')
+
+
+def _to_jst(iso_str):
+    """ISO形式の日時をJSTのdatetimeに変換（既に+09:00ならそのまま、タイムゾーンなしはJSTとみなす）"""
+    dt = datetime.fromisoformat(iso_str)
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=_JST)
+    if dt.utcoffset() != _JST_OFFSET:
+        return dt.astimezone(_JST)
+    return dt
+
+
+def _fmt_event_range(start_iso, end_iso, with_weekday=False):
+    """開始・終了のISO文字列をJSTの (日付, 時間帯) 文字列に変換（M/D（曜）HH:MM〜HH:MM または MM/DD HH:MM - HH:MM）"""
+    start_dt = _to_jst(start_iso)
+    end_dt = _to_jst(end_iso)
+    if with_weekday:
+        return f"{start_dt.month}/{start_dt.day}（{_WEEKDAYS[start_dt.weekday()]}）", f"{start_dt:%H:%M}〜{end_dt:%H:%M}"
+    return f"{start_dt.month:02d}/{start_dt.day:02d}", f"{start_dt:%H:%M} - {end_dt:%H:%M}"
+
+
+def _plus_one_hour(hm):
+    """"HH:MM" の1時間後を "HH:MM" で返す（23時台は0時台に折り返す）"""
+    h, m = hm.split(':')
+    h, m = int(h), int(m)
+    if not (0 <= h < 24 and 0 <= m < 60):
+        raise ValueError(f"不正な時刻です: {hm}")
+    return f"{(h + 1) % 24:02d}:{m:02d}"
+
+
+def _resolve_month_day(month, day, today):
+    """M/D を日付文字列に変換（過去の日付は来年として扱う）。不正な日付はNone"""
+    try:
+        date(today.year, month, day)  # 2/30 などの不正な日付を弾く
+        if (month, day) < (today.month, today.day):
+            return date(today.year + 1, month, day).isoformat()
+    except ValueError:
+        return None
+    return f"{today.year:04d}-{month:02d}-{day:02d}"
+
+def _resolve_day(day, today):
+    """月の指定がない D日 を日付文字列に変換（過去の日付は来月として扱う）。不正な日付はNone"""
+    try:
+        date(today.year, today.month, day)
+        if day < today.day:
+            if today.month == 12:
+                return date(today.year + 1, 1, day).isoformat()
+            return date(today.year, today.month + 1, day).isoformat()
+    except ValueError:
+        return None
+    return f"{today.year:04d}-{today.month:02d}-{day:02d}"
+
+class _JsonStreamCollector:
+    """ストリーミング応答のチャンクを溜め、最初のJSONオブジェクトが閉じたら完了とする"""
+    
+    def __init__(self):
+        self.buf = []
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, chunk):
+        """チャンクを追加し、JSONオブジェクトが閉じていればTrueを返します"""
+        if not chunk.choices:
+            return False
+        content = chunk.choices[0].delta.content or ''
+        # 文字列中の括弧は数えずに { } の深さを追跡する
+        for i, ch in enumerate(content):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = self.started
+            elif ch == '{':
+                self.depth += 1
+                self.started = True
+            elif ch == '}' and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    content = content[:i + 1]
+                    break
+        self.buf.append(content)
+        return self.started and self.depth == 0
+    
+    def text(self):
+        return ''.join(self.buf)
+
+
 class AIService:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=Config.OPENAI_API_KEY)
+        self.client = openai.OpenAI(api_key=Config.OPENAI_API_KEY, http_client=get_shared_http_client())
+        self._extraction_cache = TTLCache(maxsize=EXTRACTION_CACHE_SIZE, ttl=EXTRACTION_CACHE_TTL_SECONDS)
+        self._extraction_cache_lock = threading.Lock()
+        self._extraction_stats = {'hits': 0, 'misses': 0}
+        self._cached_json_request = functools.lru_cache(maxsize=512)(self._request_json)
+        # 1回のWebhookでOpenAIを何度も呼んでいないか確認するためのスレッドごとのカウンタ
+        self._api_calls = threading.local()
     
-    def _get_jst_now_str(self):
-        now = datetime.now(pytz.timezone('Asia/Tokyo'))
-        return now.strftime('%Y-%m-%dT%H:%M:%S%z')
+    def _get_jst_now_str(self, minute_bucket=None):
+        # 分単位に丸めて、同じ分の連続したリクエストでプロンプトの先頭が一致するようにする
+        if minute_bucket is None:
+            minute_bucket = int(time.time()) // 60
+        return _jst_str_for_minute(minute_bucket)
+    
+    def reset_api_call_count(self):
+        """このスレッドでのOpenAI呼び出し回数を0に戻します（Webhook処理の開始時に呼ぶ）"""
+        self._api_calls.count = 0
+    
+    def api_call_count(self):
+        """reset_api_call_count 以降にこのスレッドで行ったOpenAI呼び出し回数"""
+        return getattr(self._api_calls, 'count', 0)
+    
+    def _count_api_call(self):
+        self._api_calls.count = self.api_call_count() + 1
+    
+    def cache_info(self):
+        """AI応答キャッシュのヒット状況を返します（監視用）"""
+        return {
+            'dates': {
+                **self._extraction_stats,
+                'maxsize': self._extraction_cache.maxsize,
+                'currsize': self._extraction_cache.currsize,
+            },
+            'json': self._cached_json_request.cache_info()._asdict(),
+        }
     
     def extract_dates_and_times(self, text):
         """テキストから日時を抽出し、タスクの種類を判定します"""
         try:
-            now_jst = self._get_jst_now_str()
-            system_prompt = (
-                f"あなたは予定とタスクを管理するAIです。\n"
-                f"現在の日時（日本時間）は {now_jst} です。  \n"
-                "【最重要】ユーザーの入力が箇条書き・改行・スペース・句読点で区切られている場合も、全ての時間帯・枠を必ず個別に抽出してください。\n"
-                "この日時は、すべての自然言語の解釈において**常に絶対的な基準**としてください。  \n"
-                "会話の流れや前回の入力に引きずられることなく、**毎回この現在日時を最優先にしてください。**\n"
-                "\n"
-                "あなたは日時抽出とタスク管理の専門家です。ユーザーのテキストを分析して、以下のJSON形式で返してください。\n\n"
-                "分析ルール:\n"
-                "1. 複数の日時がある場合は全て抽出\n"
-                "2. 日本語の日付表現（今日、明日、来週月曜日など）を具体的な日付に変換\n"
-                "3. **「来週」という表現は必ず1週間分（7日間）の日付として抽出してください**\n"
-                "   - 例：「来週」→ 来週月曜日から日曜日までの7日間\n"
-                "   - 例：「来週の空き時間」→ 来週月曜日〜日曜日の7日間の空き時間\n"
-                "4. 月が指定されていない場合（例：16日、17日）は今月として認識\n"
-                "5. 時間表現（午前9時、14時30分、9-10時、9時-10時、9:00-10:00など）を24時間形式に変換\n"
-                "6. **タスクの種類を判定（最重要）**:\n   - 日時のみ（タイトルや内容がない）場合は必ず「availability_check」（空き時間確認）\n   - 日時+タイトル/予定内容がある場合は「add_event」（予定追加）\n   - 例：「7/8 18時以降」→ availability_check（日時のみ）\n   - 例：「7/10 18:00〜20:00」→ availability_check（日時のみ）\n   - 例：「・7/10 9-10時\n・7/11 9-10時」→ availability_check（日時のみ複数）\n   - 例：「7/10 9-10時」→ availability_check（9:00〜10:00として抽出）\n   - 例：「7/10 9時-10時」→ availability_check（9:00〜10:00として抽出）\n   - 例：「7/10 9:00-10:00」→ availability_check（9:00〜10:00として抽出）\n   - 例：「7月18日 11:00-14:00,15:00-17:00」→ availability_check（日時のみ複数）\n   - 例：「7月20日 13:00-0:00」→ availability_check（日時のみ）\n   - 例：「明日の午前9時から会議を追加して」→ add_event（日時+予定内容）\n   - 例：「来週月曜日の14時から打ち合わせ」→ add_event（日時+予定内容）\n   - 例：「田中さんとMTG」→ add_event（予定内容あり）\n   - 例：「会議を追加」→ add_event（予定内容あり）\n"
-                "7. 自然言語の時間表現は必ず具体的な時刻範囲・日付範囲に変換してください。\n"
-                "   例：'18時以降'→'18:00〜23:59'、'終日'→'00:00〜23:59'、'今日'→'現在時刻〜23:59'、'今日から1週間'→'今日〜7日後の23:59'。\n"
-                "   終了時間が指定されていない場合は1時間の予定として認識してください（例：'10時'→'10:00〜11:00'）。\n"
-                "   **重要：時間が明示的に指定されていない場合（例：「明日の空き時間」「来週の空き時間」など）、timeとend_timeは空欄（nullまたは空文字）にしてください。**\n"
-                "   時間が指定されていない場合は、後続処理で8:00〜23:59がデフォルトとして適用されます。\n"
-                "8. 箇条書き（・や-）、改行、スペース、句読点で区切られている場合も、すべての日時・時間帯を抽出してください。\n"
-                "   例：'・7/10 9-10時\n・7/11 9-10時' → 2件の予定として抽出\n"
-                "   例：'7/11 15:00〜16:00 18:00〜19:00' → 2件の予定として抽出\n"
-                "   例：'7/12 終日' → 1件の終日予定として抽出\n"
-                "9. 同じ日付の終日予定は1件だけ抽出してください。\n"
-                "10. 予定タイトル（description）も必ず抽出してください。\n"
-                "11. \"終日\"や\"00:00〜23:59\"の終日枠は、ユーザーが明示的に\"終日\"と書いた場合のみ抽出してください。\n"
-                "12. 1つの日付に複数の時間帯（枠）が指定されている場合は、必ずその枠ごとに抽出してください。\n"
-                "13. 同じ日に部分枠（例: 15:00〜16:00, 18:00〜19:00）がある場合は、その日付の終日枠（00:00〜23:59）は抽出しないでください。\n"
-                "14. 複数の日時・時間帯が入力される場合、全ての時間帯をリストにし、それぞれに対して開始時刻・終了時刻をISO形式（例: 2025-07-11T15:00:00+09:00）で出力してください。\n"
-                "15. 予定タイトル（会議名や打合せ名など）と、説明（議題や詳細、目的など）があれば両方抽出してください。\n"
-                "16. 説明はタイトル以降の文や\"の件\"\"について\"などを優先して抽出してください。\n"
-                "17. **日時のみの入力の場合は必ずavailability_checkとして判定してください。予定の内容や目的が明確に示されていない場合は空き時間確認として扱ってください。**\n"
-                "18. **場所情報（例：東京、大阪など）が入力されている場合は、locationフィールドに抽出してください。**\n"
-                "    - 例：「来月の東京での空き時間を教えて」→ location: '東京'\n"
-                "    - 例：「11月の大阪の空き時間」→ location: '大阪'\n"
-                "19. **移動時間（例：移動時間は1時間、移動に1時間かかる）が入力されている場合は、travel_time_minutesフィールドに抽出してください。**\n"
-                "    - 例：「11月の空き時間を教えて。移動時間は1時間。」→ travel_time_minutes: 60\n"
-                "    - 例：「移動時間30分かかります」→ travel_time_minutes: 30\n"
-                "\n"
-                "【出力例】\n"
-                "空き時間確認の場合:\n"
-                "{\n  \"task_type\": \"availability_check\",\n  \"dates\": [\n    {\n      \"date\": \"2025-07-08\",\n      \"time\": \"18:00\",\n      \"end_time\": \"23:59\"\n    }\n  ]\n}\n"
-                "\n"
-                "移動時間指定の空き時間確認の場合:\n"
-                "{\n  \"task_type\": \"availability_check\",\n  \"travel_time_minutes\": 60,\n  \"dates\": [\n    {\n      \"date\": \"2025-07-08\",\n      \"time\": \"08:00\",\n      \"end_time\": \"23:59\"\n    }\n  ]\n}\n"
-                "\n"
-                "来週の空き時間確認の場合:\n"
-                "{\n  \"task_type\": \"availability_check\",\n  \"dates\": [\n    {\n      \"date\": \"2025-01-20\",\n      \"time\": \"08:00\",\n      \"end_time\": \"23:59\"\n    },\n    {\n      \"date\": \"2025-01-21\",\n      \"time\": \"08:00\",\n      \"end_time\": \"23:59\"\n    },\n    {\n      \"date\": \"2025-01-22\",\n      \"time\": \"08:00\",\n      \"end_time\": \"23:59\"\n    },\n    {\n      \"date\": \"2025-01-23\",\n      \"time\": \"08:00\",\n      \"end_time\": \"23:59\"\n    },\n    {\n      \"date\": \"2025-01-24\",\n      \"time\": \"08:00\",\n      \"end_time\": \"23:59\"\n    },\n    {\n      \"date\": \"2025-01-25\",\n      \"time\": \"08:00\",\n      \"end_time\": \"23:59\"\n    },\n    {\n      \"date\": \"2025-01-26\",\n      \"time\": \"08:00\",\n      \"end_time\": \"23:59\"\n    }\n  ]\n}\n"
-                "\n"
-                "場所指定の空き時間確認の場合:\n"
-                "{\n  \"task_type\": \"availability_check\",\n  \"location\": \"東京\",\n  \"dates\": [\n    {\n      \"date\": \"2025-01-20\",\n      \"time\": \"08:00\",\n      \"end_time\": \"23:59\"\n    }\n  ]\n}\n"
-                "\n"
-                "予定追加の場合:\n"
-                "{\n  \"task_type\": \"add_event\",\n  \"dates\": [\n    {\n      \"date\": \"2025-07-14\",\n      \"time\": \"20:00\",\n      \"end_time\": \"21:00\",\n      \"title\": \"田中さんMTG\",\n      \"description\": \"新作アプリの件\"\n    }\n  ]\n}\n"
-            )
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": text
-                    }
-                ],
-                temperature=0.1
-            )
-            result = response.choices[0].message.content
-            logger.info(f"[DEBUG] AI生レスポンス: {result}")
-            parsed = self._parse_ai_response(result)
-            
-            # AIの判定結果を強制的に修正
-            if parsed and isinstance(parsed, dict) and 'dates' in parsed:
-                # 日時のみの場合は強制的にavailability_checkに変更
-                has_title_or_description = False
-                for date_info in parsed.get('dates', []):
-                    if date_info.get('title') or date_info.get('description'):
-                        has_title_or_description = True
-                        break
-                
-                if not has_title_or_description:
-                    logger.info(f"[DEBUG] 日時のみのため、task_typeをavailability_checkに強制変更")
-                    parsed['task_type'] = 'availability_check'
-            
-            return self._supplement_times(parsed, text)
+            # 同じ文言はAIの解析結果を再利用（補完処理で書き換えるためコピーして使う）
+            minute_bucket = int(time.time()) // 60
+            parsed = copy.deepcopy(self._cached_extraction(text.strip(), minute_bucket))
+            return self._finalize_dates_result(parsed, text)
             
         except Exception as e:
-            return {"error": "イベント情報を正しく認識できませんでした。\n\n・日時を打つと空き時間を返します\n・予定を打つとカレンダーに追加します\n\n例：\n『明日の午前9時から会議を追加して』\n『来週月曜日の14時から打ち合わせ』"}
+            return {"error": _EXTRACT_ERROR_MESSAGE}
+    
+    def _cached_extraction(self, text, minute_bucket):
+        """日時抽出結果をキャッシュから返し、なければAIに依頼します
+        「明日」「来週」などは日付が変わらなければ同じ結果になるため、キーはJSTの日付（相対的な時刻表現を含む文言だけ分）にする"""
+        if _RELATIVE_TIME_RE.search(text):
+            key = (text, 'minute', minute_bucket)
+        else:
+            # UNIX分にJSTの9時間分を足して1日の分数で割るとJSTの日付（通算日）になる
+            key = (text, 'day', (minute_bucket + 9 * 60) // (24 * 60))
+        with self._extraction_cache_lock:
+            parsed = self._extraction_cache.get(key)
+            self._extraction_stats['hits' if parsed is not None else 'misses'] += 1
+        if parsed is None:
+            parsed = self._request_dates_extraction(text, minute_bucket)
+            with self._extraction_cache_lock:
+                self._extraction_cache[key] = parsed
+        return parsed
+    
+    def _request_dates_extraction(self, text, minute_bucket):
+        """AIに日時抽出を依頼し、パース結果を返します（minute_bucketはプロンプトの現在日時とキャッシュキーに使う）"""
+        self._count_api_call()
+        response = self.client.chat.completions.create(**self._dates_request_kwargs(text, minute_bucket))
+        result = self._read_stream_until_json(response)
+        return self._parse_dates_result(result)
+    
+    def _dates_request_kwargs(self, text, minute_bucket=None):
+        """日時抽出リクエストの引数を組み立てます"""
+        # 静的な指示を先頭に固定し、現在日時は別メッセージにしてOpenAIのプロンプトキャッシュを効かせる
+        messages = [
+            {
+                "role": "system",
+                "content": _DATES_SYSTEM_PROMPT
+            },
+            {
+                "role": "system",
+                "content": _now_prompt(self._get_jst_now_str(minute_bucket))
+            },
+            {
+                "role": "user",
+                "content": text
+            }
+        ]
+        return dict(
+            model=Config.OPENAI_MODEL,
+            messages=messages,
+            temperature=0.1,
+            max_tokens=Config.OPENAI_MAX_TOKENS,
+            response_format=_DATES_RESPONSE_FORMAT,
+            stream=True
+        )
+    
+    def _parse_dates_result(self, result):
+        """AIの生レスポンスをパースし、失敗時はValueErrorを送出します"""
+        logger.debug("AI生レスポンス: %s", result)
+        parsed = self._parse_ai_response(result)
+        if not isinstance(parsed, dict) or 'error' in parsed:
+            # パース失敗はキャッシュしない
+            raise ValueError(f"AI応答を解析できませんでした: {parsed}")
+        return parsed
+    
+    def _finalize_dates_result(self, parsed, text):
+        """AIの解析結果にtask_typeの補正と時間補完を適用します"""
+        self._expand_date_range(parsed)
+        # AIの判定結果を強制的に修正
+        if parsed and isinstance(parsed, dict) and 'dates' in parsed:
+            # 日時のみの場合は強制的にavailability_checkに変更
+            has_title_or_description = False
+            for date_info in parsed.get('dates', []):
+                if date_info.get('title') or date_info.get('description'):
+                    has_title_or_description = True
+                    break
+            
+            if not has_title_or_description:
+                logger.debug("日時のみのため、task_typeをavailability_checkに強制変更")
+                parsed['task_type'] = 'availability_check'
+        
+        return self._supplement_times(parsed, text)
+    
+    def _expand_date_range(self, parsed):
+        """date_range（例：来週）を日ごとのdatesに展開します（AIには1件で返させて出力トークンを抑える）"""
+        if not isinstance(parsed, dict):
+            return
+        date_range = parsed.pop('date_range', None)
+        if not isinstance(date_range, dict):
+            return
+        try:
+            start = date.fromisoformat(date_range['start'])
+            end = date.fromisoformat(date_range['end'])
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"date_rangeを解釈できませんでした: {date_range}")
+            return
+        days = min((end - start).days, _MAX_RANGE_DAYS - 1)
+        dates = parsed.setdefault('dates', [])
+        existing_dates = {d.get('date') for d in dates}
+        for i in range(days + 1):
+            date_str = (start + timedelta(days=i)).strftime('%Y-%m-%d')
+            if date_str not in existing_dates:
+                dates.append({
+                    'date': date_str,
+                    'time': date_range.get('time') or '08:00',
+                    'end_time': date_range.get('end_time') or '23:59'
+                })
+    
+    def _read_stream_until_json(self, stream):
+        """ストリーミング応答を受信し、JSONオブジェクトが閉じた時点で打ち切って返します"""
+        collector = _JsonStreamCollector()
+        for chunk in stream:
+            if collector.feed(chunk):
+                close = getattr(stream, 'close', None)
+                if close:
+                    close()
+                break
+        return collector.text()
     
     def _parse_ai_response(self, response):
-        """AIの応答をパースします"""
+        """AIの応答をパースします（通常は応答全体がJSON。前後に文章が付いた場合は最初の{〜最後の}を使う）"""
+        text = response.strip()
         try:
-            # JSON部分を抽出
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-            else:
-                return {"error": "AI応答のパースに失敗しました"}
-        except Exception as e:
-            return {"error": f"JSONパースエラー: {str(e)}"}
+            return _json_loads(text)
+        except json.JSONDecodeError:
+            pass
+        i, j = text.find('{'), text.rfind('}')
+        if i >= 0 and j > i:
+            try:
+                return _json_loads(text[i:j + 1])
+            except json.JSONDecodeError as e:
+                return {"error": f"JSONパースエラー: {e}"}
+        return {"error": "AI応答のパースに失敗しました"}
     
     def _supplement_times(self, parsed, original_text):
-        from datetime import datetime, timedelta
-        import re
-        jst = pytz.timezone('Asia/Tokyo')
-        now = datetime.now(jst)
-        logger = logging.getLogger("ai_service")
-        print(f"[DEBUG] _supplement_times開始: parsed={parsed}")
-        print(f"[DEBUG] 元テキスト: {original_text}")
+        now = datetime.now(_JST)
+        # 日付・時刻の文字列は1回だけ計算して使い回す
+        today_str = now.strftime('%Y-%m-%d')
+        tomorrow_str = (now + timedelta(days=1)).strftime('%Y-%m-%d')
+        now_hm = now.strftime('%H:%M')
+        logger.debug("_supplement_times開始: parsed=%s", parsed)
+        logger.debug("元テキスト: %s", original_text)
         if not parsed or 'dates' not in parsed:
-            print(f"[DEBUG] datesが存在しない: {parsed}")
+            logger.debug("datesが存在しない: %s", parsed)
+            return parsed
+        # AIが全項目を埋めていて、補完・追加の対象になる表現が無ければそのまま返す
+        # （正規表現での枠追加は範囲の区切り文字がある場合しかマッチしない）
+        if (all(d.get('time') and d.get('end_time')
+                and (parsed.get('task_type') == 'availability_check' or d.get('title'))
+                for d in parsed['dates'])
+                and not any(kw in original_text for kw in _SUPPLEMENT_KEYWORDS)
+                and not any(sep in original_text for sep in _RANGE_SEPARATORS)):
+            logger.debug("AI抽出が完全なため補完をスキップ")
             return parsed
         allday_dates = set()
         new_dates = []
+        next_week_added = False
         # 1. AI抽出を最優先。time, end_timeが空欄のものだけ補完
         for d in parsed['dates']:
-            print(f"[DEBUG] datesループ: {d}")
+            logger.debug("datesループ: %s", d)
             phrase = d.get('description', '') or original_text
             # time, end_timeが両方セットされていれば何もしない
             if d.get('time') and d.get('end_time'):
@@ -157,125 +502,111 @@ class AIService:
                 continue
             # time, end_timeが空欄の場合のみ補完
             # 範囲表現
-            range_match = re.search(r'(\d{1,2})[\-〜~](\d{1,2})時', phrase)
+            range_match = _RANGE_RE.search(phrase)
             if range_match:
                 d['time'] = f"{int(range_match.group(1)):02d}:00"
                 d['end_time'] = f"{int(range_match.group(2)):02d}:00"
             # 18時以降
-            if (not d.get('time') or not d.get('end_time')) and re.search(r'(\d{1,2})時以降', phrase):
-                m = re.search(r'(\d{1,2})時以降', phrase)
+            if not d.get('time') or not d.get('end_time'):
+                m = _AFTER_RE.search(phrase)
                 if m:
                     d['time'] = f"{int(m.group(1)):02d}:00"
                     d['end_time'] = '23:59'
             # 終日
-            if (not d.get('time') and not d.get('end_time')) or re.search(r'終日', phrase):
+            if (not d.get('time') and not d.get('end_time')) or '終日' in phrase:
                 d['time'] = '00:00'
                 d['end_time'] = '23:59'
                 if d.get('date') in allday_dates:
-                    print(f"[DEBUG] 同じ日付の終日予定はスキップ: {d.get('date')}")
+                    logger.debug("同じ日付の終日予定はスキップ: %s", d.get('date'))
                     continue
                 allday_dates.add(d.get('date'))
             # 明日
-            if re.search(r'明日', phrase):
-                d['date'] = (now + timedelta(days=1)).strftime('%Y-%m-%d')
+            if '明日' in phrase:
+                d['date'] = tomorrow_str
                 if not d.get('time'):
                     d['time'] = '08:00'
                 if not d.get('end_time'):
                     d['end_time'] = '23:59'
             # 今日
-            if re.search(r'今日', phrase):
-                d['date'] = now.strftime('%Y-%m-%d')
+            if '今日' in phrase:
+                d['date'] = today_str
                 # 今日X時の形式を処理
-                time_match = re.search(r'今日(\d{1,2})時', phrase)
+                time_match = _TODAY_HOUR_RE.search(phrase)
                 if time_match:
                     hour = int(time_match.group(1))
                     d['time'] = f"{hour:02d}:00"
                     d['end_time'] = f"{hour+1:02d}:00"
                 elif not d.get('time'):
-                    d['time'] = now.strftime('%H:%M')
+                    d['time'] = now_hm
                 # 今日の場合は終了時間を1時間後に強制設定（AIの設定を上書き）
                 if d.get('time'):
-                    from datetime import datetime, timedelta
-                    time_obj = datetime.strptime(d.get('time'), "%H:%M")
-                    end_time_obj = time_obj + timedelta(hours=1)
-                    d['end_time'] = end_time_obj.strftime('%H:%M')
-                    print(f"[DEBUG] 今日の終了時間を1時間後に強制設定: {d.get('time')} -> {d['end_time']}")
+                    d['end_time'] = _plus_one_hour(d['time'])
+                    logger.debug("今日の終了時間を1時間後に強制設定: %s -> %s", d.get('time'), d['end_time'])
             # 本日
-            if re.search(r'本日', phrase):
-                d['date'] = now.strftime('%Y-%m-%d')
+            if '本日' in phrase:
+                d['date'] = today_str
                 # 本日X時の形式を処理
-                time_match = re.search(r'本日(\d{1,2})時', phrase)
+                time_match = _HONJITSU_HOUR_RE.search(phrase)
                 if time_match:
                     hour = int(time_match.group(1))
                     d['time'] = f"{hour:02d}:00"
                     d['end_time'] = f"{hour+1:02d}:00"
-                    print(f"[DEBUG] 本日X時の処理: {hour}時 -> {hour+1}時")
+                    logger.debug("本日X時の処理: %s時 -> %s時", hour, hour+1)
                 elif not d.get('time'):
-                    d['time'] = now.strftime('%H:%M')
+                    d['time'] = now_hm
                 # 本日の場合は終了時間を1時間後に強制設定（AIの設定を上書き）
                 if d.get('time'):
-                    from datetime import datetime, timedelta
-                    time_obj = datetime.strptime(d.get('time'), "%H:%M")
-                    end_time_obj = time_obj + timedelta(hours=1)
-                    d['end_time'] = end_time_obj.strftime('%H:%M')
-                    print(f"[DEBUG] 本日の終了時間を1時間後に強制設定: {d.get('time')} -> {d['end_time']}")
+                    d['end_time'] = _plus_one_hour(d['time'])
+                    logger.debug("本日の終了時間を1時間後に強制設定: %s -> %s", d.get('time'), d['end_time'])
             # 来週
-            if re.search(r'来週', phrase):
-                # 来週の月曜日を計算
-                days_until_next_monday = (7 - now.weekday()) % 7
-                if days_until_next_monday == 0:  # 今日が月曜日の場合
-                    days_until_next_monday = 7
-                next_monday = now + timedelta(days=days_until_next_monday)
-                
-                # 来週の7日間を生成
-                week_dates = []
-                for i in range(7):
-                    week_date = next_monday + timedelta(days=i)
-                    week_dates.append(week_date.strftime('%Y-%m-%d'))
-                
-                # 来週の各日付に対して空き時間確認のエントリを作成
-                for week_date in week_dates:
-                    week_entry = {
-                        'date': week_date,
-                        'time': '08:00',
-                        'end_time': '23:59'
-                    }
-                    if not any(existing.get('date') == week_date for existing in new_dates):
-                        new_dates.append(week_entry)
-                        print(f"[DEBUG] 来週の日付を追加: {week_date}")
+            if '来週' in phrase:
+                # 来週の7日間は1回展開すれば全日付がnew_datesに入るため、2件目以降は何もしない
+                if not next_week_added:
+                    # 来週の月曜日を計算
+                    days_until_next_monday = (7 - now.weekday()) % 7
+                    if days_until_next_monday == 0:  # 今日が月曜日の場合
+                        days_until_next_monday = 7
+                    next_monday = now + timedelta(days=days_until_next_monday)
+                    
+                    # 来週の各日付に対して空き時間確認のエントリを作成（既にある日付は除く）
+                    existing_dates = {existing.get('date') for existing in new_dates}
+                    week_dates = [(next_monday + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
+                    new_dates.extend(
+                        {'date': week_date, 'time': '08:00', 'end_time': '23:59'}
+                        for week_date in week_dates if week_date not in existing_dates
+                    )
+                    logger.debug("来週の日付を追加: %s", week_dates)
+                    next_week_added = True
                 
                 # 元のエントリは削除（来週の処理で置き換え）
                 continue
             # 今日から1週間
-            if re.search(r'今日から1週間', phrase):
-                d['date'] = now.strftime('%Y-%m-%d')
+            if '今日から1週間' in phrase:
+                d['date'] = today_str
                 d['end_date'] = (now + timedelta(days=6)).strftime('%Y-%m-%d')
                 d['time'] = '00:00'
                 d['end_time'] = '23:59'
             # end_timeが空
             if d.get('time') and not d.get('end_time'):
                 # 終了時間が設定されていない場合は1時間後に設定
-                from datetime import datetime, timedelta
-                time_obj = datetime.strptime(d.get('time'), "%H:%M")
-                end_time_obj = time_obj + timedelta(hours=1)
-                d['end_time'] = end_time_obj.strftime('%H:%M')
+                d['end_time'] = _plus_one_hour(d['time'])
             # 空き時間確認で時間が指定されていない場合、デフォルトで8:00〜23:59を設定
             if parsed.get('task_type') == 'availability_check':
                 # 抽出された時間が現在時刻に近い場合（明示的な指定ではないと判断）、デフォルトを適用
                 if d.get('time'):
                     try:
-                        from datetime import datetime
-                        extracted_time = datetime.strptime(d.get('time'), "%H:%M").time()
+                        # "HH:MM" を分数の整数にして比較（strptimeやtimeオブジェクトを経由しない）
+                        extracted_hour, extracted_minute = map(int, d.get('time').split(':'))
                         current_time = now.time()
                         # 現在時刻との差を計算（分単位）
-                        time_diff = abs((extracted_time.hour * 60 + extracted_time.minute) - (current_time.hour * 60 + current_time.minute))
+                        time_diff = abs((extracted_hour * 60 + extracted_minute) - (current_time.hour * 60 + current_time.minute))
                         # 30分以内の差の場合は、明示的な指定ではないと判断してデフォルトを適用
                         if time_diff <= 30:
-                            print(f"[DEBUG] 抽出された時間({d.get('time')})が現在時刻({current_time.strftime('%H:%M')})に近いため、デフォルトを適用")
+                            logger.debug("抽出された時間(%s)が現在時刻(%s)に近いため、デフォルトを適用", d.get('time'), current_time.strftime('%H:%M'))
                             d['time'] = '08:00'
                             d['end_time'] = '23:59'
                     except Exception as e:
-                        print(f"[DEBUG] 時間比較エラー: {e}")
+                        logger.debug("時間比較エラー: %s", e)
                 
                 if not d.get('time') or not d.get('end_time'):
                     # 終日（00:00〜23:59）の場合はそのまま
@@ -287,7 +618,7 @@ class AIService:
                             d['time'] = '08:00'
                         if not d.get('end_time'):
                             d['end_time'] = '23:59'
-                        print(f"[DEBUG] 時間未指定のためデフォルト設定: {d.get('time')}〜{d.get('end_time')}")
+                        logger.debug("時間未指定のためデフォルト設定: %s〜%s", d.get('time'), d.get('end_time'))
             # title補完
             if not d.get('title') or d['title'] == '':
                 if d.get('description'):
@@ -297,24 +628,42 @@ class AIService:
                     e = d.get('end_time', '')
                     d['title'] = f"予定（{d.get('date', '')} {t}〜{e}）"
             new_dates.append(d)
-        print(f"[DEBUG] new_dates(AI+補完): {new_dates}")
+        logger.debug("new_dates(AI+補完): %s", new_dates)
+        # 重複チェック用の (date, time, end_time) 集合
+        seen = {(d.get('date'), d.get('time'), d.get('end_time')) for d in new_dates}
         # 2. 正規表現で漏れた枠を「追加」する（AI抽出に無い場合のみ）
-        pattern1 = r'(\d{1,2})/(\d{1,2})[\s　]*([0-9]{1,2}):?([0-9]{0,2})[\-〜~]([0-9]{1,2}):?([0-9]{0,2})'
-        matches1 = re.findall(pattern1, original_text)
-        print(f"[DEBUG] pattern1マッチ: {matches1}")
-        for m in matches1:
-            month, day, sh, sm, eh, em = m
-            year = now.year
-            try:
-                dt = datetime(year, int(month), int(day))
-                if dt < now:
-                    dt = datetime(year+1, int(month), int(day))
-            except Exception:
+        # 「7/10 9:00-10:00」「16日11:30-14:00/15:00-17:00」「16日 9-10 13-14」などを1回の走査で処理する。
+        # 日付の付かない時間帯は、同じ行で直前に出てきた日付のものとして扱う。
+        today = now.date()
+        # 同じ (月, 日) が複数のパターンで何度も出てくるため、日付文字列への変換結果をこの呼び出し内でメモ化する
+        date_cache = {}
+        def resolve(month, day):
+            key = (month, day)
+            if key not in date_cache:
+                if month is None:
+                    date_cache[key] = _resolve_day(day, today)
+                else:
+                    date_cache[key] = _resolve_month_day(month, day, today)
+            return date_cache[key]
+        line_date = None
+        prev_end = 0
+        for m in _SLOT_RE.finditer(original_text):
+            if '\n' in original_text[prev_end:m.start()]:
+                line_date = None
+            prev_end = m.end()
+            if m.group('month'):
+                line_date = resolve(int(m.group('month')), int(m.group('mday')))
+            elif m.group('day'):
+                line_date = resolve(None, int(m.group('day')))
+            if not line_date:
                 continue
-            date_str = dt.strftime('%Y-%m-%d')
+            date_str = line_date
+            sh, sm, eh, em = m.group('sh', 'sm', 'eh', 'em')
             start_time = f"{int(sh):02d}:{sm if sm else '00'}"
             end_time = f"{int(eh):02d}:{em if em else '00'}"
-            if not any(d.get('date') == date_str and d.get('time') == start_time and d.get('end_time') == end_time for d in new_dates):
+            key = (date_str, start_time, end_time)
+            if key not in seen:
+                seen.add(key)
                 new_date_entry = {
                     'date': date_str,
                     'time': start_time,
@@ -324,201 +673,14 @@ class AIService:
                 if parsed.get('task_type') == 'add_event':
                     new_date_entry['title'] = f"予定（{date_str} {start_time}〜{end_time}）"
                 new_dates.append(new_date_entry)
-                print(f"[DEBUG] pattern1で追加: {new_date_entry}")
-        pattern2 = r'[・\-]\s*(\d{1,2})/(\d{1,2})\s*([0-9]{1,2})-([0-9]{1,2})時'
-        matches2 = re.findall(pattern2, original_text)
-        print(f"[DEBUG] pattern2マッチ: {matches2}")
-        for m in matches2:
-            month, day, sh, eh = m
-            year = now.year
-            try:
-                dt = datetime(year, int(month), int(day))
-                if dt < now:
-                    dt = datetime(year+1, int(month), int(day))
-            except Exception:
-                continue
-            date_str = dt.strftime('%Y-%m-%d')
-            start_time = f"{int(sh):02d}:00"
-            end_time = f"{int(eh):02d}:00"
-            if not any(d.get('date') == date_str and d.get('time') == start_time and d.get('end_time') == end_time for d in new_dates):
-                new_date_entry = {
-                    'date': date_str,
-                    'time': start_time,
-                    'end_time': end_time,
-                    'description': ''
-                }
-                if parsed.get('task_type') == 'add_event':
-                    new_date_entry['title'] = f"予定（{date_str} {start_time}〜{end_time}）"
-                new_dates.append(new_date_entry)
-                print(f"[DEBUG] pattern2で追加: {new_date_entry}")
-        pattern3 = r'(\d{1,2})/(\d{1,2})\s*([0-9]{1,2})時?-([0-9]{1,2})時?'
-        matches3 = re.findall(pattern3, original_text)
-        print(f"[DEBUG] pattern3マッチ: {matches3}")
-        for m in matches3:
-            month, day, sh, eh = m
-            year = now.year
-            try:
-                dt = datetime(year, int(month), int(day))
-                if dt < now:
-                    dt = datetime(year+1, int(month), int(day))
-            except Exception:
-                continue
-            date_str = dt.strftime('%Y-%m-%d')
-            start_time = f"{int(sh):02d}:00"
-            end_time = f"{int(eh):02d}:00"
-            if not any(d.get('date') == date_str and d.get('time') == start_time and d.get('end_time') == end_time for d in new_dates):
-                new_date_entry = {
-                    'date': date_str,
-                    'time': start_time,
-                    'end_time': end_time,
-                    'description': ''
-                }
-                if parsed.get('task_type') == 'add_event':
-                    new_date_entry['title'] = f"予定（{date_str} {start_time}〜{end_time}）"
-                new_dates.append(new_date_entry)
-                print(f"[DEBUG] pattern3で追加: {new_date_entry}")
-        
-        # 月が指定されていない場合（例：16日11:30-14:00）の処理
-        pattern4 = r'(\d{1,2})日\s*([0-9]{1,2}):?([0-9]{0,2})[\-〜~]([0-9]{1,2}):?([0-9]{0,2})'
-        matches4 = re.findall(pattern4, original_text)
-        print(f"[DEBUG] pattern4マッチ（日のみ）: {matches4}")
-        for m in matches4:
-            day, sh, sm, eh, em = m
-            year = now.year
-            month = now.month
-            try:
-                dt = datetime(year, month, int(day))
-                # 過去の日付の場合は来月として扱う
-                if dt < now:
-                    if month == 12:
-                        dt = datetime(year+1, 1, int(day))
-                    else:
-                        dt = datetime(year, month+1, int(day))
-            except Exception:
-                continue
-            date_str = dt.strftime('%Y-%m-%d')
-            start_time = f"{int(sh):02d}:{sm if sm else '00'}"
-            end_time = f"{int(eh):02d}:{em if em else '00'}"
-            if not any(d.get('date') == date_str and d.get('time') == start_time and d.get('end_time') == end_time for d in new_dates):
-                new_date_entry = {
-                    'date': date_str,
-                    'time': start_time,
-                    'end_time': end_time,
-                    'description': ''
-                }
-                if parsed.get('task_type') == 'add_event':
-                    new_date_entry['title'] = f"予定（{date_str} {start_time}〜{end_time}）"
-                new_dates.append(new_date_entry)
-                print(f"[DEBUG] pattern4で追加（日のみ）: {new_date_entry}")
-        
-        # 複数の時間帯が同じ日に指定されている場合（例：16日11:30-14:00/15:00-17:00）
-        pattern5 = r'(\d{1,2})日\s*([0-9]{1,2}):?([0-9]{0,2})[\-〜~]([0-9]{1,2}):?([0-9]{0,2})/([0-9]{1,2}):?([0-9]{0,2})[\-〜~]([0-9]{1,2}):?([0-9]{0,2})'
-        matches5 = re.findall(pattern5, original_text)
-        print(f"[DEBUG] pattern5マッチ（日のみ複数時間帯）: {matches5}")
-        for m in matches5:
-            day, sh1, sm1, eh1, em1, sh2, sm2, eh2, em2 = m
-            year = now.year
-            month = now.month
-            try:
-                dt = datetime(year, month, int(day))
-                # 過去の日付の場合は来月として扱う
-                if dt < now:
-                    if month == 12:
-                        dt = datetime(year+1, 1, int(day))
-                    else:
-                        dt = datetime(year, month+1, int(day))
-            except Exception:
-                continue
-            date_str = dt.strftime('%Y-%m-%d')
-            
-            # 1つ目の時間帯
-            start_time1 = f"{int(sh1):02d}:{sm1 if sm1 else '00'}"
-            end_time1 = f"{int(eh1):02d}:{em1 if em1 else '00'}"
-            if not any(d.get('date') == date_str and d.get('time') == start_time1 and d.get('end_time') == end_time1 for d in new_dates):
-                new_date_entry1 = {
-                    'date': date_str,
-                    'time': start_time1,
-                    'end_time': end_time1,
-                    'description': ''
-                }
-                if parsed.get('task_type') == 'add_event':
-                    new_date_entry1['title'] = f"予定（{date_str} {start_time1}〜{end_time1}）"
-                new_dates.append(new_date_entry1)
-                print(f"[DEBUG] pattern5で追加（1つ目）: {new_date_entry1}")
-            
-            # 2つ目の時間帯
-            start_time2 = f"{int(sh2):02d}:{sm2 if sm2 else '00'}"
-            end_time2 = f"{int(eh2):02d}:{em2 if em2 else '00'}"
-            if not any(d.get('date') == date_str and d.get('time') == start_time2 and d.get('end_time') == end_time2 for d in new_dates):
-                new_date_entry2 = {
-                    'date': date_str,
-                    'time': start_time2,
-                    'end_time': end_time2,
-                    'description': ''
-                }
-                if parsed.get('task_type') == 'add_event':
-                    new_date_entry2['title'] = f"予定（{date_str} {start_time2}〜{end_time2}）"
-                new_dates.append(new_date_entry2)
-                print(f"[DEBUG] pattern5で追加（2つ目）: {new_date_entry2}")
-        
-        # より柔軟な日付解析：改行やスペースで区切られた複数の日付に対応
-        # 例：「16日11:30-14:00/15:00-17:00\n17日18:00-19:00\n18日9:00-10:00/16:00-16:30/17:30-18:00」
-        lines = original_text.split('\n')
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # 各行から日付を抽出
-            day_match = re.search(r'(\d{1,2})日', line)
-            if not day_match:
-                continue
-                
-            day = int(day_match.group(1))
-            year = now.year
-            month = now.month
-            
-            try:
-                dt = datetime(year, month, day)
-                # 過去の日付の場合は来月として扱う
-                if dt < now:
-                    if month == 12:
-                        dt = datetime(year+1, 1, day)
-                    else:
-                        dt = datetime(year, month+1, day)
-            except Exception:
-                continue
-                
-            date_str = dt.strftime('%Y-%m-%d')
-            
-            # 時間帯を抽出（複数の時間帯に対応）
-            time_pattern = r'([0-9]{1,2}):?([0-9]{0,2})[\-〜~]([0-9]{1,2}):?([0-9]{0,2})'
-            time_matches = re.findall(time_pattern, line)
-            
-            for time_match in time_matches:
-                sh, sm, eh, em = time_match
-                start_time = f"{int(sh):02d}:{sm if sm else '00'}"
-                end_time = f"{int(eh):02d}:{em if em else '00'}"
-                
-                if not any(d.get('date') == date_str and d.get('time') == start_time and d.get('end_time') == end_time for d in new_dates):
-                    new_date_entry = {
-                        'date': date_str,
-                        'time': start_time,
-                        'end_time': end_time,
-                        'description': ''
-                    }
-                    if parsed.get('task_type') == 'add_event':
-                        new_date_entry['title'] = f"予定（{date_str} {start_time}〜{end_time}）"
-                    new_dates.append(new_date_entry)
-                    print(f"[DEBUG] 柔軟な日付解析で追加: {new_date_entry}")
+                logger.debug("正規表現で追加: %s", new_date_entry)
         
         # 本日/今日の処理を追加（AIが既に予定を作成していない場合のみ）
         if ('本日' in original_text or '今日' in original_text) and not new_dates:
-            date_str = now.strftime('%Y-%m-%d')
+            date_str = today_str
             
             # 時間の抽出
-            time_pattern = r'(本日|今日)(\d{1,2})時'
-            time_match = re.search(time_pattern, original_text)
+            time_match = _TODAY_TIME_RE.search(original_text)
             
             if time_match:
                 hour = int(time_match.group(2))
@@ -531,7 +693,7 @@ class AIService:
                 for part in title_parts:
                     if part in ['移動', '移動あり', '移動時間', '移動必要']:
                         break
-                    if not re.match(r'^\d{1,2}時$', part) and part not in ['本日', '今日']:
+                    if not _HOUR_ONLY_RE.match(part) and part not in ['本日', '今日']:
                         if title:
                             title += " "
                         title += part
@@ -539,7 +701,7 @@ class AIService:
                 if not title:
                     title = "予定"
                 
-                print(f"[DEBUG] 抽出されたタイトル: '{title}'")
+                logger.debug("抽出されたタイトル: '%s'", title)
                 
                 # メイン予定を作成
                 main_event = {
@@ -551,86 +713,76 @@ class AIService:
                 }
                 
                 new_dates.append(main_event)
-                print(f"[DEBUG] 本日/今日の予定を追加: {main_event}")
+                logger.debug("本日/今日の予定を追加: %s", main_event)
         
-        print(f"[DEBUG] new_dates(正規表現追加後): {new_dates}")
+        logger.debug("new_dates(正規表現追加後): %s", new_dates)
         
         # 移動時間の自動追加処理（予定追加の場合のみ）
         if parsed.get('task_type') == 'add_event':
             new_dates = self._add_travel_time(new_dates, original_text)
         else:
-            print(f"[DEBUG] 空き時間確認のため、移動時間の自動追加をスキップ")
+            logger.debug("空き時間確認のため、移動時間の自動追加をスキップ")
         
         parsed['dates'] = new_dates
         return parsed
     
     def _add_travel_time(self, dates, original_text):
         """移動時間を自動追加する処理"""
-        from datetime import datetime, timedelta
-        import pytz
         
-        # 移動キーワードをチェック
-        travel_keywords = ['移動', '移動あり', '移動時間', '移動必要']
-        has_travel = any(keyword in original_text for keyword in travel_keywords)
+        # 移動キーワードをチェック（1回の走査で判定し、以降は結果を使い回す）
+        has_travel = bool(_TRAVEL_RE.search(original_text))
         
-        print(f"[DEBUG] 移動時間チェック: original_text='{original_text}', has_travel={has_travel}")
-        print(f"[DEBUG] 移動キーワード: {travel_keywords}")
+        logger.debug("移動時間チェック: original_text='%s', has_travel=%s", original_text, has_travel)
         
         if not has_travel:
-            print(f"[DEBUG] 移動キーワードが見つからないため、移動時間を追加しません")
+            logger.debug("移動キーワードが見つからないため、移動時間を追加しません")
             return dates
         
-        print(f"[DEBUG] 移動時間の自動追加を開始")
+        logger.debug("移動時間の自動追加を開始")
         
-        jst = pytz.timezone('Asia/Tokyo')
         new_dates = []
         
+        # 重複チェック用の (date, time, end_time) 集合（new_datesに追加するたびに更新）
+        seen = set()
         for date_info in dates:
             # 元の予定を追加
             new_dates.append(date_info)
+            seen.add((date_info.get('date'), date_info.get('time'), date_info.get('end_time')))
             
             # 移動時間を追加するかチェック
-            if self._should_add_travel_time(date_info, original_text):
-                travel_events = self._create_travel_events(date_info, jst)
+            if self._should_add_travel_time(has_travel):
+                travel_events = self._create_travel_events(date_info, _JST)
                 
                 # 移動時間の重複チェック
                 for travel_event in travel_events:
-                    is_duplicate = False
-                    for existing_date in new_dates:
-                        if (existing_date.get('date') == travel_event.get('date') and 
-                            existing_date.get('time') == travel_event.get('time') and 
-                            existing_date.get('end_time') == travel_event.get('end_time')):
-                            is_duplicate = True
-                            print(f"[DEBUG] 重複する移動時間をスキップ: {travel_event}")
-                            break
-                    
-                    if not is_duplicate:
-                        new_dates.append(travel_event)
-                        print(f"[DEBUG] 移動時間を追加: {travel_event}")
+                    key = (travel_event.get('date'), travel_event.get('time'), travel_event.get('end_time'))
+                    if key in seen:
+                        logger.debug("重複する移動時間をスキップ: %s", travel_event)
+                        continue
+                    seen.add(key)
+                    new_dates.append(travel_event)
+                    logger.debug("移動時間を追加: %s", travel_event)
         
         return new_dates
     
-    def _should_add_travel_time(self, date_info, original_text):
+    def _should_add_travel_time(self, has_travel):
         """移動時間を追加すべきかチェック"""
-        # 移動キーワードが含まれている場合のみ追加
-        travel_keywords = ['移動', '移動あり', '移動時間', '移動必要']
-        result = any(keyword in original_text for keyword in travel_keywords)
-        print(f"[DEBUG] _should_add_travel_time: original_text='{original_text}', result={result}")
-        return result
+        # 移動キーワードが含まれている場合のみ追加（判定は_add_travel_timeで1回だけ行う）
+        logger.debug("_should_add_travel_time: result=%s", has_travel)
+        return has_travel
     
     def _create_travel_events(self, main_event, jst):
         """移動時間の予定を作成"""
-        from datetime import datetime, timedelta
         
-        print(f"[DEBUG] _create_travel_events開始: main_event={main_event}")
+        logger.debug("_create_travel_events開始: main_event=%s", main_event)
         travel_events = []
         date_str = main_event['date']
         start_time = main_event['time']
         end_time = main_event['end_time']
         
         # 開始時間と終了時間をdatetimeオブジェクトに変換
-        start_dt = jst.localize(datetime.strptime(f"{date_str} {start_time}", "%Y-%m-%d %H:%M"))
-        end_dt = jst.localize(datetime.strptime(f"{date_str} {end_time}", "%Y-%m-%d %H:%M"))
+        start_dt = datetime.strptime(f"{date_str} {start_time}", "%Y-%m-%d %H:%M").replace(tzinfo=jst)
+        end_dt = datetime.strptime(f"{date_str} {end_time}", "%Y-%m-%d %H:%M").replace(tzinfo=jst)
         
         # 移動前の予定（1時間前）
         travel_before_dt = start_dt - timedelta(hours=1)
@@ -658,57 +810,43 @@ class AIService:
         }
         travel_events.append(travel_after_event)
         
-        print(f"[DEBUG] 作成された移動時間イベント: {travel_events}")
+        logger.debug("作成された移動時間イベント: %s", travel_events)
         return travel_events
     
+    def _request_json(self, kind, text, minute_bucket):
+        """静的プロンプト（kind）でAIにJSON抽出を依頼し、パース結果を返します（失敗時は例外でキャッシュしない）"""
+        self._count_api_call()
+        response = self.client.chat.completions.create(
+            model=Config.OPENAI_MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": _JSON_PROMPTS[kind]
+                },
+                {
+                    "role": "system",
+                    "content": _now_prompt(self._get_jst_now_str(minute_bucket))
+                },
+                {
+                    "role": "user",
+                    "content": text
+                }
+            ],
+            temperature=0.1,
+            max_tokens=Config.OPENAI_MAX_TOKENS,
+            response_format={"type": "json_object"},
+            stream=True
+        )
+        result = self._read_stream_until_json(response)
+        parsed = self._parse_ai_response(result)
+        if not isinstance(parsed, dict) or 'error' in parsed:
+            raise ValueError(f"AI応答を解析できませんでした: {parsed}")
+        return parsed
+    
     def extract_event_info(self, text):
         """イベント追加用の情報を抽出します"""
         try:
-            now_jst = self._get_jst_now_str()
-            system_prompt = (
-                f"あなたは予定とタスクを管理するAIです。\n"
-                f"現在の日時（日本時間）は {now_jst} です。  \n"
-                "この日時は、すべての自然言語の解釈において**常に絶対的な基準**としてください。  \n"
-                "会話の流れや前回の入力に引きずられることなく、**毎回この現在日時を最優先にしてください。**\n"
-                "\n"
-                "あなたはイベント情報抽出の専門家です。ユーザーのテキストからイベントのタイトルと日時を抽出し、以下のJSON形式で返してください。\n\n"
-                "抽出ルール:\n"
-                "1. イベントのタイトルは、直前の人名や主語、会議名なども含めて、できるだけ長く・具体的に抽出してください。\n"
-                "   例:『田中さんとMTG 新作アプリの件』→タイトル:『田中さんとMTG』、説明:『新作アプリの件』\n"
-                "2. 開始日時と終了日時を抽出（終了時間が明示されていない場合は1時間後をデフォルトとする）\n"
-                "3. 日本語の日付表現を具体的な日付に変換\n"
-                "4. 時間表現を24時間形式に変換\n"
-                "5. タイムゾーンは日本時間（JST）を想定\n\n"
-                "出力形式:\n"
-                "{\n  \"title\": \"イベントタイトル\",\n  \"start_datetime\": \"2024-01-15T09:00:00\",\n  \"end_datetime\": \"2024-01-15T10:00:00\",\n  \"description\": \"説明（オプション）\"\n}\n"
-            )
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": text
-                    }
-                ],
-                temperature=0.1
-            )
-            result = response.choices[0].message.content
-            parsed = self._parse_ai_response(result)
-            # --- タイトルが短すぎる場合は人名や主語＋MTGなどを含めて補完 ---
-            if parsed and isinstance(parsed, dict) and 'title' in parsed:
-                title = parsed['title']
-                # 例: "MTG"や"会議"など短い場合は元テキストから人名＋MTGを抽出
-                if title and len(title) <= 4:
-                    import re
-                    # 例: "田中さんとMTG" "佐藤さん会議" "山田さんMTG" など
-                    m = re.search(r'([\w一-龠ぁ-んァ-ン]+さん[と]?\s*MTG|[\w一-龠ぁ-んァ-ン]+さん[と]?\s*会議)', text)
-                    if m:
-                        parsed['title'] = m.group(1)
-            return parsed
+            return copy.deepcopy(self._cached_json_request('event', text.strip(), int(time.time()) // 60))
         except Exception as e:
             return {"error": f"AI処理エラー: {str(e)}"}
     
@@ -717,32 +855,36 @@ class AIService:
         if not events_info:
             return "📅 指定された日付に予定はありません。"
         
-        response = "📅 カレンダー情報\n\n"
+        parts = ["📅 カレンダー情報\n\n"]
         
         for day_info in events_info:
             if 'error' in day_info:
-                response += f"❌ {day_info['date']}: {day_info['error']}\n\n"
+                parts.append(f"❌ {day_info['date']}: {day_info['error']}\n\n")
                 continue
             
             date = day_info['date']
             events = day_info['events']
             
             if not events:
-                response += f"📅 {date}: 予定なし（空いています）\n\n"
+                parts.append(f"📅 {date}: 予定なし（空いています）\n\n")
             else:
-                response += f"📅 {date}:\n"
+                parts.append(f"📅 {date}:\n")
                 for event in events:
                     start_time = self._format_datetime(event['start'])
                     end_time = self._format_datetime(event['end'])
-                    response += f"  • {event['title']} ({start_time} - {end_time})\n"
-                response += "\n"
+                    parts.append(f"  • {event['title']} ({start_time} - {end_time})\n")
+                parts.append("\n")
         
-        return response
+        return "".join(parts)
     
     def _format_datetime(self, datetime_str):
         """日時文字列を読みやすい形式にフォーマットします"""
         try:
-            dt = parser.parse(datetime_str)
+            try:
+                dt = datetime.fromisoformat(datetime_str)
+            except ValueError:
+                # ISO 8601以外の表記のときだけ汎用パーサーを使う
+                dt = parser.parse(datetime_str)
             return dt.strftime('%m/%d %H:%M')
         except:
             return datetime_str
@@ -756,70 +898,30 @@ class AIService:
         ✅予定を追加しました！\n\n📅タイトル\nM/D（曜）HH:MM〜HH:MM
         """
         if success:
-            response = "✅予定を追加しました！\n\n"
+            parts = ["✅予定を追加しました！\n\n"]
             if event_info:
                 title = event_info.get('title', '')
                 start = event_info.get('start')
                 end = event_info.get('end')
                 if start and end:
-                    from datetime import datetime
-                    import pytz
-                    jst = pytz.timezone('Asia/Tokyo')
-                    start_dt = datetime.fromisoformat(start).astimezone(jst)
-                    end_dt = datetime.fromisoformat(end).astimezone(jst)
-                    weekday = "月火水木金土日"[start_dt.weekday()]
-                    date_str = f"{start_dt.month}/{start_dt.day}（{weekday}）"
-                    time_str = f"{start_dt.strftime('%H:%M')}〜{end_dt.strftime('%H:%M')}"
-                    response += f"📅{title}\n{date_str}{time_str}"
+                    date_str, time_str = _fmt_event_range(start, end, with_weekday=True)
+                    parts.append(f"📅{title}\n{date_str}{time_str}")
         else:
-            response = "❌予定が入っています！\n\n"
+            parts = ["❌予定が入っています！\n\n"]
             if event_info and isinstance(event_info, list):
                 for event in event_info:
                     title = event.get('title', '')
                     start = event.get('start')
                     end = event.get('end')
                     if start and end:
-                        from datetime import datetime
-                        import pytz
-                        jst = pytz.timezone('Asia/Tokyo')
-                        start_dt = datetime.fromisoformat(start).astimezone(jst)
-                        end_dt = datetime.fromisoformat(end).astimezone(jst)
-                        date_str = f"{start_dt.month:02d}/{start_dt.day:02d}"
-                        time_str = f"{start_dt.strftime('%H:%M')} - {end_dt.strftime('%H:%M')}"
-                        response += f"• {title} ({date_str} {time_str})\n"
-        return response
+                        date_str, time_str = _fmt_event_range(start, end)
+                        parts.append(f"• {title} ({date_str} {time_str})\n")
+        return "".join(parts)
     
     def check_multiple_dates_availability(self, dates_info):
         """複数の日付の空き時間を確認するための情報を抽出します"""
         try:
-            now_jst = self._get_jst_now_str()
-            system_prompt = (
-                f"あなたは予定とタスクを管理するAIです。\n"
-                f"現在の日時（日本時間）は {now_jst} です。  \n"
-                "この日時は、すべての自然言語の解釈において**常に絶対的な基準**としてください。  \n"
-                "会話の流れや前回の入力に引きずられることなく、**毎回この現在日時を最優先にしてください。**\n"
-                "\n"
-                "複数の日付の空き時間確認リクエストを処理してください。以下のJSON形式で返してください。\n\n"
-                "出力形式:\n"
-                "{\n  \"dates\": [\n    {\n      \"date\": \"2024-01-15\",\n      \"time_range\": \"09:00-18:00\"\n    }\n  ]\n}\n"
-            )
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": dates_info
-                    }
-                ],
-                temperature=0.1
-            )
-            
-            result = response.choices[0].message.content
-            return self._parse_ai_response(result)
+            return copy.deepcopy(self._cached_json_request('availability', dates_info.strip(), int(time.time()) // 60))
             
         except Exception as e:
             return {"error": f"AI処理エラー: {str(e)}"}
@@ -829,20 +931,19 @@ class AIService:
         free_slots_by_date: { 'YYYY-MM-DD': [{'start': '10:00', 'end': '11:00'}, ...], ... }
         指定フォーマットで空き時間を返す
         """
-        jst = pytz.timezone('Asia/Tokyo')
         if not free_slots_by_date:
             return "✅空き時間はありませんでした。"
-        response = "✅以下が空き時間です！\n\n"
-        for date, slots in free_slots_by_date.items():
-            dt = jst.localize(datetime.strptime(date, "%Y-%m-%d"))
-            weekday = "月火水木金土日"[dt.weekday()]
-            response += f"{dt.month}/{dt.day}（{weekday}）\n"
+        parts = ["✅以下が空き時間です！\n\n"]
+        for date_str, slots in free_slots_by_date.items():
+            dt = date.fromisoformat(date_str)
+            weekday = _WEEKDAYS[dt.weekday()]
+            parts.append(f"{dt.month}/{dt.day}（{weekday}）\n")
             if not slots:
-                response += "・空き時間なし\n"
+                parts.append("・空き時間なし\n")
             else:
                 for slot in slots:
-                    response += f"・{slot['start']}〜{slot['end']}\n"
-        return response
+                    parts.append(f"・{slot['start']}〜{slot['end']}\n")
+        return "".join(parts)
     
     def format_free_slots_response_by_frame(self, free_slots_by_frame):
         """
@@ -852,50 +953,50 @@ class AIService:
         ]
         日付ごとに空き時間をまとめて返す（重複枠・重複時間帯は除外）
         """
-        print(f"[DEBUG] format_free_slots_response_by_frame開始")
-        print(f"[DEBUG] 入力データ: {free_slots_by_frame}")
+        logger.debug("format_free_slots_response_by_frame開始")
+        logger.debug("入力データ: %s", free_slots_by_frame)
         
-        jst = pytz.timezone('Asia/Tokyo')
         if not free_slots_by_frame:
-            print(f"[DEBUG] free_slots_by_frameが空")
+            logger.debug("free_slots_by_frameが空")
             return "✅空き時間はありませんでした。"
             
-        # 日付ごとに空き時間をまとめる
-        date_slots = {}
-        for i, frame in enumerate(free_slots_by_frame):
-            print(f"[DEBUG] フレーム{i+1}処理: {frame}")
-            date = frame['date']
-            slots = frame['free_slots']
-            print(f"[DEBUG] フレーム{i+1}の空き時間: {slots}")
-            
-            if date not in date_slots:
-                date_slots[date] = set()
-            for slot in slots:
-                date_slots[date].add((slot['start'], slot['end']))
-                print(f"[DEBUG] 日付{date}に空き時間追加: {slot['start']}〜{slot['end']}")
+        # 日付ごとに空き時間をまとめる（重複はsetで除外し、リストには開始時刻順に挿入しておく）
+        date_slots = defaultdict(list)
+        date_seen = defaultdict(set)
+        for frame in free_slots_by_frame:
+            slots = date_slots[frame['date']]
+            seen = date_seen[frame['date']]
+            for slot in frame['free_slots']:
+                key = (slot['start'], slot['end'])
+                if key not in seen:
+                    seen.add(key)
+                    insort(slots, key)
                 
-        print(f"[DEBUG] 日付ごとの空き時間: {date_slots}")
+        logger.debug("日付ごとの空き時間: %s", date_slots)
         
-        response = "✅以下が空き時間です！\n\n"
-        for date in sorted(date_slots.keys()):
-            slots = sorted(list(date_slots[date]))
-            print(f"[DEBUG] 日付{date}の最終空き時間: {slots}")
+        parts = ["✅以下が空き時間です！\n\n"]
+        had_any_slot = False
+        for date_str in sorted(date_slots):
+            slots = date_slots[date_str]
+            logger.debug("日付%sの最終空き時間: %s", date_str, slots)
             
             # 空き時間がない日付は表示しない
             if not slots:
                 continue
                 
             # 空き時間がある日付のみ表示
-            dt = jst.localize(datetime.strptime(date, "%Y-%m-%d"))
-            weekday = "月火水木金土日"[dt.weekday()]
-            response += f"{dt.month}/{dt.day}（{weekday}）\n"
+            dt = date.fromisoformat(date_str)
+            weekday = _WEEKDAYS[dt.weekday()]
+            parts.append(f"{dt.month}/{dt.day}（{weekday}）\n")
+            had_any_slot = True
             
             for start, end in slots:
-                response += f"・{start}〜{end}\n"
+                parts.append(f"・{start}〜{end}\n")
                     
         # 全ての日付で空き時間がない場合
-        if response == "✅以下が空き時間です！\n\n":
+        if not had_any_slot:
             return "✅空き時間はありませんでした。"
-                    
-        print(f"[DEBUG] 最終レスポンス: {response}")
+        
+        response = "".join(parts)
+        logger.debug("最終レスポンス: %s", response)
         return response 
\ No newline at end of file
@@ -3,39 +3,49 @@ import logging
 import base64
 import json
 import time
+import functools
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 import re
 
+# Googleが返すスコープが要求と異なっても（既に許可済みのスコープが付く場合など）oauthlibが例外にしないようにする
+os.environ.setdefault('OAUTHLIB_RELAX_TOKEN_SCOPE', '1')
+
 # ログレベルを環境変数で制御
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
 logging.basicConfig(level=LOG_LEVEL)
 
 # Railway環境でcredentials.jsonを書き出す（Base64/プレーン両対応）
+# 形式はGOOGLE_CREDENTIALS_FORMAT=base64|jsonで指定する（未指定なら先頭が「{」かどうかで判定し、JSONの検証はFlow生成時に任せる）
 def write_credentials():
     val = os.environ.get("GOOGLE_CREDENTIALS_FILE")
     if not val:
         logging.warning("GOOGLE_CREDENTIALS_FILE環境変数が設定されていません")
         return False
     try:
-        # Base64かプレーンJSONかを自動判定
-        content = None
-        try:
-            decoded = base64.b64decode(val).decode("utf-8")
-            json.loads(decoded)  # JSONとして解釈できるか確認
-            content = decoded
-            logging.info("credentials: Base64を検出してデコードしました")
-        except Exception:
-            json.loads(val)      # プレーンJSONか確認
-            content = val
-            logging.info("credentials: プレーンJSONとして検出しました")
-
-        with open("credentials.json", "w") as f:
+        fmt = os.environ.get("GOOGLE_CREDENTIALS_FORMAT", "").lower()
+        if not fmt:
+            fmt = "json" if val.lstrip().startswith("{") else "base64"
+        if fmt == "base64":
+            content = base64.b64decode(val, validate=True)
+            logging.info("credentials: Base64としてデコードしました")
+        else:
+            content = val.encode("utf-8")
+            logging.info("credentials: プレーンJSONとして書き出します")
+
+        # 一時ファイルに書いてから置き換え、書きかけのファイルを読まれないようにする
+        tmp_path = "credentials.json.tmp"
+        with open(tmp_path, "wb", buffering=16384) as f:
             f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
         
         # ファイル権限を600に設定（所有者のみ読み書き可能）
-        os.chmod("credentials.json", 0o600)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, "credentials.json")
 
-        size = os.path.getsize("credentials.json")
-        logging.info(f"credentials.jsonファイルが正常に作成されました (サイズ: {size} bytes)")
+        logging.info(f"credentials.jsonファイルが正常に作成されました (サイズ: {len(content)} bytes)")
         return True
     except Exception as e:
         logging.error(f"credentials.jsonファイルの作成に失敗しました: {e}")
@@ -50,17 +60,20 @@ except Exception as e:
     logging.error(f"起動時にcredentials.jsonの作成に失敗しました: {e}")
     logging.warning("Google Calendar認証は使用できませんが、アプリケーションは起動します")
 
-from flask import Flask, request, abort, render_template_string, redirect, make_response
+from flask import Flask, request, abort, redirect, make_response, Response, stream_with_context
 from linebot import LineBotApi, WebhookHandler
-from linebot.exceptions import InvalidSignatureError
+from linebot.exceptions import InvalidSignatureError, LineBotApiError
 from linebot.models import MessageEvent, TextMessage, TextSendMessage
-from line_bot_handler import LineBotHandler
+from line_bot_handler import LineBotHandler, invalidate_auth
+from calendar_service import GoogleCalendarService
+from googleapiclient.errors import HttpError
 from config import Config
 from datetime import datetime
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
 from db import DBHelper
 from werkzeug.middleware.proxy_fix import ProxyFix
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 from ai_service import AIService
 from send_daily_agenda import send_daily_agenda
 
@@ -75,18 +88,15 @@ app.config.update(
     PREFERRED_URL_SCHEME="https",
     SESSION_COOKIE_SECURE=True,
     SESSION_COOKIE_SAMESITE="Lax",
+    MAX_CONTENT_LENGTH=512 * 1024,  # Webhook本文などの受信サイズ上限
 )
 
 # ProxyFixを追加
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
 
-# セキュリティヘッダーを追加
-@app.after_request
-def set_security_headers(resp):
-    # 本番のみ HSTS 推奨
-    if os.getenv('ENV', 'production').lower() == 'production':
-        resp.headers['Strict-Transport-Security'] = 'max-age=63072000; includeSubDomains; preload'
-    resp.headers['Content-Security-Policy'] = (
+# セキュリティヘッダーを追加（内容は固定なので起動時に1回だけ組み立てる）
+_SECURITY_HEADERS = {
+    'Content-Security-Policy': (
         "default-src 'none'; "
         "style-src 'self' 'unsafe-inline'; "
         "script-src 'self' 'unsafe-inline'; "
@@ -94,10 +104,26 @@ def set_security_headers(resp):
         "img-src 'self' data:; "
         "form-action 'self' https://accounts.google.com; "
         "base-uri 'none'; frame-ancestors 'none'"
-    )
-    resp.headers['X-Content-Type-Options'] = 'nosniff'
-    resp.headers['X-Frame-Options'] = 'DENY'
-    resp.headers['Referrer-Policy'] = 'no-referrer'
+    ),
+    'X-Content-Type-Options': 'nosniff',
+    'X-Frame-Options': 'DENY',
+    'Referrer-Policy': 'no-referrer',
+}
+# 本番のみ HSTS 推奨
+if os.getenv('ENV', 'production').lower() == 'production':
+    _SECURITY_HEADERS['Strict-Transport-Security'] = 'max-age=63072000; includeSubDomains; preload'
+
+# ブラウザで表示されない（ヘルスチェック・Webhook・API）エンドポイントはヘッダー付与を省略する
+_NO_SECURITY_HEADER_ENDPOINTS = frozenset({
+    'health', 'callback', 'api_send_daily_agenda', 'api_debug_users', 'api_debug_google_account',
+    'api_debug_google_accounts',
+})
+
+@app.after_request
+def set_security_headers(resp):
+    if request.endpoint in _NO_SECURITY_HEADER_ENDPOINTS:
+        return resp
+    resp.headers.update(_SECURITY_HEADERS)
     return resp
 
 # 設定の検証
@@ -108,9 +134,28 @@ except ValueError as e:
     logger.error(f"設定エラー: {e}")
     raise
 
+try:
+    import orjson
+    def _json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    def _json_dumps(obj):
+        # orjsonと同様にdatetimeなどの列もシリアライズできるよう、未対応の型は文字列にする
+        return json.dumps(obj, ensure_ascii=False, default=str).encode('utf-8')
+
+def _json_response(obj):
+    """JSONレスポンスを返す（orjsonがあればjsonifyより高速にシリアライズする）"""
+    return Response(_json_dumps(obj), mimetype='application/json')
+
 # デバッグエンドポイントの有効化フラグ
 ENABLE_DEBUG_ENDPOINTS = os.getenv('ENABLE_DEBUG_ENDPOINTS', 'false').lower() == 'true'
 
+def debug_route(rule, **options):
+    """ENABLE_DEBUG_ENDPOINTSが有効なときだけURLマップに登録するroute（無効時はURL自体が存在せず404になる）"""
+    if ENABLE_DEBUG_ENDPOINTS:
+        return app.route(rule, **options)
+    return lambda f: f
+
 # LINEボットハンドラーを初期化
 try:
     line_bot_handler = LineBotHandler()
@@ -133,8 +178,10 @@ def callback():
         logger.warning("X-Line-Signature ヘッダーがありません")
         abort(400)
 
-    body = request.get_data(as_text=True)
-    logger.debug("Request body (debug only): %s", body)
+    # HMAC検証もJSONパースもバイト列のまま行えるので、本文はデコードせずに受け取る
+    body = request.get_data(cache=False)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request body (debug only): %s", body.decode('utf-8', errors='replace'))
 
     try:
         # 署名を検証し、問題なければhandleに定義されている関数を呼び出す
@@ -147,101 +194,186 @@ def callback():
     # 正常終了時は200を返す
     return 'OK'
 
-@handler.add(MessageEvent, message=TextMessage)
-def handle_message(event):
-    """テキストメッセージを処理"""
+# SSL接続が途中で切れたときのエラーメッセージ（リトライ対象）
+_SSL_RETRYABLE = re.compile(r'SSL SYSCALL error|EOF detected').search
+
+def _is_retryable_reply_error(error):
+    """LINEへの返信でリトライすべきエラーか（429・5xx・SSL切断のみ。無効なreply_tokenなどはリトライしない）"""
+    if isinstance(error, LineBotApiError):
+        return error.status_code == 429 or error.status_code >= 500
+    return _SSL_RETRYABLE(str(error)) is not None
+
+_REPLY_BACKOFF = wait_exponential_jitter(initial=0.5, max=8, jitter=0.5)
+
+def _reply_wait(retry_state):
+    """429でRetry-Afterヘッダーがあればその秒数、なければ指数バックオフ＋ジッターで待つ"""
+    error = retry_state.outcome.exception()
+    if isinstance(error, LineBotApiError) and error.status_code == 429 and error.headers:
+        try:
+            return float(error.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            pass
+    return _REPLY_BACKOFF(retry_state)
+
+def _log_reply_retry(retry_state):
+    logger.warning(
+        f"メッセージ送信試行 {retry_state.attempt_number} でエラー: {retry_state.outcome.exception()}、"
+        f"{retry_state.next_action.sleep:.1f}秒後にリトライします"
+    )
+
+@retry(
+    stop=stop_after_attempt(8),
+    wait=_reply_wait,
+    retry=retry_if_exception(_is_retryable_reply_error),
+    before_sleep=_log_reply_retry,
+    reraise=True,
+)
+def _reply(reply_token, messages):
+    """LINEに返信する（一時的なエラーはリトライ）"""
+    line_bot_handler.line_bot_api.reply_message(reply_token, messages)
+
+# Webhookには受信後すぐ200を返し、OpenAI・Google Calendarを呼ぶメッセージ処理はワーカースレッドで行う
+# （reply_tokenはWebhookへの応答後も有効なので、返信は引き続きreplyで送り、失効していた場合だけpushで送る）
+# ワーカースレッドはそれぞれ専用のLineBotHandler（DB接続・Calendarサービス・認証情報キャッシュ）を持ち、他のスレッドと共有しない
+MESSAGE_QUEUE_SIZE = int(os.getenv('MESSAGE_QUEUE_SIZE', '200'))
+MESSAGE_WORKERS = int(os.getenv('MESSAGE_WORKERS', '8'))
+# gunicornのワーカー終了時（max_requestsによる入れ替えを含む）に、受け付け済みのメッセージを処理し終えるまで待つ最大秒数
+MESSAGE_DRAIN_TIMEOUT = float(os.getenv('MESSAGE_DRAIN_TIMEOUT', '45'))
+_message_queue = queue.Queue(maxsize=MESSAGE_QUEUE_SIZE)
+_message_stats = {'enqueued': 0, 'dropped': 0, 'processed': 0, 'failed': 0}
+_message_stats_lock = threading.Lock()
+_BUSY_MESSAGE = "ただいま混雑しています。しばらく時間をおいて再度お試しください。"
+_ERROR_MESSAGE = "申し訳ございません。エラーが発生しました。しばらく時間をおいて再度お試しください。"
+
+def _count_message(key):
+    with _message_stats_lock:
+        _message_stats[key] += 1
+
+def _send_response(event, messages):
+    """reply_tokenで返信する（キュー待ちでreply_tokenが失効していればpushで送る）"""
+    try:
+        _reply(event.reply_token, messages)
+    except LineBotApiError as e:
+        if e.status_code != 400:
+            raise
+        logger.warning(f"reply_tokenで返信できなかったためpushで送信します: {e}")
+        line_bot_handler.line_bot_api.push_message(event.source.user_id, messages)
+
+def _process_message(event, worker_handler):
+    """キューから取り出したテキストメッセージを、ワーカースレッド専用のハンドラーで処理して返信する"""
     try:
         logger.info(f"メッセージを受信: {event.message.text}")
         
-        # メッセージを処理してレスポンスを取得
-        response = line_bot_handler.handle_message(event)
-        
-        # LINEにメッセージを送信（reply_token期限対策、429対応）
-        from linebot.exceptions import LineBotApiError
-        max_retries = 3
-        retry_delay = 1.5  # 秒
+        # メッセージを処理してレスポンスを取得（OpenAIは1メッセージにつき1回の呼び出しが原則）
+        ai_service = worker_handler.ai_service
+        if ai_service:
+            ai_service.reset_api_call_count()
+        response = worker_handler.handle_message(event)
+        if ai_service and ai_service.api_call_count() > 1:
+            logger.debug(f"1回のWebhookでOpenAIを{ai_service.api_call_count()}回呼び出しました")
         
-        for attempt in range(max_retries):
-            try:
-                line_bot_handler.line_bot_api.reply_message(
-                    event.reply_token,
-                    response
-                )
-                logger.info("メッセージの処理が完了しました")
-                break
-            except LineBotApiError as send_error:
-                error_msg = str(send_error)
-                logger.warning(f"メッセージ送信試行 {attempt + 1}/{max_retries} でエラー: {error_msg}")
-                
-                # 429 レート制限（status_codeで判定）
-                if send_error.status_code == 429:
-                    logger.info("レート制限を検出、2秒後にリトライします")
-                    time.sleep(2.0)
-                # SSLエラーの場合
-                elif "SSL SYSCALL error" in error_msg or "EOF detected" in error_msg:
-                    logger.info(f"SSLエラーを検出、{retry_delay}秒後にリトライします")
-                    time.sleep(retry_delay)
-                    retry_delay *= 1.5
-                else:
-                    if attempt < max_retries - 1:
-                        time.sleep(1.0)
-                        continue
-                    else:
-                        logger.error(f"最大リトライ回数に達しました: {send_error}")
-                        raise send_error
-            except Exception as send_error:
-                error_msg = str(send_error)
-                logger.warning(f"メッセージ送信試行 {attempt + 1}/{max_retries} でエラー: {error_msg}")
-                # SSLエラーの場合
-                if "SSL SYSCALL error" in error_msg or "EOF detected" in error_msg:
-                    logger.info(f"SSLエラーを検出、{retry_delay}秒後にリトライします")
-                    time.sleep(retry_delay)
-                    retry_delay *= 1.5
-                else:
-                    if attempt < max_retries - 1:
-                        time.sleep(1.0)
-                        continue
-                    else:
-                        logger.error(f"最大リトライ回数に達しました: {send_error}")
-                        raise send_error
+        # LINEにメッセージを送信（reply_token期限対策、429対応は_replyのリトライに任せる）
+        _send_response(event, response)
+        _count_message('processed')
+        logger.info("メッセージの処理が完了しました")
         
     except Exception as e:
+        _count_message('failed')
         logger.error(f"メッセージ処理でエラーが発生しました: {e}")
         # エラーが発生した場合はエラーメッセージを送信
         try:
-            # エラーメッセージ送信時もリトライ機能を適用（簡略版）
-            for attempt in range(2):
+            _send_response(event, TextSendMessage(text=_ERROR_MESSAGE))
+            logger.info("エラーメッセージの送信が完了しました")
+        except Exception as reply_error:
+            logger.error(f"エラーメッセージの送信に失敗しました: {reply_error}")
+
+def _message_worker():
+    worker_handler = None
+    while True:
+        event = _message_queue.get()
+        try:
+            if worker_handler is None:
+                # 初回のメッセージでこのスレッド専用のハンドラーを作る（失敗したら次のメッセージで作り直す）。
+                # AIサービスとカレンダーサービスはline_bot_handlerのものを共有し、キャッシュの分散と
+                # invalidate_calendar_service()の取りこぼしを防ぐ
                 try:
-                    line_bot_handler.line_bot_api.reply_message(
-                        event.reply_token,
-                        TextSendMessage(text="申し訳ございません。エラーが発生しました。しばらく時間をおいて再度お試しください。")
+                    worker_handler = LineBotHandler(
+                        ai_service=line_bot_handler.ai_service,
+                        calendar_service=line_bot_handler.calendar_service,
                     )
-                    logger.info("エラーメッセージの送信が完了しました")
-                    break
-                except Exception as reply_error:
-                    logger.warning(f"エラーメッセージ送信試行 {attempt + 1}/2 でエラー: {reply_error}")
-                    if attempt == 1:
+                except Exception as e:
+                    _count_message('failed')
+                    logger.exception(f"ワーカースレッドのハンドラー初期化に失敗しました: {e}")
+                    try:
+                        _send_response(event, TextSendMessage(text=_ERROR_MESSAGE))
+                    except Exception as reply_error:
                         logger.error(f"エラーメッセージの送信に失敗しました: {reply_error}")
-                    else:
-                        time.sleep(1)
+                    continue
+            _process_message(event, worker_handler)
+        finally:
+            _message_queue.task_done()
+
+def drain_message_queue(timeout=MESSAGE_DRAIN_TIMEOUT):
+    """受け付け済みのメッセージを処理し終えるまで待つ（gunicornのworker_exitから呼ぶ）。
+    時間内に処理できなかったメッセージは、ログに残したうえで混雑メッセージを返す"""
+    with _message_queue.all_tasks_done:
+        finished = _message_queue.all_tasks_done.wait_for(lambda: not _message_queue.unfinished_tasks, timeout)
+    if finished:
+        logger.info("メッセージキューの処理が完了しました")
+        return
+    
+    # まだ処理を始めていないメッセージはキューから取り出して、処理できなかったことを利用者に伝える
+    while True:
+        try:
+            event = _message_queue.get_nowait()
+        except queue.Empty:
+            break
+        _count_message('dropped')
+        logger.error(f"ワーカー終了のため未処理のメッセージを破棄します: user_id={event.source.user_id}")
+        try:
+            _send_response(event, TextSendMessage(text=_BUSY_MESSAGE))
         except Exception as reply_error:
-            logger.error(f"エラーメッセージの送信に失敗しました: {reply_error}")
+            logger.error(f"混雑メッセージの送信に失敗しました: {reply_error}")
+        finally:
+            _message_queue.task_done()
+    if _message_queue.unfinished_tasks:
+        logger.error(f"ワーカー終了時に処理中のメッセージが{_message_queue.unfinished_tasks}件残っています")
+
+for _worker_index in range(MESSAGE_WORKERS):
+    threading.Thread(target=_message_worker, name=f'message_worker_{_worker_index}', daemon=True).start()
+
+@handler.add(MessageEvent, message=TextMessage)
+def handle_message(event):
+    """テキストメッセージをキューに積む（処理と返信はワーカーで行う。キューが満杯なら混雑メッセージだけ返す）"""
+    try:
+        _message_queue.put_nowait(event)
+    except queue.Full:
+        _count_message('dropped')
+        logger.warning(f"メッセージキューが満杯のため処理を見送りました（上限{MESSAGE_QUEUE_SIZE}件）")
+        try:
+            line_bot_handler.line_bot_api.reply_message(event.reply_token, TextSendMessage(text=_BUSY_MESSAGE))
+        except Exception as reply_error:
+            logger.error(f"混雑メッセージの送信に失敗しました: {reply_error}")
+        return
+    _count_message('enqueued')
+
+# ヘルスチェックの応答本文（毎回JSONシリアライズしないよう事前にバイト列にしておく）
+_INDEX_BODY = b"LINE Calendar Bot is running!"
+_HEALTH_BODY = b'{"status":"healthy","service":"line-calendar-bot"}'
 
 @app.route("/", methods=['GET'])
 def index():
     """ヘルスチェック用エンドポイント"""
-    return "LINE Calendar Bot is running!"
+    return Response(_INDEX_BODY, mimetype='text/plain')
 
 @app.route("/health", methods=['GET'])
 def health():
     """ヘルスチェック用エンドポイント"""
-    return {"status": "healthy", "service": "line-calendar-bot"}
+    return Response(_HEALTH_BODY, mimetype='application/json', headers={'Cache-Control': 'no-store'})
 
-@app.route("/test", methods=['GET'])
+@debug_route("/test", methods=['GET'])
 def test():
     """テスト用エンドポイント"""
-    if not ENABLE_DEBUG_ENDPOINTS:
-        return ("Not Found", 404)
     return {
         "message": "LINE Calendar Bot Test",
         "config": {
@@ -251,191 +383,206 @@ def test():
         }
     }
 
+GOOGLE_SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+@functools.lru_cache(maxsize=1)
+def _google_client_config():
+    """credentials.jsonを1回だけ読み込んでメモリに保持する（ファイルが無いなど読み込みに失敗した場合はキャッシュせず次回再試行）"""
+    with open('credentials.json', 'rb') as f:
+        return json.loads(f.read())
+
+@functools.lru_cache(maxsize=1)
+def _oauth_redirect_uri():
+    """BASE_URL環境変数からOAuthのリダイレクトURIを組み立てる"""
+    base_url = os.getenv('BASE_URL')
+    if not base_url:
+        raise ValueError("BASE_URL環境変数が設定されていません")
+    # 末尾のスラッシュを削除してから結合
+    return base_url.rstrip('/') + '/oauth2callback'
+
+def _new_flow():
+    """キャッシュ済みのクライアント設定からGoogle OAuthのFlowを生成する"""
+    flow = Flow.from_client_config(_google_client_config(), scopes=GOOGLE_SCOPES)
+    flow.redirect_uri = _oauth_redirect_uri()
+    return flow
+
+# ワンタイムコード認証ページ（正規表現・テンプレートは起動時に1回だけコンパイルする）
+_ONETIME_CODE_RE = re.compile(r'[A-Z0-9]{8}')
+
+_ONETIME_FORM_TMPL = app.jinja_env.from_string('''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Google Calendar 認証</title>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; max-width: 500px; margin: 50px auto; padding: 20px; }
+        .form-group { margin-bottom: 20px; }
+        label { display: block; margin-bottom: 5px; font-weight: bold; }
+        input[type="text"] { width: 100%; padding: 10px; border: 1px solid #ddd; border-radius: 4px; }
+        button { background: #4285f4; color: white; padding: 12px 24px; border: none; border-radius: 4px; cursor: pointer; }
+        button:hover { background: #3367d6; }
+        button:disabled { background: #ccc; cursor: not-allowed; }
+        .error { color: red; margin-top: 10px; }
+        .success { color: green; margin-top: 10px; }
+    </style>
+    <script>
+        document.addEventListener('DOMContentLoaded', function() {
+            const form = document.querySelector('form');
+            const button = document.querySelector('button[type="submit"]');
+
+            form.addEventListener('submit', function() {
+                button.disabled = true;
+                button.textContent = '認証中...';
+            });
+        });
+    </script>
+</head>
+<body>
+    <h1>Google Calendar 認証</h1>
+    <p>LINE BotでGoogle Calendarを利用するために認証が必要です。</p>
+    <form method="POST">
+        <div class="form-group">
+            <label for="code">ワンタイムコード:</label>
+            <input type="text" id="code" name="code" placeholder="8文字のコードを入力" required>
+        </div>
+        <button type="submit">認証を開始</button>
+    </form>
+    {% if error %}
+    <div class="error">{{ error }}</div>
+    {% endif %}
+    {% if success %}
+    <div class="success">{{ success }}</div>
+    {% endif %}
+</body>
+</html>
+''')
+
+_ONETIME_FORMAT_ERROR_HTML = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>認証エラー</title>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; max-width: 500px; margin: 50px auto; padding: 20px; }
+        .error { color: red; margin: 20px 0; }
+        .back-link { margin-top: 20px; }
+    </style>
+</head>
+<body>
+    <h1>認証エラー</h1>
+    <div class="error">
+        コードの形式が不正です。<br>
+        8文字の英数字コードを入力してください。
+    </div>
+    <div class="back-link">
+        <a href="/onetime_login">戻る</a>
+    </div>
+</body>
+</html>
+'''
+
+_ONETIME_INVALID_HTML = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>認証エラー</title>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; max-width: 500px; margin: 50px auto; padding: 20px; }
+        .error { color: red; margin: 20px 0; }
+        .back-link { margin-top: 20px; }
+    </style>
+</head>
+<body>
+    <h1>認証エラー</h1>
+    <div class="error">
+        無効なワンタイムコードです。<br>
+        コードが正しいか、有効期限が切れていないか確認してください。
+    </div>
+    <div class="back-link">
+        <a href="/onetime_login">戻る</a>
+    </div>
+</body>
+</html>
+'''
+
+_OAUTH_INIT_ERROR_TMPL = app.jinja_env.from_string('''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>認証エラー</title>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; max-width: 500px; margin: 50px auto; padding: 20px; }
+        .error { color: red; margin: 20px 0; }
+    </style>
+</head>
+<body>
+    <h1>認証エラー</h1>
+    <div class="error">
+        Google認証の初期化に失敗しました。<br>
+        しばらく時間をおいて再度お試しください。<br><br>
+        エラー詳細: {{ error_message }}
+    </div>
+</body>
+</html>
+''')
+
 @app.route('/onetime_login', methods=['GET', 'POST'])
 def onetime_login():
     """ワンタイムコード認証ページ"""
     if request.method == 'GET':
         # ワンタイムコード入力フォームを表示
-        html = '''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Google Calendar 認証</title>
-            <meta charset="utf-8">
-            <style>
-                body { font-family: Arial, sans-serif; max-width: 500px; margin: 50px auto; padding: 20px; }
-                .form-group { margin-bottom: 20px; }
-                label { display: block; margin-bottom: 5px; font-weight: bold; }
-                input[type="text"] { width: 100%; padding: 10px; border: 1px solid #ddd; border-radius: 4px; }
-                button { background: #4285f4; color: white; padding: 12px 24px; border: none; border-radius: 4px; cursor: pointer; }
-                button:hover { background: #3367d6; }
-                button:disabled { background: #ccc; cursor: not-allowed; }
-                .error { color: red; margin-top: 10px; }
-                .success { color: green; margin-top: 10px; }
-            </style>
-            <script>
-                document.addEventListener('DOMContentLoaded', function() {
-                    const form = document.querySelector('form');
-                    const button = document.querySelector('button[type="submit"]');
-                    
-                    form.addEventListener('submit', function() {
-                        button.disabled = true;
-                        button.textContent = '認証中...';
-                    });
-                });
-            </script>
-        </head>
-        <body>
-            <h1>Google Calendar 認証</h1>
-            <p>LINE BotでGoogle Calendarを利用するために認証が必要です。</p>
-            <form method="POST">
-                <div class="form-group">
-                    <label for="code">ワンタイムコード:</label>
-                    <input type="text" id="code" name="code" placeholder="8文字のコードを入力" required>
-                </div>
-                <button type="submit">認証を開始</button>
-            </form>
-            {% if error %}
-            <div class="error">{{ error }}</div>
-            {% endif %}
-            {% if success %}
-            <div class="success">{{ success }}</div>
-            {% endif %}
-        </body>
-        </html>
-        '''
-        return render_template_string(html, error=None, success=None)
+        return _ONETIME_FORM_TMPL.render(error=None, success=None)
     
     elif request.method == 'POST':
         code = request.form.get('code', '').strip().upper()
-        logger.info(f"[DEBUG] 入力されたワンタイムコード: {code}")
+        logger.debug("入力されたワンタイムコード: %s", code)
         
         # ワンタイムコードの形式チェック（サーバ側バリデーション）
-        if not re.fullmatch(r'[A-Z0-9]{8}', code):
-            html = '''
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>認証エラー</title>
-                <meta charset="utf-8">
-                <style>
-                    body { font-family: Arial, sans-serif; max-width: 500px; margin: 50px auto; padding: 20px; }
-                    .error { color: red; margin: 20px 0; }
-                    .back-link { margin-top: 20px; }
-                </style>
-            </head>
-            <body>
-                <h1>認証エラー</h1>
-                <div class="error">
-                    コードの形式が不正です。<br>
-                    8文字の英数字コードを入力してください。
-                </div>
-                <div class="back-link">
-                    <a href="/onetime_login">戻る</a>
-                </div>
-            </body>
-            </html>
-            '''
-            return render_template_string(html)
+        if not _ONETIME_CODE_RE.fullmatch(code):
+            return _ONETIME_FORMAT_ERROR_HTML
         
         # ワンタイムコードを検証
         line_user_id = db_helper.verify_onetime_code(code)
-        logger.info(f"[DEBUG] 検証結果: line_user_id={line_user_id}")
+        logger.debug("検証結果: line_user_id=%s", line_user_id)
         if not line_user_id:
-            html = '''
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>認証エラー</title>
-                <meta charset="utf-8">
-                <style>
-                    body { font-family: Arial, sans-serif; max-width: 500px; margin: 50px auto; padding: 20px; }
-                    .error { color: red; margin: 20px 0; }
-                    .back-link { margin-top: 20px; }
-                </style>
-            </head>
-            <body>
-                <h1>認証エラー</h1>
-                <div class="error">
-                    無効なワンタイムコードです。<br>
-                    コードが正しいか、有効期限が切れていないか確認してください。
-                </div>
-                <div class="back-link">
-                    <a href="/onetime_login">戻る</a>
-                </div>
-            </body>
-            </html>
-            '''
-            return render_template_string(html)
+            return _ONETIME_INVALID_HTML
         
         try:
             # Google OAuth認証フローを開始
-            SCOPES = ['https://www.googleapis.com/auth/calendar']
-            
-            # credentials.jsonの存在確認
-            import os
-            if not os.path.exists('credentials.json'):
-                raise FileNotFoundError("credentials.jsonファイルが見つかりません")
-            
-            flow = Flow.from_client_secrets_file('credentials.json', scopes=SCOPES)
-            # リダイレクトURIを環境変数から取得
-            base_url = os.getenv('BASE_URL')
-            if not base_url:
-                raise ValueError("BASE_URL環境変数が設定されていません")
-            # 末尾のスラッシュを削除してから結合
-            base_url = base_url.rstrip('/')
-            flow.redirect_uri = base_url + '/oauth2callback'
+            flow = _new_flow()
             
             # デバッグ用ログ（リダイレクトURIを表示）
-            logger.info(f"[DEBUG] 設定されたリダイレクトURI: {flow.redirect_uri}")
-            logger.info(f"[DEBUG] BASE_URL: {base_url}")
+            logger.debug("設定されたリダイレクトURI: %s", flow.redirect_uri)
             
             # stateは引数を渡さず戻り値を使用
             auth_url, state = flow.authorization_url(
                 access_type='offline',
                 prompt='consent',
             )
-            logger.info(f"[DEBUG] Google認証URL生成: auth_url={auth_url[:100]}...")
-            logger.info(f"[DEBUG] OAuth state: {state}")
+            logger.debug("Google認証URL生成: auth_url=%s...", auth_url[:100])
+            logger.debug("OAuth state: %s", state)
             
             # stateとline_user_idをDBに保存
             db_helper.save_oauth_state(state, line_user_id)
-            logger.info(f"[DEBUG] OAuth stateをDBに保存完了")
+            logger.debug("OAuth stateをDBに保存完了")
             
             # ワンタイムコードを使用済みにマーク（リダイレクト直前に実行）
             db_helper.mark_onetime_used(code)
-            logger.info(f"[DEBUG] ワンタイムコードを使用済みにマーク: {code}")
+            logger.debug("ワンタイムコードを使用済みにマーク: %s", code)
             
-            logger.info(f"[DEBUG] Google認証ページにリダイレクト開始")
+            logger.debug("Google認証ページにリダイレクト開始")
             response = redirect(auth_url)
-            logger.info(f"[DEBUG] リダイレクトレスポンス: status_code={response.status_code}, location={response.headers.get('Location', 'None')}")
+            logger.debug("リダイレクトレスポンス: status_code=%s, location=%s", response.status_code, response.headers.get('Location', 'None'))
             return response
         except Exception as e:
             logging.error(f"Google OAuth認証エラー: {e}")
             import traceback
             logging.error(f"エラー詳細: {traceback.format_exc()}")
-            html = '''
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>認証エラー</title>
-                <meta charset="utf-8">
-                <style>
-                    body { font-family: Arial, sans-serif; max-width: 500px; margin: 50px auto; padding: 20px; }
-                    .error { color: red; margin: 20px 0; }
-                </style>
-            </head>
-            <body>
-                <h1>認証エラー</h1>
-                <div class="error">
-                    Google認証の初期化に失敗しました。<br>
-                    しばらく時間をおいて再度お試しください。<br><br>
-                    エラー詳細: {{ error_message }}
-                </div>
-            </body>
-            </html>
-            '''
-            return render_template_string(html, error_message=str(e))
+            return _OAUTH_INIT_ERROR_TMPL.render(error_message=str(e))
 
 @app.route('/oauth2callback')
 def oauth2callback():
@@ -449,109 +596,65 @@ def oauth2callback():
             return make_response("認証セッションが無効です", 400)
         
         # 有効期限チェック
-        from datetime import datetime, timezone
-        if datetime.fromisoformat(record['expires_at']) < datetime.now(timezone.utc):
+        if record['expires_at_epoch'] < time.time():
             return make_response("認証セッションが期限切れです", 400)
         
         line_user_id = record['line_user_id']
         
         # 新たにflowを生成
-        SCOPES = ['https://www.googleapis.com/auth/calendar']
-        
-        # credentials.jsonの存在確認
-        import os
-        if not os.path.exists('credentials.json'):
-            raise FileNotFoundError("credentials.jsonファイルが見つかりません")
-        
-        flow = Flow.from_client_secrets_file('credentials.json', scopes=SCOPES)
-        # リダイレクトURIを環境変数から取得
-        base_url = os.getenv('BASE_URL')
-        if not base_url:
-            raise ValueError("BASE_URL環境変数が設定されていません")
-        # 末尾のスラッシュを削除してから結合
-        base_url = base_url.rstrip('/')
-        flow.redirect_uri = base_url + '/oauth2callback'
+        flow = _new_flow()
         
         # デバッグ用ログ（リダイレクトURIを表示）
-        logger.info(f"[DEBUG] oauth2callback リダイレクトURI: {flow.redirect_uri}")
-        logger.info(f"[DEBUG] oauth2callback BASE_URL: {base_url}")
+        logger.debug("oauth2callback リダイレクトURI: %s", flow.redirect_uri)
         
         # 認証コードを取得してトークンを交換（Flowはスコープ検証不要）
-        logger.info(f"[DEBUG] fetch_token開始: request.url={request.url}")
-        import warnings
-        # Warningを無視する設定
-        with warnings.catch_warnings():
-            warnings.filterwarnings('ignore')
-            try:
-                flow.fetch_token(authorization_response=request.url)
-                logger.info(f"[DEBUG] fetch_token成功")
-            except Warning as w:
-                # oauthlibがWarningを例外としてraiseしている場合の処理
-                logger.warning(f"[DEBUG] スコープ警告を無視して処理を継続: {w}")
-                # Warning発生時は常に新規Flowを作成して再取得
-                logger.info(f"[DEBUG] 新規Flowを作成して再取得")
-                # 新しいFlowを作成
-                flow2 = Flow.from_client_secrets_file('credentials.json', scopes=SCOPES)
-                flow2.redirect_uri = flow.redirect_uri
-                logger.info(f"[DEBUG] flow2作成完了、fetch_token開始")
-                with warnings.catch_warnings():
-                    warnings.filterwarnings('ignore')
-                    flow2.fetch_token(authorization_response=request.url)
-                logger.info(f"[DEBUG] flow2.fetch_token成功")
-                logger.info(f"[DEBUG] flow2に置き換え")
-                flow = flow2
-        logger.info(f"[DEBUG] fetch_token完了")
+        logger.debug("fetch_token開始: request.url=%s", request.url)
+        flow.fetch_token(authorization_response=request.url)
+        logger.debug("fetch_token完了")
         
         credentials = flow.credentials
-        logger.info(f"[DEBUG] 認証情報取得完了: credentials={credentials is not None}")
+        logger.debug("認証情報取得完了: credentials=%s", credentials is not None)
         
-        # トークンをJSON形式でDBに保存
+        # トークンをJSON形式でDBに保存し、ワンタイムコードの消込とOAuth stateの削除もまとめて行う
         token_json = credentials.to_json()
-        db_helper.save_google_token(line_user_id, token_json.encode('utf-8'))
-        logger.info(f"[DEBUG] トークンをDBに保存完了（JSON形式）")
-        
-        # ワンタイムコードを使用済みに（line_user_idから消込）
-        db_helper.mark_onetime_used_by_line_user(line_user_id)
-        logger.info(f"[DEBUG] ワンタイムコードを使用済みにマーク完了")
-        
-        # OAuth stateを削除（使用済み）
-        db_helper.delete_oauth_state(state)
-        logger.info(f"[DEBUG] OAuth stateを削除完了")
+        db_helper.finalize_oauth(line_user_id, token_json.encode('utf-8'), state)
+        invalidate_auth(line_user_id)
+        if line_bot_handler.calendar_service is not None:
+            line_bot_handler.calendar_service.invalidate_calendar_service(line_user_id)
+        logger.debug("トークン保存・ワンタイムコード消込・OAuth state削除完了")
         
         # 認証完了画面
         html = "<h2>Google認証が完了しました。LINEに戻って操作を続けてください。</h2>"
-        logger.info(f"[DEBUG] 認証完了画面を返却")
+        logger.debug("認証完了画面を返却")
         return make_response(html, 200)
     except Exception as e:
         import traceback
         traceback.print_exc()
         return make_response(f"OAuth2コールバックエラー: {e}", 400)
 
-@app.route('/debug/ai_test', methods=['GET', 'POST'])
+@debug_route('/debug/ai_test', methods=['GET', 'POST'])
 def debug_ai_test():
     """AI抽出機能のデバッグ用エンドポイント"""
-    if not ENABLE_DEBUG_ENDPOINTS:
-        return ("Not Found", 404)
-    from flask import render_template_string, request, jsonify
+    from flask import render_template_string, request
     
     if request.method == 'POST':
         try:
             text = request.form.get('text', '')
             if not text:
-                return jsonify({"error": "テキストが入力されていません"})
+                return _json_response({"error": "テキストが入力されていません"})
             
             # AIサービスでテスト
             ai_service = AIService()
             result = ai_service.extract_dates_and_times(text)
             
-            return jsonify({
+            return _json_response({
                 "input": text,
                 "result": result,
                 "success": True
             })
             
         except Exception as e:
-            return jsonify({
+            return _json_response({
                 "error": str(e),
                 "success": False
             })
@@ -618,86 +721,171 @@ def debug_ai_test():
     """
     return render_template_string(test_form)
 
+@debug_route('/debug/ai_cache', methods=['GET'])
+def debug_ai_cache():
+    """AI応答キャッシュのヒット状況を返すデバッグ用エンドポイント"""
+    if line_bot_handler.ai_service is None:
+        return _json_response({'error': 'AIサービスが初期化されていません'}), 503
+    return _json_response(line_bot_handler.ai_service.cache_info())
+
+@debug_route('/debug/message_queue', methods=['GET'])
+def debug_message_queue():
+    """メッセージキューの滞留数と受付・破棄件数を返すデバッグ用エンドポイント"""
+    with _message_stats_lock:
+        stats = dict(_message_stats)
+    stats.update(depth=_message_queue.qsize(), capacity=MESSAGE_QUEUE_SIZE, workers=MESSAGE_WORKERS)
+    return _json_response(stats)
+
+# 日次予定送信はリクエストスレッドを塞がないようバックグラウンドで1件ずつ実行する
+_agenda_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='daily_agenda')
+_agenda_lock = threading.Lock()
+_agenda_future = None
+
+def _log_agenda_result(future):
+    if future.exception() is not None:
+        logger.error("send_daily_agenda failed", exc_info=future.exception())
+
 @app.route('/api/send_daily_agenda', methods=['POST'])
 def api_send_daily_agenda():
     import os
-    from flask import request, jsonify
+    from flask import request
     secret_token = os.environ.get('DAILY_AGENDA_SECRET_TOKEN')
     req_token = request.headers.get('X-Auth-Token')
     if not secret_token or req_token != secret_token:
-        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
-    try:
-        send_daily_agenda()
-        return jsonify({'status': 'ok'})
-    except Exception as e:
-        logger.exception("send_daily_agenda failed")
-        return jsonify({'status': 'error', 'message': 'internal error'}), 500
+        return _json_response({'status': 'error', 'message': 'Forbidden'}), 403
+    global _agenda_future
+    with _agenda_lock:
+        # 実行中のジョブがあれば二重に投入しない（送信済みチェックはsend_daily_agenda側でも行う）
+        if _agenda_future is not None and not _agenda_future.done():
+            return _json_response({'status': 'running'}), 202
+        _agenda_future = _agenda_executor.submit(send_daily_agenda)
+        _agenda_future.add_done_callback(_log_agenda_result)
+    return _json_response({'status': 'queued'}), 202
 
-@app.route('/api/debug_users', methods=['POST'])
+@debug_route('/api/debug_users', methods=['POST'])
 def api_debug_users():
-    if not ENABLE_DEBUG_ENDPOINTS:
-        return ("Not Found", 404)
     import os
-    from flask import request, jsonify
+    from flask import request
     secret_token = os.environ.get('DAILY_AGENDA_SECRET_TOKEN')
     req_token = request.headers.get('X-Auth-Token')
     if not secret_token or req_token != secret_token:
-        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
-    from db import DBHelper
-    db = DBHelper()
-    c = db.conn.cursor()
-    c.execute('SELECT line_user_id, LENGTH(google_token), created_at, updated_at FROM users')
-    rows = c.fetchall()
-    return jsonify({'users': rows})
-
-@app.route('/api/debug_google_account', methods=['POST'])
+        return _json_response({'status': 'error', 'message': 'Forbidden'}), 403
+    
+    def generate():
+        # 全件をメモリに載せず、サーバーサイドカーソルで少しずつ読みながらJSONを返す
+        yield b'{"users": ['
+        with db_helper.cursor(name='debug_users', itersize=500) as c:
+            c.execute('SELECT line_user_id, LENGTH(google_token), created_at, updated_at FROM users')
+            for i, row in enumerate(c):
+                yield (b',' if i else b'') + _json_dumps(row)
+        yield b']}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+# Google Calendar APIクライアントはGoogleCalendarService側でユーザーごとにキャッシュされるため、同じインスタンスを使い回す
+_debug_calendar_service = None
+
+def _calendar_service_instance():
+    global _debug_calendar_service
+    if line_bot_handler.calendar_service is not None:
+        return line_bot_handler.calendar_service
+    if _debug_calendar_service is None:
+        _debug_calendar_service = GoogleCalendarService()
+    return _debug_calendar_service
+
+def _fetch_google_account(calendar_service, line_user_id):
+    """primaryカレンダーの情報からGoogleアカウント情報を取得（DBに保存済みならAPIを呼ばない）"""
+    saved = db_helper.get_google_account_info(line_user_id)
+    if saved:
+        return {
+            'email': saved['email'],
+            'summary': saved['calendar_summary'],
+            'time_zone': saved['time_zone'],
+            'access_role': saved['access_role']
+        }
+    
+    service = calendar_service._get_calendar_service(line_user_id)
+    
+    # primaryカレンダーの情報を取得
+    try:
+        calendar = service.calendarList().get(calendarId='primary').execute()
+    except HttpError as http_error:
+        # トークンが失効していればキャッシュを捨てて次回作り直す
+        if http_error.resp.status == 401:
+            calendar_service.invalidate_calendar_service(line_user_id)
+        raise
+    
+    # メールアドレスを取得（idまたはsummaryから）
+    email = calendar.get('id', '')
+    if '@' not in email:
+        email = calendar.get('summary', '')
+    
+    account_info = {
+        'email': email,
+        'summary': calendar.get('summary', ''),
+        'time_zone': calendar.get('timeZone', ''),
+        'access_role': calendar.get('accessRole', '')
+    }
+    db_helper.save_google_account_info(line_user_id, dict(account_info, calendar_summary=account_info['summary']))
+    return account_info
+
+@debug_route('/api/debug_google_account', methods=['POST'])
 def api_debug_google_account():
     """指定されたLINEユーザーIDのGoogleアカウント情報を取得"""
-    if not ENABLE_DEBUG_ENDPOINTS:
-        return ("Not Found", 404)
     import os
-    from flask import request, jsonify
+    from flask import request
     secret_token = os.environ.get('DAILY_AGENDA_SECRET_TOKEN')
     req_token = request.headers.get('X-Auth-Token')
     if not secret_token or req_token != secret_token:
-        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
+        return _json_response({'status': 'error', 'message': 'Forbidden'}), 403
     
     line_user_id = request.json.get('line_user_id') if request.is_json else request.form.get('line_user_id')
     if not line_user_id:
-        return jsonify({'status': 'error', 'message': 'line_user_id is required'}), 400
+        return _json_response({'status': 'error', 'message': 'line_user_id is required'}), 400
     
     try:
-        from calendar_service import GoogleCalendarService
-        calendar_service = GoogleCalendarService()
-        service = calendar_service._get_calendar_service(line_user_id)
-        
-        # primaryカレンダーの情報を取得
-        calendar = service.calendarList().get(calendarId='primary').execute()
-        
-        # メールアドレスを取得（idまたはsummaryから）
-        email = calendar.get('id', '')
-        if '@' not in email:
-            email = calendar.get('summary', '')
-        
-        return jsonify({
+        return _json_response({
             'status': 'success',
             'line_user_id': line_user_id,
-            'google_account': {
-                'email': email,
-                'summary': calendar.get('summary', ''),
-                'time_zone': calendar.get('timeZone', ''),
-                'access_role': calendar.get('accessRole', '')
-            }
+            'google_account': _fetch_google_account(_calendar_service_instance(), line_user_id)
         })
     except Exception as e:
         logger.error(f"Googleアカウント情報取得エラー: {e}")
         import traceback
-        return jsonify({
+        return _json_response({
             'status': 'error',
             'message': str(e),
             'traceback': traceback.format_exc()
         }), 500
 
+@debug_route('/api/debug_google_accounts', methods=['POST'])
+def api_debug_google_accounts():
+    """複数のLINEユーザーIDのGoogleアカウント情報を1回のリクエストでまとめて取得（ユーザーごとの失敗は結果に含めて返す）"""
+    import os
+    from flask import request
+    secret_token = os.environ.get('DAILY_AGENDA_SECRET_TOKEN')
+    req_token = request.headers.get('X-Auth-Token')
+    if not secret_token or req_token != secret_token:
+        return _json_response({'status': 'error', 'message': 'Forbidden'}), 403
+    
+    line_user_ids = request.json.get('line_user_ids') if request.is_json else request.form.getlist('line_user_ids')
+    if not line_user_ids or not isinstance(line_user_ids, list):
+        return _json_response({'status': 'error', 'message': 'line_user_ids is required'}), 400
+    
+    calendar_service = _calendar_service_instance()
+    results = {}
+    for line_user_id in line_user_ids:
+        try:
+            results[line_user_id] = {
+                'status': 'success',
+                'google_account': _fetch_google_account(calendar_service, line_user_id)
+            }
+        except Exception as e:
+            logger.error(f"Googleアカウント情報取得エラー: {line_user_id}: {e}")
+            results[line_user_id] = {'status': 'error', 'message': str(e)}
+    
+    return _json_response({'status': 'success', 'results': results})
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     logger.info("LINE Calendar Bot を起動しています...")
@@ -710,5 +898,5 @@ if __name__ == "__main__":
     logger.info(f"Requests バージョン: {requests.__version__}")
     logger.info(f"urllib3 バージョン: {urllib3.__version__}")
     
-    # Railwayはgunicornで起動するため、ローカル用途のみ
+    # 開発サーバーはローカル用途のみ（本番は Procfile の gunicorn -c gunicorn.conf.py で起動する）
     app.run(debug=False, host='0.0.0.0', port=port) 
\ No newline at end of file
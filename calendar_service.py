@@ -1,15 +1,44 @@
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient import discovery_cache
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import os
+import copy
+import json
 import pickle
-import pytz
+import traceback
+from zoneinfo import ZoneInfo
 from config import Config
 from dateutil import parser
 from db import DBHelper
+from http_session import get_http_session
 import logging
+import threading
+import functools
+from bisect import bisect_left
+from cachetools import LRUCache, TTLCache
+
+JST = ZoneInfo('Asia/Tokyo')
+UTC = ZoneInfo('UTC')
+
+# events.listの結果（プロセス全体で共有）。短い会話の中で同じ時間範囲を何度も問い合わせないよう30秒だけ保持する
+_EVENTS_CACHE = TTLCache(maxsize=2048, ttl=30)
+_EVENTS_CACHE_LOCK = threading.Lock()
+
+# events.listで返させる項目（アプリで使うのは開始・終了・タイトル・場所だけなので、参加者やリマインダーなどは受け取らない）
+_EVENT_FIELDS = 'items(start(dateTime,date),end(dateTime,date),summary,location),nextPageToken'
+
+# get_events_for_time_ranges()で、全範囲がこの幅に収まるとき（または各範囲の合計の2倍以内のとき）はバッチにせず1回のevents.listで取得する
+SINGLE_QUERY_WINDOW = timedelta(days=1)
+
+# 有効期限までの残りがこれを切った認証情報は、リクエストの外でリフレッシュしておく
+PROACTIVE_REFRESH_WINDOW = timedelta(minutes=10)
+
+# メモリに保持する認証情報の上限（超えたら最近使っていないユーザーから捨て、次回はDBから読み直す）
+CREDENTIALS_CACHE_SIZE = 1024
 
 logger = logging.getLogger("calendar_service")
 logger.setLevel(logging.INFO)
@@ -19,12 +48,73 @@ if not logger.hasHandlers():
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
+@functools.lru_cache(maxsize=1)
+def _calendar_discovery_doc():
+    """Calendar APIのディスカバリドキュメント（ライブラリ同梱のJSONを1回だけ読み込んでパースし、以降のサービス構築で使い回す）"""
+    return json.loads(discovery_cache.get_static_doc('calendar', 'v3'))
+
+def _build_calendar(credentials):
+    return build_from_document(_calendar_discovery_doc(), credentials=credentials)
+
+def _iso_no_z(dt):
+    """APIに渡すISO文字列（タイムゾーン付きならそのまま、なければUTCとしてZを付与）"""
+    s = dt.isoformat()
+    return s if dt.tzinfo is not None else s + 'Z'
+
+def _event_span_jst(event):
+    """イベントの開始・終了をJSTのdatetimeで返す（終日イベントはJSTの0:00として扱う）"""
+    def parse(value):
+        if 'dateTime' in value:
+            return datetime.fromisoformat(value['dateTime']).astimezone(JST)
+        return datetime.fromisoformat(value['date']).replace(tzinfo=JST)
+    return parse(event['start']), parse(event['end'])
+
+def _bucket_by_overlap(spans, ranges):
+    """範囲ごとに、重なる(開始, 終了)のインデックスを元の順番で返す
+    開始時刻でソートして二分探索し、各範囲では重なりうる区間だけを調べる（予定数×範囲数の総当たりをしない）"""
+    order = sorted(range(len(spans)), key=lambda i: spans[i][0])
+    starts = [spans[i][0] for i in order]
+    longest = max((end - start for start, end in spans), default=timedelta())
+    buckets = []
+    for range_start, range_end in ranges:
+        # range_start - longest より前に始まる予定は range_start までに終わっているので調べない
+        lo = bisect_left(starts, range_start - longest)
+        hi = bisect_left(starts, range_end)
+        buckets.append(sorted(i for i in order[lo:hi] if spans[i][1] > range_start))
+    return buckets
+
+def _event_info(event):
+    """APIのイベントをアプリ内で使う形式に変換"""
+    # 同じキーを何度も引かないよう、start/endは一度だけ取り出す
+    start, end = event['start'], event['end']
+    start_date_time = start.get('dateTime')
+    return {
+        'title': event.get('summary', 'タイトルなし'),
+        'start': start_date_time or start.get('date'),
+        'end': end.get('dateTime') or end.get('date'),
+        'location': event.get('location', ''),
+        # 終日イベントかどうかを判定
+        'is_all_day': start_date_time is None and 'date' in start
+    }
+
 class GoogleCalendarService:
-    def __init__(self):
+    def __init__(self, db_helper=None):
         self.SCOPES = ['https://www.googleapis.com/auth/calendar']
-        self.db_helper = DBHelper()
+        # 呼び出し側のDBHelperがあればそれを使い、接続プールを増やさない
+        self.db_helper = db_helper or DBHelper()
+        # 1つのインスタンスをメッセージ処理の全ワーカースレッドで共有するため、DBHelper（接続を1本保持している）の呼び出しを直列化する
+        self._db_lock = threading.Lock()
         self.creds = None
         self.service = None
+        # ユーザーごとの認証情報（期限切れになるまでDBから読み直さない）
+        # 構築済みのサービスはhttplib2.Httpを1つ抱えていてスレッドセーフではないため、キャッシュせず呼び出しごとに作る
+        self._cred_cache = LRUCache(maxsize=CREDENTIALS_CACHE_SIZE)
+        self._cred_lock = threading.RLock()
+        # リフレッシュ後にDBへ保存したトークンの有効期限（短時間に重複して保存しない）
+        self._last_saved_expiry = LRUCache(maxsize=CREDENTIALS_CACHE_SIZE)
+        # 期限切れが近いトークンのリフレッシュ（Googleのトークンエンドポイントへの通信を応答待ちの経路に載せない）
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2)
+        self._refresh_in_flight = {}
         self._authenticate()
     
     def _authenticate(self):
@@ -35,145 +125,195 @@ class GoogleCalendarService:
                 self.creds = pickle.load(token)
             # 有効な認証情報がない場合はWebフローで認証する（run_local_serverは呼ばない）
             if self.creds and self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
+                self.creds.refresh(Request(session=get_http_session()))
         else:
             self.creds = None
         
         if self.creds:
-            self.service = build('calendar', 'v3', credentials=self.creds)
+            self.service = _build_calendar(self.creds)
         else:
             self.service = None  # 認証情報がなければserviceはNoneのまま
     
     def _get_user_credentials(self, line_user_id):
-        """ユーザーの認証トークンをDBから取得"""
+        """ユーザーの認証トークンをDBから取得（有効期限内の認証情報はメモリにキャッシュし、DB読み込みとデシリアライズを省く）"""
+        with self._cred_lock:
+            credentials = self._cred_cache.get(line_user_id)
+            if credentials is not None and not credentials.expired:
+                self._schedule_refresh_if_expiring(line_user_id, credentials)
+                return credentials
+            in_flight = self._refresh_in_flight.get(line_user_id)
+        if in_flight is not None:
+            # 期限切れまでにバックグラウンドのリフレッシュが終わらなかった場合だけ完了を待つ
+            try:
+                in_flight.result(timeout=10)
+            except Exception as e:
+                logger.debug("バックグラウンドのリフレッシュ待ちでエラー: %s", e)
+            # リフレッシュ結果はキャッシュに差し替えられるので読み直す（待っている間にinvalidate_calendar_serviceで消えていればNone）
+            with self._cred_lock:
+                credentials = self._cred_cache.get(line_user_id)
+            if credentials is not None and not credentials.expired:
+                return credentials
         try:
-            print(f"[DEBUG] _get_user_credentials開始: line_user_id={line_user_id}")
-            token_data = self.db_helper.get_google_token(line_user_id)
-            print(f"[DEBUG] DBから取得したトークンデータ: {token_data is not None}")
+            logger.debug("_get_user_credentials開始: line_user_id=%s", line_user_id)
+            with self._db_lock:
+                token_data = self.db_helper.get_google_token(line_user_id)
+            logger.debug("DBから取得したトークンデータ: %s", token_data is not None)
             
             if not token_data:
-                print(f"[DEBUG] トークンデータが取得できませんでした")
+                logger.debug("トークンデータが取得できませんでした")
                 return None
             
             # トークンデータの型を確認
-            print(f"[DEBUG] トークンデータの型: {type(token_data)}")
+            logger.debug("トークンデータの型: %s", type(token_data))
             if hasattr(token_data, '__len__'):
-                print(f"[DEBUG] トークンデータの長さ: {len(token_data)}")
+                logger.debug("トークンデータの長さ: %s", len(token_data))
             
             credentials = None
             
-            # まずpickle形式で試行
+            # memoryviewやその他の型の場合はbytesに変換
+            if isinstance(token_data, (bytes, bytearray)):
+                token_bytes = bytes(token_data)
+            elif hasattr(token_data, 'tobytes'):
+                token_bytes = token_data.tobytes()
+            elif isinstance(token_data, str):
+                token_bytes = token_data.encode('utf-8')
+            else:
+                token_bytes = bytes(token_data)
+            
+            # まずJSON形式で試行（pickleは旧形式のトークンを読むときだけ使う）
             try:
-                print(f"[DEBUG] pickle形式のトークンデータのデシリアライズ開始")
-                if isinstance(token_data, (bytes, bytearray)):
-                    credentials = pickle.loads(token_data)
-                else:
-                    # memoryviewやその他の型の場合はbytesに変換
-                    if hasattr(token_data, 'tobytes'):
-                        token_bytes = token_data.tobytes()
-                    else:
-                        token_bytes = bytes(token_data)
-                    credentials = pickle.loads(token_bytes)
-                print(f"[DEBUG] pickle形式のトークンデータのデシリアライズ完了: credentials={credentials is not None}")
+                logger.debug("JSON形式のトークンデータのパース開始")
+                token_dict = json.loads(token_bytes.decode('utf-8'))
+                credentials = Credentials.from_authorized_user_info(token_dict, scopes=self.SCOPES)
+                logger.debug("JSON形式からCredentialsオブジェクト作成完了")
                 
-            except Exception as pickle_error:
-                print(f"[DEBUG] pickle形式のトークン読み込みエラー: {pickle_error}")
+            except Exception as json_error:
+                logger.debug("JSON形式のトークン読み込みエラー: %s", json_error)
                 
-                # JSON形式で試行
+                # 旧形式（pickle）のトークンを読み込み、JSON形式で保存し直す
                 try:
-                    print(f"[DEBUG] JSON形式のトークンデータを試行")
-                    import json
-                    from google.oauth2.credentials import Credentials
-                    
-                    # トークンデータを文字列に変換
-                    if isinstance(token_data, (bytes, bytearray)):
-                        token_str = token_data.decode('utf-8')
-                    elif hasattr(token_data, 'tobytes'):
-                        token_str = token_data.tobytes().decode('utf-8')
-                    else:
-                        token_str = str(token_data)
-                    
-                    print(f"[DEBUG] JSON形式のトークンデータを取得")
-                    token_dict = json.loads(token_str)
-                    print(f"[DEBUG] JSON形式のトークンデータのパース完了")
-                    
-                    # Credentialsオブジェクトを作成（scopesを指定）
-                    credentials = Credentials.from_authorized_user_info(
-                        token_dict,
-                        scopes=['https://www.googleapis.com/auth/calendar']
-                    )
-                    print(f"[DEBUG] JSON形式からCredentialsオブジェクト作成完了")
+                    logger.debug("pickle形式のトークンデータのデシリアライズ開始")
+                    credentials = pickle.loads(token_bytes)
+                    logger.debug("pickle形式のトークンデータのデシリアライズ完了: credentials=%s", credentials is not None)
+                    with self._db_lock:
+                        self.db_helper.save_google_token(line_user_id, credentials.to_json().encode('utf-8'))
+                    logger.debug("pickle形式のトークンをJSON形式で保存し直しました")
                     
-                except Exception as json_error:
-                    print(f"[DEBUG] JSON形式のトークン読み込みエラー: {json_error}")
-                    import traceback
+                except Exception as pickle_error:
+                    logger.debug("pickle形式のトークン読み込みエラー: %s", pickle_error)
                     traceback.print_exc()
                     return None
             
             if credentials:
                 # トークンの有効期限をチェック
                 if credentials.expired and credentials.refresh_token:
-                    print(f"[DEBUG] トークンのリフレッシュ開始")
                     try:
-                        credentials.refresh(Request())
-                        print(f"[DEBUG] トークンのリフレッシュ完了")
-                        # 更新されたトークンをJSON形式でDBに保存
-                        updated_token_json = credentials.to_json()
-                        self.db_helper.save_google_token(line_user_id, updated_token_json.encode('utf-8'))
-                        print(f"[DEBUG] 更新されたトークンをDBに保存完了（JSON形式）")
+                        self._refresh_and_save(line_user_id, credentials)
                     except Exception as refresh_error:
-                        print(f"[DEBUG] トークンのリフレッシュエラー: {refresh_error}")
+                        logger.debug("トークンのリフレッシュエラー: %s", refresh_error)
                         # リフレッシュに失敗してもcredentialsは返す
                 
+                if not credentials.expired:
+                    with self._cred_lock:
+                        self._cred_cache[line_user_id] = credentials
+                        self._schedule_refresh_if_expiring(line_user_id, credentials)
                 return credentials
             else:
-                print(f"[DEBUG] 認証情報の作成に失敗しました")
+                logger.debug("認証情報の作成に失敗しました")
                 return None
                 
         except Exception as e:
-            print(f"[DEBUG] _get_user_credentialsで例外発生: {e}")
-            import traceback
+            logger.debug("_get_user_credentialsで例外発生: %s", e)
             traceback.print_exc()
             return None
     
+    def _refresh_and_save(self, line_user_id, credentials):
+        """認証情報をリフレッシュしてキャッシュし、DBへJSON形式で保存する"""
+        logger.debug("トークンのリフレッシュ開始")
+        credentials.refresh(Request(session=get_http_session()))
+        logger.debug("トークンのリフレッシュ完了")
+        with self._cred_lock:
+            self._cred_cache[line_user_id] = credentials
+            # 直近に保存した有効期限と60秒以内の差しかなければ（同時にリフレッシュされた場合など）保存を省く
+            last_saved = self._last_saved_expiry.get(line_user_id)
+            should_save = (
+                last_saved is None or credentials.expiry is None
+                or abs((credentials.expiry - last_saved).total_seconds()) > 60
+            )
+            if should_save:
+                self._last_saved_expiry[line_user_id] = credentials.expiry
+        if should_save:
+            # 更新されたトークンをJSON形式でDBに保存
+            updated_token_json = credentials.to_json()
+            with self._db_lock:
+                self.db_helper.save_google_token(line_user_id, updated_token_json.encode('utf-8'))
+            logger.debug("更新されたトークンをDBに保存完了（JSON形式）")
+    
+    def _schedule_refresh_if_expiring(self, line_user_id, credentials):
+        """有効期限が近い認証情報をバックグラウンドでリフレッシュする（ユーザーごとに同時に1件まで）"""
+        if not credentials.refresh_token or credentials.expiry is None:
+            return
+        # google-authのexpiryはタイムゾーンなしのUTC
+        if credentials.expiry - datetime.now(UTC).replace(tzinfo=None) >= PROACTIVE_REFRESH_WINDOW:
+            return
+        with self._cred_lock:
+            if line_user_id in self._refresh_in_flight:
+                return
+            # ロックを保持したまま登録するので、完了時のpopが登録より先に走ることはない
+            self._refresh_in_flight[line_user_id] = self._refresh_executor.submit(
+                self._background_refresh, line_user_id, credentials
+            )
+    
+    def _background_refresh(self, line_user_id, credentials):
+        try:
+            # 他のスレッドが使用中のCredentialsは書き換えず、コピーをリフレッシュしてキャッシュを差し替える
+            self._refresh_and_save(line_user_id, copy.copy(credentials))
+        except Exception as e:
+            logger.warning(f"[WARN] バックグラウンドでのトークンのリフレッシュに失敗: {e}")
+        finally:
+            with self._cred_lock:
+                self._refresh_in_flight.pop(line_user_id, None)
+    
     def _get_calendar_service(self, line_user_id):
-        """ユーザーごとのGoogle Calendarサービスを取得"""
+        """ユーザーごとのGoogle Calendarサービスを取得（認証情報はキャッシュから取り、サービスは呼び出しごとに構築する。
+        ディスカバリドキュメントはパース済みなので構築は軽く、スレッド間でhttplib2.Httpを共有しない）"""
         try:
-            print(f"[DEBUG] _get_calendar_service開始: line_user_id={line_user_id}")
+            logger.debug("_get_calendar_service開始: line_user_id=%s", line_user_id)
             credentials = self._get_user_credentials(line_user_id)
-            print(f"[DEBUG] 認証情報取得結果: credentials={credentials is not None}")
+            logger.debug("認証情報取得結果: credentials=%s", credentials is not None)
             
             if not credentials:
-                print(f"[DEBUG] 認証情報が取得できませんでした")
+                logger.debug("認証情報が取得できませんでした")
                 raise Exception("ユーザーの認証トークンが見つかりません。認証を完了してください。")
             
-            print(f"[DEBUG] Google Calendar APIサービス構築開始")
-            service = build('calendar', 'v3', credentials=credentials)
-            print(f"[DEBUG] Google Calendar APIサービス構築完了")
+            logger.debug("Google Calendar APIサービス構築開始")
+            service = _build_calendar(credentials)
+            logger.debug("Google Calendar APIサービス構築完了")
             return service
             
         except Exception as e:
-            print(f"[DEBUG] _get_calendar_serviceで例外発生: {e}")
-            import traceback
+            logger.debug("_get_calendar_serviceで例外発生: %s", e)
             traceback.print_exc()
             raise e
     
+    def invalidate_calendar_service(self, line_user_id):
+        """キャッシュした認証情報を破棄（再認証やトークン失効時に呼ぶ）"""
+        with self._cred_lock:
+            self._cred_cache.pop(line_user_id, None)
+    
     def check_availability(self, start_time, end_time):
         """指定された時間帯の空き時間を確認します"""
         try:
             if not self.service:
                 return None, "Google認証が必要です。"
-            # ISO文字列がタイムゾーン付きかどうかでZを付与しない
-            def iso_no_z(dt):
-                s = dt.isoformat()
-                return s if s.endswith(("+09:00", "+00:00", "-0")) else s + "Z"
             # 指定された時間帯のイベントを取得
             events_result = self.service.events().list(
                 calendarId=Config.GOOGLE_CALENDAR_ID,  # 'primary'（各ユーザーのメインカレンダー）
-                timeMin=iso_no_z(start_time),
-                timeMax=iso_no_z(end_time),
+                timeMin=_iso_no_z(start_time),
+                timeMax=_iso_no_z(end_time),
                 singleEvents=True,
-                orderBy='startTime'
+                orderBy='startTime',
+                fields=_EVENT_FIELDS
             ).execute()
             events = events_result.get('items', [])
             if not events:
@@ -181,8 +321,9 @@ class GoogleCalendarService:
             # 既存のイベント情報を取得
             existing_events = []
             for event in events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                end = event['end'].get('dateTime', event['end'].get('date'))
+                event_start, event_end = event['start'], event['end']
+                start = event_start.get('dateTime') or event_start.get('date')
+                end = event_end.get('dateTime') or event_end.get('date')
                 title = event.get('summary', 'タイトルなし')
                 existing_events.append({
                     'title': title,
@@ -193,16 +334,20 @@ class GoogleCalendarService:
         except Exception as e:
             return None, f"エラーが発生しました: {str(e)}"
     
-    def add_event(self, title, start_time, end_time, description="", line_user_id=None, force_add=False):
-        """カレンダーにイベントを追加します"""
+    def add_event(self, title, start_time, end_time, description="", line_user_id=None, force_add=False, precomputed_events=None):
+        """カレンダーにイベントを追加します（直前に取得した同じ時間帯の予定をprecomputed_eventsで渡せば重複チェックの再取得を省く）
+        重複チェックの予定はget_events_for_time_range()と同じ、start/endが文字列の形式で扱う"""
         try:
             if not line_user_id:
                 return False, "ユーザーIDが必要です", None
             service = self._get_calendar_service(line_user_id)
             # 既存の予定をチェック（force_addがFalseのときのみ）
             if not force_add:
-                events = self.get_events_for_time_range(start_time, end_time, line_user_id)
-                logger.info(f"[DEBUG] add_event: 追加前に取得したevents = {events}")
+                if precomputed_events is not None:
+                    events = precomputed_events
+                else:
+                    events = self._find_conflicting_events(service, start_time, end_time)
+                logger.debug("add_event: 追加前に取得したevents = %s", events)
                 if events and len(events) > 0:
                     conflicting_events = []
                     for event in events:
@@ -211,10 +356,10 @@ class GoogleCalendarService:
                             continue
                         conflicting_events.append({
                             'title': event.get('title', '予定なし'),
-                            'start': event['start'].get('dateTime', event['start'].get('date')) if isinstance(event['start'], dict) else event['start'],
-                            'end': event['end'].get('dateTime', event['end'].get('date')) if isinstance(event['end'], dict) else event['end']
+                            'start': event['start'],
+                            'end': event['end']
                         })
-                    logger.info(f"[DEBUG] 既存の予定があるため追加しません: {conflicting_events}")
+                    logger.debug("既存の予定があるため追加しません: %s", conflicting_events)
                     if conflicting_events:
                         return False, "指定された時間に既存の予定があります", conflicting_events
             # イベントを作成
@@ -230,13 +375,14 @@ class GoogleCalendarService:
                     'timeZone': 'Asia/Tokyo',
                 },
             }
-            logger.info(f"[DEBUG] Google Calendar APIへイベント追加リクエスト: {event}")
+            logger.debug("Google Calendar APIへイベント追加リクエスト: %s", event)
             # イベントを追加
             event = service.events().insert(
                 calendarId=Config.GOOGLE_CALENDAR_ID,  # 'primary'（各ユーザーのメインカレンダー）
                 body=event
             ).execute()
-            logger.info(f"[DEBUG] Google Calendar APIレスポンス: {event}")
+            logger.debug("Google Calendar APIレスポンス: %s", event)
+            self._invalidate_events_cache(line_user_id, start_time, end_time)
             return True, "✅予定を追加しました", {
                 'title': title,
                 'start': start_time.isoformat(),
@@ -246,119 +392,180 @@ class GoogleCalendarService:
             logger.error(f"[ERROR] add_eventで例外発生: {e}")
             return False, f"エラーが発生しました: {str(e)}", None
     
+    def _find_conflicting_events(self, service, start_time, end_time):
+        """重複チェック用に時間帯と重なる予定を1件だけ取得（並べ替えを省き、必要な項目だけ返させる）
+        繰り返し予定は展開しないと各回と比較できないため、singleEventsは指定したままにする"""
+        if start_time.tzinfo is None:
+            start_time = start_time.replace(tzinfo=JST)
+        if end_time.tzinfo is None:
+            end_time = end_time.replace(tzinfo=JST)
+        events_result = service.events().list(
+            calendarId=Config.GOOGLE_CALENDAR_ID,
+            timeMin=start_time.astimezone(UTC).isoformat(),
+            timeMax=end_time.astimezone(UTC).isoformat(),
+            singleEvents=True,
+            maxResults=1,
+            fields='items(id,start,end,summary)'
+        ).execute()
+        return [_event_info(event) for event in events_result.get('items', [])]
+    
+    def _invalidate_events_cache(self, line_user_id, start_time, end_time):
+        """追加した予定と重なる時間範囲のevents.listキャッシュを破棄"""
+        if start_time.tzinfo is None:
+            start_time = start_time.replace(tzinfo=JST)
+        if end_time.tzinfo is None:
+            end_time = end_time.replace(tzinfo=JST)
+        with _EVENTS_CACHE_LOCK:
+            for key in list(_EVENTS_CACHE.keys()):
+                user_id, time_min, time_max = key
+                if user_id == line_user_id and datetime.fromisoformat(time_min) < end_time and datetime.fromisoformat(time_max) > start_time:
+                    _EVENTS_CACHE.pop(key, None)
+    
     def get_events_for_dates(self, dates, line_user_id=None):
-        """指定された日付のイベントを取得します（ユーザーごとの認証トークン対応、JST日付で正確に抽出）"""
-        import pytz
-        events_info = []
-        jst = pytz.timezone('Asia/Tokyo')
+        """指定された日付のイベントを取得します（ユーザーごとの認証トークン対応、JST日付で正確に抽出）
+        
+        日付ごとにAPIを呼ぶのではなく、日付が連続していれば最初の日付の0:00〜最後の日付の翌0:00を1回のevents().listで取得してJST日付ごとに振り分け、
+        飛び飛びの日付ならBatchHttpRequestで日付ごとのリクエストを1回のHTTP通信にまとめます。
+        """
+        # JST 0:00〜翌日0:00の区間（日付ごと）
+        day_ranges = {}
         for date in dates:
-            # JST 0:00〜翌日0:00をUTCに変換
-            start_of_day_jst = jst.localize(datetime.combine(date, datetime.min.time()))
-            end_of_day_jst = start_of_day_jst + timedelta(days=1)
-            start_of_day_utc = start_of_day_jst.astimezone(pytz.UTC)
-            end_of_day_utc = end_of_day_jst.astimezone(pytz.UTC)
-            try:
-                service = self._get_calendar_service(line_user_id) if line_user_id else self.service
-                if not service:
-                    events_info.append({
-                        'date': date.strftime('%Y-%m-%d'),
-                        'events': [],
-                        'error': 'Google認証が必要です。'
-                    })
-                    continue
-                events_result = service.events().list(
-                    calendarId=Config.GOOGLE_CALENDAR_ID,
-                    timeMin=start_of_day_utc.isoformat(),
-                    timeMax=end_of_day_utc.isoformat(),
-                    singleEvents=True,
-                    orderBy='startTime'
-                ).execute()
-                print(f"[DEBUG] Google Calendar APIレスポンス: {events_result}")
-                events = events_result.get('items', [])
-                if events:
-                    day_events = []
-                    for event in events:
-                        start = event['start'].get('dateTime', event['start'].get('date'))
-                        end = event['end'].get('dateTime', event['end'].get('date'))
-                        title = event.get('summary', 'タイトルなし')
-                        location = event.get('location', '')
-                        # 終日イベントかどうかを判定
-                        is_all_day = 'date' in event['start'] and 'dateTime' not in event['start']
-                        day_events.append({
-                            'title': title,
-                            'start': start,
-                            'end': end,
-                            'location': location,
-                            'is_all_day': is_all_day
-                        })
-                    events_info.append({
-                        'date': date.strftime('%Y-%m-%d'),
-                        'events': day_events
-                    })
-                else:
-                    events_info.append({
-                        'date': date.strftime('%Y-%m-%d'),
-                        'events': []
-                    })
-            except Exception as e:
-                events_info.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'error': str(e)
-                })
-        return events_info
+            start_of_day_jst = datetime.combine(date, datetime.min.time(), tzinfo=JST)
+            day_ranges[date] = (start_of_day_jst, start_of_day_jst + timedelta(days=1))
+        if not day_ranges:
+            return []
+        
+        day_events = {date: [] for date in day_ranges}
+        day_errors = {}
+        try:
+            service = self._get_calendar_service(line_user_id) if line_user_id else self.service
+            if not service:
+                return [
+                    {'date': date.strftime('%Y-%m-%d'), 'events': [], 'error': 'Google認証が必要です。'}
+                    for date in dates
+                ]
+            span_days = (max(day_ranges) - min(day_ranges)).days + 1
+            if span_days <= 2 * len(day_ranges):
+                self._fill_events_by_range(service, day_ranges, day_events)
+            else:
+                self._fill_events_by_batch(service, day_ranges, day_events, day_errors)
+        except Exception as e:
+            return [{'date': date.strftime('%Y-%m-%d'), 'error': str(e)} for date in dates]
+        
+        return [
+            {'date': date.strftime('%Y-%m-%d'), 'error': day_errors[date]} if date in day_errors
+            else {'date': date.strftime('%Y-%m-%d'), 'events': day_events[date]}
+            for date in dates
+        ]
     
-    def get_events_for_time_range(self, start_time, end_time, line_user_id):
-        """指定された時間範囲のイベントを取得します"""
+    def _list_events_request(self, service, time_min, time_max):
+        return service.events().list(
+            calendarId=Config.GOOGLE_CALENDAR_ID,
+            timeMin=time_min.astimezone(UTC).isoformat(),
+            timeMax=time_max.astimezone(UTC).isoformat(),
+            singleEvents=True,
+            orderBy='startTime',
+            maxResults=2500,  # 複数日分をまとめて取得するため、既定の250件で切れないようにする
+            fields=_EVENT_FIELDS
+        )
+    
+    def _fill_events_by_range(self, service, day_ranges, day_events):
+        """連続した日付: 全期間を1回で取得し、重なるJST日付すべてに振り分ける（日をまたぐ予定は各日に含める）"""
+        range_start = min(start for start, _ in day_ranges.values())
+        range_end = max(end for _, end in day_ranges.values())
+        events_result = self._list_events_request(service, range_start, range_end).execute()
+        logger.debug("Google Calendar APIレスポンス: %s", events_result)
+        for event in events_result.get('items', []):
+            event_start, event_end = _event_span_jst(event)
+            event_info = None
+            for date, (day_start, day_end) in day_ranges.items():
+                if event_start < day_end and event_end > day_start:
+                    if event_info is None:
+                        event_info = _event_info(event)
+                    day_events[date].append(event_info)
+    
+    def _fill_events_by_batch(self, service, day_ranges, day_events, day_errors):
+        """飛び飛びの日付: 日付ごとのevents().listをBatchHttpRequestで1回のHTTP通信にまとめて送る"""
+        def on_response(request_id, response, exception):
+            date = request_dates[request_id]
+            if exception is not None:
+                day_errors[date] = str(exception)
+                return
+            logger.debug("Google Calendar APIレスポンス: %s", response)
+            day_events[date] = [_event_info(event) for event in response.get('items', [])]
+        
+        request_dates = {}
+        batch = service.new_batch_http_request(callback=on_response)
+        for date, (day_start, day_end) in day_ranges.items():
+            request_id = date.isoformat()
+            request_dates[request_id] = date
+            batch.add(self._list_events_request(service, day_start, day_end), request_id=request_id)
+        batch.execute()
+    
+    def get_events_for_time_range(self, start_time, end_time, line_user_id, service=None):
+        """指定された時間範囲のイベントを取得します（呼び出し元で構築済みのserviceがあれば使い回す）"""
         try:
-            print(f"[DEBUG] get_events_for_time_range開始")
-            print(f"[DEBUG] 入力: start_time={start_time}, end_time={end_time}, line_user_id={line_user_id}")
+            logger.debug("get_events_for_time_range開始")
+            logger.debug("入力: start_time=%s, end_time=%s, line_user_id=%s", start_time, end_time, line_user_id)
             
-            jst = pytz.timezone('Asia/Tokyo')
             # タイムゾーンなしならJSTを付与
             if start_time.tzinfo is None:
-                start_time = jst.localize(start_time)
+                start_time = start_time.replace(tzinfo=JST)
             if end_time.tzinfo is None:
-                end_time = jst.localize(end_time)
+                end_time = end_time.replace(tzinfo=JST)
             
-            print(f"[DEBUG] タイムゾーン調整後: start_time={start_time}, end_time={end_time}")
+            logger.debug("タイムゾーン調整後: start_time=%s, end_time=%s", start_time, end_time)
             
-            service = self._get_calendar_service(line_user_id)
-            print(f"[DEBUG] カレンダーサービス取得完了")
+            if service is None:
+                service = self._get_calendar_service(line_user_id)
+            logger.debug("カレンダーサービス取得完了")
             
             # タイムゾーンをUTCに変換
-            utc_start = start_time.astimezone(pytz.UTC)
-            utc_end = end_time.astimezone(pytz.UTC)
+            utc_start = start_time.astimezone(UTC)
+            utc_end = end_time.astimezone(UTC)
             
-            print(f"[DEBUG] UTC変換後: utc_start={utc_start}, utc_end={utc_end}")
-            print(f"[DEBUG] Google Calendar APIリクエスト: calendarId={Config.GOOGLE_CALENDAR_ID}, timeMin={utc_start.isoformat()}, timeMax={utc_end.isoformat()}")
+            logger.debug("UTC変換後: utc_start=%s, utc_end=%s", utc_start, utc_end)
+            
+            cache_key = (line_user_id, utc_start.isoformat(), utc_end.isoformat())
+            with _EVENTS_CACHE_LOCK:
+                cached = _EVENTS_CACHE.get(cache_key)
+            if cached is not None:
+                logger.debug("キャッシュ済みのイベントを返す: %s件", len(cached))
+                return list(cached)
+            logger.debug("Google Calendar APIリクエスト: calendarId=%s, timeMin=%s, timeMax=%s", Config.GOOGLE_CALENDAR_ID, utc_start.isoformat(), utc_end.isoformat())
             
             events_result = service.events().list(
                 calendarId=Config.GOOGLE_CALENDAR_ID,  # 'primary'（各ユーザーのメインカレンダー）
                 timeMin=utc_start.isoformat(),
                 timeMax=utc_end.isoformat(),
                 singleEvents=True,
-                orderBy='startTime'
+                orderBy='startTime',
+                fields=_EVENT_FIELDS
             ).execute()
             
-            print(f"[DEBUG] Google Calendar APIレスポンス: {events_result}")
+            logger.debug("Google Calendar APIレスポンス: %s", events_result)
             
             events = events_result.get('items', [])
-            print(f"[DEBUG] 取得イベント数: {len(events) if events else 0}")
+            logger.debug("取得イベント数: %s", len(events) if events else 0)
             
             if not events:
-                print(f"[DEBUG] イベントなし、空リストを返す")
+                logger.debug("イベントなし、空リストを返す")
+                with _EVENTS_CACHE_LOCK:
+                    _EVENTS_CACHE[cache_key] = []
                 return []
             
             event_list = []
             for i, event in enumerate(events):
-                print(f"[DEBUG] イベント{i+1}処理: {event}")
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                end = event['end'].get('dateTime', event['end'].get('date'))
+                logger.debug("イベント%s処理: %s", i+1, event)
+                event_start, event_end = event['start'], event['end']
+                start_date_time = event_start.get('dateTime')
+                start = start_date_time or event_start.get('date')
+                end = event_end.get('dateTime') or event_end.get('date')
                 title = event.get('summary', 'タイトルなし')
                 location = event.get('location', '')
                 
                 # 終日イベントかどうかを判定
-                is_all_day = 'date' in event['start'] and 'dateTime' not in event['start']
+                is_all_day = start_date_time is None and 'date' in event_start
                 
                 event_data = {
                     'title': title,
@@ -368,142 +575,215 @@ class GoogleCalendarService:
                     'is_all_day': is_all_day
                 }
                 event_list.append(event_data)
-                print(f"[DEBUG] イベント{i+1}追加: {event_data}")
+                logger.debug("イベント%s追加: %s", i+1, event_data)
+            
+            logger.debug("最終イベントリスト: %s", event_list)
+            with _EVENTS_CACHE_LOCK:
+                _EVENTS_CACHE[cache_key] = event_list
+            return list(event_list)
+            
+        except Exception as e:
+            logger.debug("get_events_for_time_rangeで例外発生: %s", e)
+            traceback.print_exc()
+            logging.error(f"イベント取得エラー: {e}")
+            return []
+    
+    def get_events_for_time_ranges(self, ranges, line_user_id):
+        """複数の時間範囲のイベントをまとめて取得します（キャッシュにない範囲だけを、近ければ1回のevents.listで、離れていればBatchHttpRequestで1回のHTTP通信にまとめて問い合わせる）
+        戻り値はrangesと同じ順番のリストで、各要素はget_events_for_time_range()と同じ形式。取得に失敗した範囲は空リスト"""
+        results = [[] for _ in ranges]
+        try:
+            pending = {}
+            for index, (start_time, end_time) in enumerate(ranges):
+                if start_time.tzinfo is None:
+                    start_time = start_time.replace(tzinfo=JST)
+                if end_time.tzinfo is None:
+                    end_time = end_time.replace(tzinfo=JST)
+                utc_start = start_time.astimezone(UTC)
+                utc_end = end_time.astimezone(UTC)
+                cache_key = (line_user_id, utc_start.isoformat(), utc_end.isoformat())
+                with _EVENTS_CACHE_LOCK:
+                    cached = _EVENTS_CACHE.get(cache_key)
+                if cached is not None:
+                    results[index] = list(cached)
+                else:
+                    pending[str(index)] = (index, cache_key, utc_start, utc_end)
+            if not pending:
+                return results
+            
+            def on_response(request_id, response, exception):
+                index, cache_key, _, _ = pending[request_id]
+                if exception is not None:
+                    logging.error(f"イベント取得エラー: {exception}")
+                    return
+                logger.debug("Google Calendar APIレスポンス: %s", response)
+                store(index, cache_key, [_event_info(event) for event in response.get('items', [])])
             
-            print(f"[DEBUG] 最終イベントリスト: {event_list}")
-            return event_list
+            def store(index, cache_key, event_list):
+                with _EVENTS_CACHE_LOCK:
+                    _EVENTS_CACHE[cache_key] = event_list
+                results[index] = list(event_list)
             
+            service = self._get_calendar_service(line_user_id)
+            window_start = min(utc_start for _, _, utc_start, _ in pending.values())
+            window_end = max(utc_end for _, _, _, utc_end in pending.values())
+            covered = sum((utc_end - utc_start for _, _, utc_start, utc_end in pending.values()), timedelta())
+            if len(pending) > 1 and window_end - window_start <= max(SINGLE_QUERY_WINDOW, 2 * covered):
+                # 近い時間範囲どうしは全体を1回のevents.listで取得して範囲ごとに振り分ける（APIクォータも1回分で済む）
+                events_result = self._list_events_request(service, window_start, window_end).execute()
+                logger.debug("Google Calendar APIレスポンス: %s", events_result)
+                items = events_result.get('items', [])
+                infos = [_event_info(event) for event in items]
+                ranges = [(utc_start, utc_end) for _, _, utc_start, utc_end in pending.values()]
+                buckets = _bucket_by_overlap([_event_span_jst(event) for event in items], ranges)
+                for (index, cache_key, _, _), hits in zip(pending.values(), buckets):
+                    store(index, cache_key, [infos[i] for i in hits])
+                return results
+            batch = service.new_batch_http_request(callback=on_response)
+            for request_id, (_, _, utc_start, utc_end) in pending.items():
+                batch.add(service.events().list(
+                    calendarId=Config.GOOGLE_CALENDAR_ID,
+                    timeMin=utc_start.isoformat(),
+                    timeMax=utc_end.isoformat(),
+                    singleEvents=True,
+                    orderBy='startTime',
+                    fields=_EVENT_FIELDS
+                ), request_id=request_id)
+            batch.execute()
         except Exception as e:
-            print(f"[DEBUG] get_events_for_time_rangeで例外発生: {e}")
-            import traceback
+            logger.debug("get_events_for_time_rangesで例外発生: %s", e)
             traceback.print_exc()
             logging.error(f"イベント取得エラー: {e}")
+        return results
+    
+    def add_events(self, events, line_user_id):
+        """複数の予定を重複チェックなしでまとめて追加します（events.insertをBatchHttpRequestで1回のHTTP通信にまとめて送る）
+        eventsは(title, start_time, end_time, description)のリスト。戻り値は同じ順番の(success, message, result)のリスト"""
+        if not events:
             return []
+        results = [(False, "予定を追加できませんでした", None)] * len(events)
+        try:
+            service = self._get_calendar_service(line_user_id)
+            
+            def on_response(request_id, response, exception):
+                index = int(request_id)
+                title, start_time, end_time, _ = events[index]
+                if exception is not None:
+                    logger.error(f"[ERROR] add_eventsで例外発生: {exception}")
+                    results[index] = (False, f"エラーが発生しました: {str(exception)}", None)
+                    return
+                logger.debug("Google Calendar APIレスポンス: %s", response)
+                self._invalidate_events_cache(line_user_id, start_time, end_time)
+                results[index] = (True, "✅予定を追加しました", {
+                    'title': title,
+                    'start': start_time.isoformat(),
+                    'end': end_time.isoformat()
+                })
+            
+            batch = service.new_batch_http_request(callback=on_response)
+            for index, (title, start_time, end_time, description) in enumerate(events):
+                body = {
+                    'summary': title,
+                    'description': description,
+                    'start': {
+                        'dateTime': start_time.isoformat(),
+                        'timeZone': 'Asia/Tokyo',
+                    },
+                    'end': {
+                        'dateTime': end_time.isoformat(),
+                        'timeZone': 'Asia/Tokyo',
+                    },
+                }
+                logger.debug("Google Calendar APIへイベント追加リクエスト: %s", body)
+                batch.add(service.events().insert(
+                    calendarId=Config.GOOGLE_CALENDAR_ID,
+                    body=body
+                ), request_id=str(index))
+            batch.execute()
+        except Exception as e:
+            logger.error(f"[ERROR] add_eventsで例外発生: {e}")
+            return [
+                result if result[0] else (False, f"エラーが発生しました: {str(e)}", None)
+                for result in results
+            ]
+        return results
     
     def find_free_slots_for_day(self, start_dt, end_dt, events):
         """指定枠(start_dt, end_dt)内で既存予定を除いた空き時間帯リストを返す"""
+        return [
+            {'start': slot_start.strftime('%H:%M'), 'end': slot_end.strftime('%H:%M')}
+            for slot_start, slot_end in self.find_free_spans_for_day(start_dt, end_dt, events)
+        ]
+    
+    def find_free_spans_for_day(self, start_dt, end_dt, events):
+        """find_free_slots_for_day と同じ空き時間帯を、(開始, 終了) のタイムゾーン付きdatetimeで返す
+        （移動時間の加減算など、呼び出し側で時刻を計算するときに文字列から変換し直さずに済む）"""
         try:
-            logger.info(f"[DEBUG] find_free_slots_for_day開始")
-            logger.info(f"[DEBUG] 検索枠: {start_dt} 〜 {end_dt}")
-            logger.info(f"[DEBUG] 既存予定数: {len(events) if events else 0}")
+            logger.debug("find_free_slots_for_day開始")
+            logger.debug("検索枠: %s 〜 %s", start_dt, end_dt)
+            logger.debug("既存予定数: %s", len(events) if events else 0)
             
-            jst = pytz.timezone('Asia/Tokyo')
             if start_dt.tzinfo is None:
-                start_dt = jst.localize(start_dt)
+                start_dt = start_dt.replace(tzinfo=JST)
             if end_dt.tzinfo is None:
-                end_dt = jst.localize(end_dt)
+                end_dt = end_dt.replace(tzinfo=JST)
                 
             # eventsがNoneや空の場合は必ず再取得
             if events is None or len(events) == 0:
-                logger.info(f"[DEBUG] 既存予定なし、全日空き時間として返す")
-                return [{
-                    'start': start_dt.strftime('%H:%M'),
-                    'end': end_dt.strftime('%H:%M')
-                }]
+                logger.debug("既存予定なし、全日空き時間として返す")
+                return [(start_dt, end_dt)]
                 
-            # 既存予定を時間順にbusy_timesへ
+            # 既存予定を枠内に切り詰め、UNIX秒の(開始, 終了)としてbusy_timesへ
             busy_times = []
-            logger.info(f"[DEBUG] 既存予定の処理開始")
+            logger.debug("既存予定の処理開始")
+            frame_start = int(start_dt.timestamp())
+            frame_end = int(end_dt.timestamp())
             
-            for i, event in enumerate(events):
-                logger.info(f"[DEBUG] 予定{i+1}: {event}")
-                
-                start = event['start'] if isinstance(event['start'], str) else event['start'].get('dateTime', event['start'].get('date'))
-                end = event['end'] if isinstance(event['end'], str) else event['end'].get('dateTime', event['end'].get('date'))
-                
-                logger.info(f"[DEBUG] 予定{i+1}の時間: {start} 〜 {end}")
-                
+            for event in events:
+                start, end = event['start'], event['end']
+                if not isinstance(start, str):
+                    start = start.get('dateTime') or start.get('date')
+                if not isinstance(end, str):
+                    end = end.get('dateTime') or end.get('date')
+
                 if 'T' in start:  # dateTime形式
-                    # ISO形式の文字列をパース（タイムゾーン情報を保持）
-                    if start.endswith('Z'):
-                        start_ev = datetime.fromisoformat(start.replace('Z', '+00:00'))
-                    else:
-                        start_ev = datetime.fromisoformat(start)
-                    
-                    if end.endswith('Z'):
-                        end_ev = datetime.fromisoformat(end.replace('Z', '+00:00'))
-                    else:
-                        end_ev = datetime.fromisoformat(end)
-                    
-                    # タイムゾーン情報がない場合はUTCとして扱う
+                    # ISO形式の文字列をパース（タイムゾーン情報がない場合はUTCとして扱う）
+                    start_ev = datetime.fromisoformat(start)
+                    end_ev = datetime.fromisoformat(end)
                     if start_ev.tzinfo is None:
-                        start_ev = pytz.UTC.localize(start_ev)
+                        start_ev = start_ev.replace(tzinfo=UTC)
                     if end_ev.tzinfo is None:
-                        end_ev = pytz.UTC.localize(end_ev)
-                    
-                    # UTCからJSTに変換
-                    start_ev = start_ev.astimezone(jst)
-                    end_ev = end_ev.astimezone(jst)
-                    
-                    logger.info(f"[DEBUG] 予定{i+1}のパース後（JST）: {start_ev} 〜 {end_ev}")
-                    
-                    # 枠外の予定は除外
-                    if end_ev <= start_dt or start_ev >= end_dt:
-                        logger.info(f"[DEBUG] 予定{i+1}は枠外のため除外")
-                        continue
-                        
-                    busy_start = max(start_ev, start_dt)
-                    busy_end = min(end_ev, end_dt)
-                    busy_times.append((busy_start, busy_end))
-                    logger.info(f"[DEBUG] 予定{i+1}をbusy_timesに追加（JST）: {busy_start} 〜 {busy_end}")
-                    
+                        end_ev = end_ev.replace(tzinfo=UTC)
                 else:  # date型（終日予定）
-                    allday_start = jst.localize(datetime.combine(datetime.strptime(start, "%Y-%m-%d"), datetime.min.time()))
-                    allday_end = allday_start + timedelta(days=1)
-                    
-                    logger.info(f"[DEBUG] 予定{i+1}は終日予定: {allday_start} 〜 {allday_end}")
-                    
-                    if allday_end <= start_dt or allday_start >= end_dt:
-                        logger.info(f"[DEBUG] 予定{i+1}は枠外のため除外")
-                        continue
-                        
-                    busy_start = max(allday_start, start_dt)
-                    busy_end = min(allday_end, end_dt)
-                    busy_times.append((busy_start, busy_end))
-                    logger.info(f"[DEBUG] 予定{i+1}をbusy_timesに追加: {busy_start} 〜 {busy_end}")
-            
-            logger.info(f"[DEBUG] busy_times: {busy_times}")
-            
-            # 空き時間を計算
-            free_slots = []
-            if not busy_times:
-                logger.info(f"[DEBUG] busy_timesが空、全日空き時間として返す")
-                free_slots.append({
-                    'start': start_dt.strftime('%H:%M'),
-                    'end': end_dt.strftime('%H:%M')
-                })
-                return free_slots
-                
-            # busy_timesを開始時刻順に明示的にソート
-            busy_times = sorted(busy_times, key=lambda x: x[0])
-            logger.info(f"[DEBUG] ソート後のbusy_times: {busy_times}")
+                    # Google Calendar APIの終日日付は常に "YYYY-MM-DD" なので、strptimeを通さず位置で切り出す
+                    start_ev = datetime(int(start[0:4]), int(start[5:7]), int(start[8:10]), tzinfo=JST)
+                    end_ev = start_ev + timedelta(days=1)
+
+                ev_start = int(start_ev.timestamp())
+                ev_end = int(end_ev.timestamp())
+                # 枠外の予定は除外
+                if ev_end <= frame_start or ev_start >= frame_end:
+                    continue
+                busy_times.append((max(ev_start, frame_start), min(ev_end, frame_end)))
             
-            current_time = start_dt
-            logger.info(f"[DEBUG] 空き時間計算開始、current_time: {current_time}")
+            busy_times.sort()
+            logger.debug("busy_times: %s", busy_times)
             
-            for i, (busy_start, busy_end) in enumerate(busy_times):
-                logger.info(f"[DEBUG] busy_times[{i}]処理: {busy_start} 〜 {busy_end}")
-                
-                if current_time < busy_start:
-                    free_slot = {
-                        'start': current_time.strftime('%H:%M'),
-                        'end': busy_start.strftime('%H:%M')
-                    }
-                    free_slots.append(free_slot)
-                    logger.info(f"[DEBUG] 空き時間を追加: {free_slot}")
-                    
-                current_time = max(current_time, busy_end)
-                logger.info(f"[DEBUG] current_time更新: {current_time}")
+            # 開始時刻順に1回走査し、重なる予定をまとめながら空き時間を取り出す
+            tz = start_dt.tzinfo
+            
+            free_slots = []
+            current = frame_start
+            for busy_start, busy_end in busy_times:
+                if current < busy_start:
+                    free_slots.append((datetime.fromtimestamp(current, tz), datetime.fromtimestamp(busy_start, tz)))
+                if busy_end > current:
+                    current = busy_end
                 
-            if current_time < end_dt:
-                free_slot = {
-                    'start': current_time.strftime('%H:%M'),
-                    'end': end_dt.strftime('%H:%M')
-                }
-                free_slots.append(free_slot)
-                logger.info(f"[DEBUG] 最後の空き時間を追加: {free_slot}")
+            if current < frame_end:
+                free_slots.append((datetime.fromtimestamp(current, tz), end_dt))
                 
-            logger.info(f"[DEBUG] 最終的な空き時間: {free_slots}")
+            logger.debug("最終的な空き時間: %s", free_slots)
             return free_slots 
             
         except Exception as e:
@@ -4,6 +4,8 @@
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import time
 import sys
@@ -11,11 +13,19 @@ import sys
 BASE_URL = 'https://task-bot-production.up.railway.app'
 LINE_USER_ID = 'U6ba71c843562e6db5d8b58c5b895e5ed'
 
+# 同じホストへの2回のリクエストでTLS接続を使い回す
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504], raise_on_status=False)
+))
+
 def check_endpoint():
     """エンドポイントの存在を確認"""
     try:
         # デバッグエンドポイントが有効か確認
-        response = requests.get(f'{BASE_URL}/api/debug_google_account', timeout=10)
+        response = SESSION.get(f'{BASE_URL}/api/debug_google_account', timeout=10)
         if response.status_code == 404:
             return False, "デバッグエンドポイントが無効です（ENABLE_DEBUG_ENDPOINTS=falseの可能性）"
         elif response.status_code == 403:
@@ -37,7 +47,7 @@ def get_google_account(secret_token):
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=30)
+        response = SESSION.post(url, headers=headers, json=data, timeout=30)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.HTTPError as e:
@@ -5,36 +5,90 @@
 """
 
 import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from calendar_service import GoogleCalendarService
 from db import DBHelper
 
-def get_google_account_info(line_user_id):
-    """認証されているGoogleアカウントの情報を取得"""
+def _account_from_saved(saved):
+    """DBに保存済みのアカウント情報を表示用の形式にする"""
+    return {
+        'email': saved['email'],
+        'summary': saved['calendar_summary'],
+        'time_zone': saved['time_zone'],
+        'access_role': saved['access_role']
+    }
+
+def _fetch_primary_calendar(service):
+    """primaryカレンダーの情報からGoogleアカウント情報を取得（APIを呼ぶだけで、DBには触れない）"""
+    calendar = service.calendarList().get(calendarId='primary').execute()
+    
+    # メールアドレスを取得（idまたはsummaryから）
+    email = calendar.get('id', '')
+    if '@' not in email:
+        # idにメールアドレスが含まれていない場合はsummaryを確認
+        email = calendar.get('summary', '')
+    
+    return {
+        'email': email,
+        'summary': calendar.get('summary', ''),
+        'time_zone': calendar.get('timeZone', ''),
+        'access_role': calendar.get('accessRole', '')
+    }
+
+def _save_account_info(db_helper, line_user_id, account_info):
+    db_helper.save_google_account_info(line_user_id, dict(account_info, calendar_summary=account_info['summary']))
+
+def get_google_account_info(line_user_id, db_helper=None, calendar_service=None):
+    """認証されているGoogleアカウントの情報を取得（DBに保存済みならAPIを呼ばない）"""
     try:
-        calendar_service = GoogleCalendarService()
-        service = calendar_service._get_calendar_service(line_user_id)
-        
-        # primaryカレンダーの情報を取得
-        calendar = service.calendarList().get(calendarId='primary').execute()
+        db_helper = db_helper or DBHelper()
+        saved = db_helper.get_google_account_info(line_user_id)
+        if saved:
+            return _account_from_saved(saved)
         
-        # メールアドレスを取得（idまたはsummaryから）
-        email = calendar.get('id', '')
-        if '@' not in email:
-            # idにメールアドレスが含まれていない場合はsummaryを確認
-            email = calendar.get('summary', '')
-        
-        return {
-            'email': email,
-            'summary': calendar.get('summary', ''),
-            'time_zone': calendar.get('timeZone', ''),
-            'access_role': calendar.get('accessRole', '')
-        }
+        calendar_service = calendar_service or GoogleCalendarService(db_helper=db_helper)
+        account_info = _fetch_primary_calendar(calendar_service._get_calendar_service(line_user_id))
+        _save_account_info(db_helper, line_user_id, account_info)
+        return account_info
     except Exception as e:
         print(f"エラー: {e}")
-        import traceback
         traceback.print_exc()
         return None
 
+def get_google_account_infos(user_ids, max_workers=10):
+    """複数ユーザーのアカウント情報を取得（DBHelperは1つだけ作ってメインスレッドで使い、並列にするのはAPI呼び出しだけにする）"""
+    db_helper = DBHelper()
+    calendar_service = GoogleCalendarService(db_helper=db_helper)
+    account_infos = {}
+    services = {}
+    for user_id in user_ids:
+        try:
+            saved = db_helper.get_google_account_info(user_id)
+            if saved:
+                account_infos[user_id] = _account_from_saved(saved)
+            else:
+                # 認証情報の読み込み（DBアクセス）はここで済ませ、サービスはユーザーごとに別々に作る
+                services[user_id] = calendar_service._get_calendar_service(user_id)
+        except Exception as e:
+            print(f"エラー: {user_id}: {e}")
+            account_infos[user_id] = None
+    
+    def fetch(user_id):
+        try:
+            return _fetch_primary_calendar(services[user_id])
+        except Exception as e:
+            print(f"エラー: {user_id}: {e}")
+            return None
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        fetched = dict(zip(services, pool.map(fetch, services)))
+    for user_id, account_info in fetched.items():
+        if account_info:
+            _save_account_info(db_helper, user_id, account_info)
+        account_infos[user_id] = account_info
+    return [account_infos.get(user_id) for user_id in user_ids]
+
 def list_all_users():
     """認証済みユーザーの一覧を取得"""
     db_helper = DBHelper()
@@ -47,8 +101,11 @@ if __name__ == "__main__":
         print("\n認証済みユーザー一覧:")
         users = list_all_users()
         if users:
-            for user_id in users:
-                print(f"  - {user_id}")
+            # ユーザーごとのアカウント情報を取得（primaryカレンダーへの問い合わせだけ並列に行う）
+            account_infos = get_google_account_infos(users)
+            for user_id, account_info in zip(users, account_infos):
+                email = account_info['email'] if account_info else '取得できませんでした'
+                print(f"  - {user_id} ({email})")
         else:
             print("  認証済みユーザーがいません")
         sys.exit(1)
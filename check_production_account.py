@@ -5,13 +5,24 @@ Railway CLI経由で実行するか、本番環境で直接実行
 """
 
 import sys
+import traceback
 import os
 from calendar_service import GoogleCalendarService
 from db import DBHelper
 
 def get_google_account_info(line_user_id):
-    """認証されているGoogleアカウントの情報を取得"""
+    """認証されているGoogleアカウントの情報を取得（DBに保存済みならAPIを呼ばない）"""
     try:
+        db_helper = DBHelper()
+        saved = db_helper.get_google_account_info(line_user_id)
+        if saved:
+            return {
+                'email': saved['email'],
+                'summary': saved['calendar_summary'],
+                'time_zone': saved['time_zone'],
+                'access_role': saved['access_role']
+            }
+        
         calendar_service = GoogleCalendarService()
         service = calendar_service._get_calendar_service(line_user_id)
         
@@ -24,15 +35,16 @@ def get_google_account_info(line_user_id):
             # idにメールアドレスが含まれていない場合はsummaryを確認
             email = calendar.get('summary', '')
         
-        return {
+        account_info = {
             'email': email,
             'summary': calendar.get('summary', ''),
             'time_zone': calendar.get('timeZone', ''),
             'access_role': calendar.get('accessRole', '')
         }
+        db_helper.save_google_account_info(line_user_id, dict(account_info, calendar_summary=account_info['summary']))
+        return account_info
     except Exception as e:
         print(f"エラー: {e}")
-        import traceback
         traceback.print_exc()
         return None
 
@@ -3,60 +3,144 @@
 本番環境のデバッグエンドポイント経由でGoogleアカウント情報を取得するスクリプト
 """
 
-import sys
 import os
+import argparse
+import importlib.util
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+import socket
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 
-def get_google_account_from_production(line_user_id, base_url, secret_token):
-    """本番環境のデバッグエンドポイントからGoogleアカウント情報を取得"""
+# JSONのシリアライズ・パース（orjsonがあればそちらを使う）
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+    _json_loads = json.loads
+
+# diskcacheは任意（本番のrequirements.txtには含めない。入っていなければキャッシュせず毎回問い合わせる）
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+# 同じユーザーの問い合わせ結果を一定時間ディスクに保存し、再実行時は本番環境へ問い合わせない
+CACHE_DIR = os.path.expanduser('~/.cache/task_yoshimura_gaccount')
+CACHE_TTL_SECONDS = 300
+# 一括取得エンドポイントがない環境で、ユーザーごとのリクエストを並列に送る数（セッションのpool_maxsize以下にする）
+MAX_PARALLEL_REQUESTS = 8
+_cache = diskcache.Cache(CACHE_DIR) if diskcache is not None else None
+
+
+class _NoDelayKeepAliveAdapter(HTTPAdapter):
+    """小さなJSONのPOSTをNagleで待たせず、プールで待機中の接続もKeepAliveで維持するアダプタ"""
+    # socket_optionsを渡すとurllib3の既定（TCP_NODELAYのみ）が置き換わるため、TCP_NODELAYも明示する
+    SOCKET_OPTIONS = [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+# 一時的なゲートウェイエラーや接続断は待ってから再試行する
+# （500はエンドポイント自体がエラー内容を返すときに使うため再試行しない。POSTも再試行対象に含める）
+_RETRY = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=(502, 503, 504),
+    allowed_methods=frozenset(['POST']),
+    raise_on_status=False
+)
+
+# 接続を使い回すためのセッション（呼び出しごとにTCP接続とTLSハンドシェイクをやり直さない）
+_SESSION = requests.Session()
+_SESSION.mount('https://', _NoDelayKeepAliveAdapter(pool_connections=4, pool_maxsize=16, max_retries=_RETRY))
+_SESSION.headers.update({'Content-Type': 'application/json'})
+# brotliがあればbrも受け付ける（urllib3はbrotliがないとbrを展開できないため、その場合はgzipだけにする）
+if any(importlib.util.find_spec(name) is not None for name in ('brotli', 'brotlicffi')):
+    _SESSION.headers['Accept-Encoding'] = 'br, gzip'
+else:
+    _SESSION.headers['Accept-Encoding'] = 'gzip'
+atexit.register(_SESSION.close)
+
+def get_google_account_from_production(line_user_id, base_url, secret_token, use_cache=True):
+    """本番環境のデバッグエンドポイントからGoogleアカウント情報を取得（成功した結果だけキャッシュする）"""
+    cache_key = (base_url, line_user_id)
+    if use_cache and _cache is not None:
+        cached = _cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
     url = f"{base_url}/api/debug_google_account"
     headers = {
-        'X-Auth-Token': secret_token,
-        'Content-Type': 'application/json'
+        'X-Auth-Token': secret_token
     }
     data = {
         'line_user_id': line_user_id
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=30)
+        response = _SESSION.post(url, headers=headers, data=_json_dumps(data), timeout=30)
         response.raise_for_status()
-        return response.json()
+        result = _json_loads(response.content)
+        if _cache is not None and result.get('status') == 'success':
+            _cache.set(cache_key, result, expire=CACHE_TTL_SECONDS)
+        return result
     except requests.exceptions.RequestException as e:
         print(f"リクエストエラー: {e}")
         if hasattr(e, 'response') and e.response is not None:
             print(f"レスポンス: {e.response.text}")
         return None
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("使用方法: python check_production_account_remote.py <LINE_USER_ID> [BASE_URL] [SECRET_TOKEN]")
-        print("\n環境変数から取得する場合:")
-        print("  BASE_URL: 本番環境のURL")
-        print("  DAILY_AGENDA_SECRET_TOKEN: 認証トークン")
-        sys.exit(1)
-    
-    line_user_id = sys.argv[1]
-    base_url = sys.argv[2] if len(sys.argv) > 2 else os.getenv('BASE_URL')
-    secret_token = sys.argv[3] if len(sys.argv) > 3 else os.getenv('DAILY_AGENDA_SECRET_TOKEN')
-    
-    if not base_url:
-        print("❌ BASE_URLが設定されていません")
-        print("   環境変数として設定するか、引数として指定してください")
-        sys.exit(1)
+def get_google_accounts_from_production(line_user_ids, base_url, secret_token, use_cache=True):
+    """複数ユーザーのGoogleアカウント情報を1回のPOSTでまとめて取得（LINEユーザーID→結果のdictを返す）"""
+    results = {}
+    if use_cache and _cache is not None:
+        for line_user_id in line_user_ids:
+            cached = _cache.get((base_url, line_user_id))
+            if cached is not None:
+                results[line_user_id] = cached
+    missing_ids = [line_user_id for line_user_id in line_user_ids if line_user_id not in results]
+    if not missing_ids:
+        return results
     
-    if not secret_token:
-        print("❌ DAILY_AGENDA_SECRET_TOKENが設定されていません")
-        print("   環境変数として設定するか、引数として指定してください")
-        sys.exit(1)
-    
-    print(f"LINEユーザーID: {line_user_id}")
-    print(f"本番環境URL: {base_url}")
-    print("Googleアカウント情報を取得中...")
-    
-    result = get_google_account_from_production(line_user_id, base_url, secret_token)
+    url = f"{base_url}/api/debug_google_accounts"
+    headers = {
+        'X-Auth-Token': secret_token
+    }
     
+    try:
+        response = _SESSION.post(url, headers=headers, data=_json_dumps({'line_user_ids': missing_ids}), timeout=60)
+        if response.status_code == 404:
+            # 一括取得エンドポイントがまだない環境では、ユーザーごとのリクエストを並列に送る
+            with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as pool:
+                fetched = pool.map(
+                    lambda line_user_id: get_google_account_from_production(line_user_id, base_url, secret_token, use_cache=False),
+                    missing_ids
+                )
+                results.update(zip(missing_ids, fetched))
+            return results
+        response.raise_for_status()
+        for line_user_id, result in _json_loads(response.content).get('results', {}).items():
+            results[line_user_id] = result
+            if _cache is not None and result.get('status') == 'success':
+                _cache.set((base_url, line_user_id), result, expire=CACHE_TTL_SECONDS)
+    except requests.exceptions.RequestException as e:
+        print(f"リクエストエラー: {e}")
+        if hasattr(e, 'response') and e.response is not None:
+            print(f"レスポンス: {e.response.text}")
+    return results
+
+def print_account_result(result):
+    """取得結果を表示"""
     if result and result.get('status') == 'success':
         account = result.get('google_account', {})
         print("\n✅ 認証されているGoogleアカウント:")
@@ -73,3 +157,35 @@ if __name__ == "__main__":
                 print("\n詳細:")
                 print(result['traceback'])
 
+def parse_args(argv=None):
+    """コマンドライン引数を解析（BASE_URLとSECRET_TOKENは省略時に環境変数から取得）"""
+    parser = argparse.ArgumentParser(description='本番環境のデバッグエンドポイント経由でGoogleアカウント情報を取得')
+    parser.add_argument('line_user_ids', help='LINEユーザーID（カンマ区切りで複数指定可）')
+    parser.add_argument('base_url', nargs='?', default=os.environ.get('BASE_URL'), help='本番環境のURL（環境変数BASE_URL）')
+    parser.add_argument('secret_token', nargs='?', default=os.environ.get('DAILY_AGENDA_SECRET_TOKEN'), help='認証トークン（環境変数DAILY_AGENDA_SECRET_TOKEN）')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false', help='キャッシュを使わずに本番環境へ問い合わせる')
+    args = parser.parse_args(argv)
+    if not args.base_url:
+        parser.error('BASE_URLが設定されていません。環境変数として設定するか、引数として指定してください')
+    if not args.secret_token:
+        parser.error('DAILY_AGENDA_SECRET_TOKENが設定されていません。環境変数として設定するか、引数として指定してください')
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    line_user_ids = [line_user_id for line_user_id in args.line_user_ids.split(',') if line_user_id]
+    
+    print(f"LINEユーザーID: {', '.join(line_user_ids)}")
+    print(f"本番環境URL: {args.base_url}")
+    print("Googleアカウント情報を取得中...")
+    
+    if len(line_user_ids) == 1:
+        print_account_result(get_google_account_from_production(line_user_ids[0], args.base_url, args.secret_token, use_cache=args.use_cache))
+    else:
+        results = get_google_accounts_from_production(line_user_ids, args.base_url, args.secret_token, use_cache=args.use_cache)
+        for line_user_id in line_user_ids:
+            print(f"\n--- {line_user_id} ---")
+            print_account_result(results.get(line_user_id))
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ class Config:
     
     # OpenAI設定
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+    OPENAI_MAX_TOKENS = int(os.getenv('OPENAI_MAX_TOKENS', '800'))  # 応答トークン上限
     
     # Google Calendar設定
     GOOGLE_CALENDAR_ID = 'primary'
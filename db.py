@@ -1,9 +1,11 @@
 import os
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import secrets
 import string
 import logging
+import time
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +19,9 @@ except ImportError:
     PG_BINARY = lambda x: x
 
 DB_PATH = 'line_calendar.db'
+OAUTH_STATE_TTL_SECONDS = 15 * 60
+# usersテーブルに保存するGoogleアカウント情報の列
+GOOGLE_ACCOUNT_COLUMNS = ('email', 'calendar_summary', 'time_zone', 'access_role')
 
 class DBHelper:
     def __init__(self, db_path=DB_PATH):
@@ -24,6 +29,7 @@ class DBHelper:
         self.is_postgres = False
         self.db_url = db_url
         self.db_path = db_path
+        self._oauth_states_ready = False
         
         if db_url and psycopg2 is not None:
             self.is_postgres = True
@@ -83,7 +89,6 @@ class DBHelper:
                             except:
                                 pass
                             self.conn = self._get_connection()
-                        import time
                         time.sleep(1)
                         continue
                 raise e
@@ -99,7 +104,11 @@ class DBHelper:
                         line_user_id TEXT PRIMARY KEY,
                         google_token BYTEA,
                         created_at TEXT,
-                        updated_at TEXT
+                        updated_at TEXT,
+                        email TEXT,
+                        calendar_summary TEXT,
+                        time_zone TEXT,
+                        access_role TEXT
                     )
                 ''')
                 c.execute('''
@@ -126,6 +135,8 @@ class DBHelper:
                         UNIQUE(line_user_id, target_date)
                     )
                 ''')
+                for column in GOOGLE_ACCOUNT_COLUMNS:
+                    c.execute(f'ALTER TABLE users ADD COLUMN IF NOT EXISTS {column} TEXT')
             else:
                 # SQLite
                 c.execute('''
@@ -133,7 +144,11 @@ class DBHelper:
                         line_user_id TEXT PRIMARY KEY,
                         google_token BLOB,
                         created_at TEXT,
-                        updated_at TEXT
+                        updated_at TEXT,
+                        email TEXT,
+                        calendar_summary TEXT,
+                        time_zone TEXT,
+                        access_role TEXT
                     )
                 ''')
                 c.execute('''
@@ -160,6 +175,11 @@ class DBHelper:
                         UNIQUE(line_user_id, target_date)
                     )
                 ''')
+                c.execute('PRAGMA table_info(users)')
+                existing_columns = {row[1] for row in c.fetchall()}
+                for column in GOOGLE_ACCOUNT_COLUMNS:
+                    if column not in existing_columns:
+                        c.execute(f'ALTER TABLE users ADD COLUMN {column} TEXT')
             self.conn.commit()
         
         self._execute_with_retry(operation)
@@ -167,7 +187,7 @@ class DBHelper:
     # --- users ---
     def save_google_token(self, line_user_id, google_token_bytes):
         now = datetime.utcnow().isoformat()
-        print(f"[DEBUG] save_google_token: line_user_id={line_user_id}, token_length={len(google_token_bytes) if google_token_bytes else 0}, time={now}")
+        logger.debug("save_google_token: line_user_id=%s, token_length=%s, time=%s", line_user_id, len(google_token_bytes) if google_token_bytes else 0, now)
         c = self.conn.cursor()
         if self.is_postgres:
             c.execute('''
@@ -191,11 +211,40 @@ class DBHelper:
             else:
                 c.execute('SELECT google_token FROM users WHERE line_user_id=?', (line_user_id,))
             row = c.fetchone()
-            print(f"[DEBUG] get_google_token: line_user_id={line_user_id}, token_found={row is not None}, token_length={len(row[0]) if row and row[0] else 0}")
+            logger.debug("get_google_token: line_user_id=%s, token_found=%s, token_length=%s", line_user_id, row is not None, len(row[0]) if row and row[0] else 0)
             return row[0] if row else None
         
         return self._execute_with_retry(operation)
 
+    # --- Googleアカウント情報（primaryカレンダーの情報。アカウントが変わらない限り変化しないのでAPIを毎回呼ばない） ---
+    def get_google_account_info(self, line_user_id):
+        """保存済みのGoogleアカウント情報を返す（未保存の項目があればNone）"""
+        def operation():
+            c = self.conn.cursor()
+            columns = ', '.join(GOOGLE_ACCOUNT_COLUMNS)
+            if self.is_postgres:
+                c.execute(f'SELECT {columns} FROM users WHERE line_user_id=%s', (line_user_id,))
+            else:
+                c.execute(f'SELECT {columns} FROM users WHERE line_user_id=?', (line_user_id,))
+            row = c.fetchone()
+            if not row or any(value is None for value in row):
+                return None
+            return dict(zip(GOOGLE_ACCOUNT_COLUMNS, row))
+        
+        return self._execute_with_retry(operation)
+
+    def save_google_account_info(self, line_user_id, account_info):
+        """APIから取得したGoogleアカウント情報をusersテーブルに保存"""
+        values = tuple(account_info.get(column, '') for column in GOOGLE_ACCOUNT_COLUMNS)
+        c = self.conn.cursor()
+        if self.is_postgres:
+            assignments = ', '.join(f'{column}=%s' for column in GOOGLE_ACCOUNT_COLUMNS)
+            c.execute(f'UPDATE users SET {assignments} WHERE line_user_id=%s', values + (line_user_id,))
+        else:
+            assignments = ', '.join(f'{column}=?' for column in GOOGLE_ACCOUNT_COLUMNS)
+            c.execute(f'UPDATE users SET {assignments} WHERE line_user_id=?', values + (line_user_id,))
+        self.conn.commit()
+
     # --- onetimes ---
     def create_onetime_code(self, line_user_id, code, expires_minutes=10):
         now = datetime.utcnow()
@@ -263,7 +312,7 @@ class DBHelper:
         """ワンタイムコードを検証（有効期限・使用済みチェック）"""
         import logging
         logger = logging.getLogger(__name__)
-        logger.info(f"[DEBUG] verify_onetime_code: code={code}")
+        logger.debug("verify_onetime_code: code=%s", code)
         
         c = self.conn.cursor()
         if self.is_postgres:
@@ -281,25 +330,25 @@ class DBHelper:
         result = c.fetchone()
         
         if not result:
-            logger.info(f"[DEBUG] コードが存在しません: {code}")
+            logger.debug("コードが存在しません: %s", code)
             return None  # コードが存在しない
         
         line_user_id, expires_at, used = result
-        logger.info(f"[DEBUG] コード情報: line_user_id={line_user_id}, expires_at={expires_at}, used={used}")
+        logger.debug("コード情報: line_user_id=%s, expires_at=%s, used=%s", line_user_id, expires_at, used)
         
         if used:
-            logger.info(f"[DEBUG] コードは既に使用済み: {code}")
+            logger.debug("コードは既に使用済み: %s", code)
             return None  # 既に使用済み
         
         # 有効期限チェック
         expires_datetime = datetime.fromisoformat(expires_at)
         now = datetime.now()
-        logger.info(f"[DEBUG] 有効期限チェック: now={now}, expires_at={expires_datetime}, valid={now <= expires_datetime}")
+        logger.debug("有効期限チェック: now=%s, expires_at=%s, valid=%s", now, expires_datetime, now <= expires_datetime)
         if now > expires_datetime:
-            logger.info(f"[DEBUG] コードは期限切れ: {code}")
+            logger.debug("コードは期限切れ: %s", code)
             return None  # 期限切れ
         
-        logger.info(f"[DEBUG] コード検証成功: {code}")
+        logger.debug("コード検証成功: %s", code)
         return line_user_id
 
     def mark_onetime_used(self, code):
@@ -355,6 +404,30 @@ class DBHelper:
         
         return self._execute_with_retry(operation)
 
+    @contextmanager
+    def cursor(self, name=None, itersize=None):
+        """接続プールから接続を借りてカーソルを返す（PostgreSQLでnameを指定するとサーバーサイドカーソルになり、itersize件ずつ取得する）"""
+        if not self.is_postgres:
+            c = self.conn.cursor()
+            try:
+                yield c
+            finally:
+                c.close()
+            return
+        
+        conn = self.connection_pool.getconn()
+        try:
+            with conn.cursor(name=name) if name else conn.cursor() as c:
+                if name and itersize:
+                    c.itersize = itersize
+                yield c
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.connection_pool.putconn(conn)
+
     def close(self):
         if self.is_postgres:
             try:
@@ -365,41 +438,51 @@ class DBHelper:
         else:
             self.conn.close()
 
+    def _ensure_oauth_states_table(self):
+        """oauth_statesテーブルを作成（既存テーブルにはexpires_at_epoch列を追加）。インスタンスごとに1回だけ実行する"""
+        if self._oauth_states_ready:
+            return
+        c = self.conn.cursor()
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS oauth_states (
+                state TEXT PRIMARY KEY,
+                line_user_id TEXT,
+                created_at TEXT,
+                expires_at TEXT,
+                expires_at_epoch BIGINT
+            )
+        ''')
+        if self.is_postgres:
+            c.execute('ALTER TABLE oauth_states ADD COLUMN IF NOT EXISTS expires_at_epoch BIGINT')
+        else:
+            c.execute('PRAGMA table_info(oauth_states)')
+            if 'expires_at_epoch' not in {row[1] for row in c.fetchall()}:
+                c.execute('ALTER TABLE oauth_states ADD COLUMN expires_at_epoch BIGINT')
+        self.conn.commit()
+        self._oauth_states_ready = True
+
     def save_oauth_state(self, state, line_user_id, expires_at=None):
-        """OAuth stateとLINEユーザーIDを紐付けて保存"""
+        """OAuth stateとLINEユーザーIDを紐付けて保存（有効期限はUNIX時刻でも保存し、照合時に日時をパースしない）"""
+        self._ensure_oauth_states_table()
         c = self.conn.cursor()
         now = datetime.now().isoformat()
         if expires_at is None:
-            from datetime import timedelta, timezone
-            expires_at = (datetime.now(timezone.utc) + timedelta(minutes=15)).isoformat()
-        
+            expires_at_epoch = int(time.time()) + OAUTH_STATE_TTL_SECONDS
+            expires_at = datetime.fromtimestamp(expires_at_epoch, timezone.utc).isoformat()
+        else:
+            expires_at_epoch = int(datetime.fromisoformat(expires_at).timestamp())
+
         if self.is_postgres:
             c.execute('''
-                CREATE TABLE IF NOT EXISTS oauth_states (
-                    state TEXT PRIMARY KEY,
-                    line_user_id TEXT,
-                    created_at TEXT,
-                    expires_at TEXT
-                )
-            ''')
-            c.execute('''
-                INSERT INTO oauth_states (state, line_user_id, created_at, expires_at)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (state) DO UPDATE SET line_user_id=EXCLUDED.line_user_id, created_at=EXCLUDED.created_at, expires_at=EXCLUDED.expires_at
-            ''', (state, line_user_id, now, expires_at))
+                INSERT INTO oauth_states (state, line_user_id, created_at, expires_at, expires_at_epoch)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (state) DO UPDATE SET line_user_id=EXCLUDED.line_user_id, created_at=EXCLUDED.created_at, expires_at=EXCLUDED.expires_at, expires_at_epoch=EXCLUDED.expires_at_epoch
+            ''', (state, line_user_id, now, expires_at, expires_at_epoch))
         else:
             c.execute('''
-                CREATE TABLE IF NOT EXISTS oauth_states (
-                    state TEXT PRIMARY KEY,
-                    line_user_id TEXT,
-                    created_at TEXT,
-                    expires_at TEXT
-                )
-            ''')
-            c.execute('''
-                INSERT OR REPLACE INTO oauth_states (state, line_user_id, created_at, expires_at)
-                VALUES (?, ?, ?, ?)
-            ''', (state, line_user_id, now, expires_at))
+                INSERT OR REPLACE INTO oauth_states (state, line_user_id, created_at, expires_at, expires_at_epoch)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (state, line_user_id, now, expires_at, expires_at_epoch))
         self.conn.commit()
 
     def get_line_user_id_by_state(self, state):
@@ -414,14 +497,19 @@ class DBHelper:
 
     def get_oauth_state(self, state):
         """OAuth state情報を取得"""
+        self._ensure_oauth_states_table()
         c = self.conn.cursor()
         if self.is_postgres:
-            c.execute('SELECT line_user_id, expires_at FROM oauth_states WHERE state = %s', (state,))
+            c.execute('SELECT line_user_id, expires_at, expires_at_epoch FROM oauth_states WHERE state = %s', (state,))
         else:
-            c.execute('SELECT line_user_id, expires_at FROM oauth_states WHERE state = ?', (state,))
+            c.execute('SELECT line_user_id, expires_at, expires_at_epoch FROM oauth_states WHERE state = ?', (state,))
         result = c.fetchone()
         if result:
-            return {'line_user_id': result[0], 'expires_at': result[1]}
+            expires_at_epoch = result[2]
+            if expires_at_epoch is None:
+                # expires_at_epoch列の追加前に保存されたstate
+                expires_at_epoch = int(datetime.fromisoformat(result[1]).timestamp())
+            return {'line_user_id': result[0], 'expires_at': result[1], 'expires_at_epoch': expires_at_epoch}
         return None
 
     def delete_oauth_state(self, state):
@@ -433,6 +521,35 @@ class DBHelper:
             c.execute('DELETE FROM oauth_states WHERE state = ?', (state,))
         self.conn.commit()
 
+    def finalize_oauth(self, line_user_id, google_token_bytes, state):
+        """OAuth完了時のトークン保存・ワンタイムコード消込・state削除を1トランザクションで行う（PostgreSQLでは1往復で送る）
+        別のGoogleアカウントで認証し直した可能性があるため、保存済みのアカウント情報は消しておく"""
+        now = datetime.utcnow().isoformat()
+        c = self.conn.cursor()
+        try:
+            if self.is_postgres:
+                c.execute('''
+                    INSERT INTO users (line_user_id, google_token, created_at, updated_at)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (line_user_id) DO UPDATE SET google_token=EXCLUDED.google_token, updated_at=EXCLUDED.updated_at,
+                        email=NULL, calendar_summary=NULL, time_zone=NULL, access_role=NULL;
+                    UPDATE onetimes SET used = 1 WHERE line_user_id = %s AND used = 0;
+                    DELETE FROM oauth_states WHERE state = %s;
+                ''', (line_user_id, PG_BINARY(google_token_bytes), now, now, line_user_id, state))
+            else:
+                c.execute('''
+                    INSERT INTO users (line_user_id, google_token, created_at, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(line_user_id) DO UPDATE SET google_token=excluded.google_token, updated_at=excluded.updated_at,
+                        email=NULL, calendar_summary=NULL, time_zone=NULL, access_role=NULL
+                ''', (line_user_id, google_token_bytes, now, now))
+                c.execute('UPDATE onetimes SET used = 1 WHERE line_user_id = ? AND used = 0', (line_user_id,))
+                c.execute('DELETE FROM oauth_states WHERE state = ?', (state,))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
     def save_pending_event(self, line_user_id, event_json):
         now = datetime.utcnow().isoformat()
         c = self.conn.cursor()
@@ -467,6 +584,20 @@ class DBHelper:
             c.execute('DELETE FROM pending_events WHERE line_user_id=?', (line_user_id,))
         self.conn.commit()
 
+    def pop_pending_event(self, line_user_id):
+        """保留中の予定を取得と同時に削除します（取得→削除の2往復を1回にまとめる）"""
+        c = self.conn.cursor()
+        if self.is_postgres:
+            c.execute('DELETE FROM pending_events WHERE line_user_id=%s RETURNING event_json', (line_user_id,))
+            row = c.fetchone()
+        else:
+            c.execute('SELECT event_json FROM pending_events WHERE line_user_id=?', (line_user_id,))
+            row = c.fetchone()
+            if row:
+                c.execute('DELETE FROM pending_events WHERE line_user_id=?', (line_user_id,))
+        self.conn.commit()
+        return row[0] if row else None
+
     # --- daily_sends ---
     def already_sent_daily(self, line_user_id, target_date):
         """既に指定日の配信が完了しているかチェック"""
@@ -61,7 +61,7 @@ def test_openai_direct():
         
         # 簡単なテスト
         response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+            model=Config.OPENAI_MODEL,
             messages=[
                 {"role": "system", "content": "あなたはテスト用のAIです。"},
                 {"role": "user", "content": "こんにちは"}
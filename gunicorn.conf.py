@@ -0,0 +1,34 @@
+# 本番用gunicorn設定（Procfileから -c gunicorn.conf.py で読み込む）
+import multiprocessing
+import os
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Webhookは LINE / Google / DB のI/O待ちが中心なので、geventワーカーで1プロセスあたり多数の接続を捌く
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+# コンテナではホストのCPU数が見えることがあるため、既定値は上限4に抑える（WEB_CONCURRENCYで上書き可）
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+worker_connections = 200
+timeout = 120
+# 終了時は受け付け済みのメッセージを処理し終えるまで待つ（MESSAGE_DRAIN_TIMEOUTより長くする）
+graceful_timeout = 60
+
+def post_fork(server, worker):
+    """geventワーカーでは、psycopg2のDB待ちでハブ全体が止まらないよう協調的に待つようにする"""
+    if server.cfg.worker_class_str == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+def worker_exit(server, worker):
+    """ワーカー終了時に、Webhookで受け付け済み（200を返し済み）のメッセージをキューから処理し終えてから終了する"""
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.drain_message_queue()
+
+# keep-aliveで接続を使い回し、Webhookごとに TCP/TLS ハンドシェイクをやり直さない
+keepalive = 30
+
+# 長時間稼働によるメモリ増加対策として、一定リクエストごとにワーカーを入れ替える（同時再起動を避けるためジッター付き）
+max_requests = 2000
+max_requests_jitter = 200
@@ -0,0 +1,63 @@
+"""
+LINE Messaging API・Googleのトークン更新で共有するrequests.Sessionと、それを使うLineBotApi
+"""
+import atexit
+import functools
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from linebot import LineBotApi
+from linebot.http_client import HttpClient, RequestsHttpClient, RequestsHttpResponse
+
+from config import Config
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """プロセス内で共有するrequests.Sessionを返します（接続プールを使い回し、呼び出しごとにTCP/TLSハンドシェイクをやり直さない）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # リトライは呼び出し側で行うため、アダプターではリトライしない
+                session.mount("https://", HTTPAdapter(pool_connections=50, pool_maxsize=100, max_retries=0))
+                atexit.register(session.close)
+                _session = session
+    return _session
+
+class _SessionHttpClient(RequestsHttpClient):
+    """プロセス共有のrequests.Sessionで接続を使い回すHttpClient（SDK標準はリクエストごとに新しい接続を張るため、毎回TLSハンドシェイクが発生する）"""
+    
+    def __init__(self, timeout=HttpClient.DEFAULT_TIMEOUT):
+        super().__init__(timeout)
+        self.session = get_http_session()
+    
+    def get(self, url, headers=None, params=None, stream=False, timeout=None):
+        response = self.session.get(
+            url, headers=headers, params=params, stream=stream, timeout=timeout or self.timeout
+        )
+        return RequestsHttpResponse(response)
+    
+    def post(self, url, headers=None, data=None, timeout=None):
+        response = self.session.post(url, headers=headers, data=data, timeout=timeout or self.timeout)
+        return RequestsHttpResponse(response)
+    
+    def delete(self, url, headers=None, data=None, timeout=None):
+        response = self.session.delete(url, headers=headers, data=data, timeout=timeout or self.timeout)
+        return RequestsHttpResponse(response)
+    
+    def put(self, url, headers=None, data=None, timeout=None):
+        response = self.session.put(url, headers=headers, data=data, timeout=timeout or self.timeout)
+        return RequestsHttpResponse(response)
+
+@functools.lru_cache(maxsize=1)
+def create_line_bot_api():
+    """keep-aliveの接続プールを持つLineBotApiを生成（プロセス内で1つだけ作り、ハンドラーや配信処理で共有する）"""
+    return LineBotApi(
+        Config.LINE_CHANNEL_ACCESS_TOKEN,
+        timeout=(3.05, 10),  # (接続タイムアウト, 読み取りタイムアウト)
+        http_client=_SessionHttpClient,
+    )
@@ -1,75 +1,162 @@
-from linebot import LineBotApi, WebhookHandler
+from linebot import WebhookHandler
 from linebot.exceptions import InvalidSignatureError
+from http_session import create_line_bot_api
 from linebot.models import MessageEvent, TextMessage, TextSendMessage
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from dateutil import parser
-import pytz
 import re
-from calendar_service import GoogleCalendarService
+import os
+import json
+import calendar
+import traceback
+import functools
+from operator import itemgetter
+from collections import namedtuple
+from calendar_service import GoogleCalendarService, JST
 from ai_service import AIService
 from config import Config
 from db import DBHelper
 import logging
+import base64
+import hashlib
+import hmac
+import threading
+from cachetools import TTLCache
 
 logger = logging.getLogger("line_bot_handler")
 
+
+# 予定ごと・メッセージごとに使う正規表現（呼び出しのたびにパターンを引かないよう事前にコンパイル）
+_MONTH_RE = re.compile(r'(\d{1,2})月')
+_DAY_RE = re.compile(r'\d{1,2}日')
+# 空き時間確認の枠の日付・時刻（例外に頼らず、変換前に形式を検証する）
+_FRAME_DATE_RE = re.compile(r'([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})')
+_FRAME_TIME_RE = re.compile(r'([0-9]{1,2}):([0-9]{1,2})')
+
+_WEEKDAY_JP = ('月', '火', '水', '木', '金', '土', '日')
+
+# 月全体の空き時間を確認するときの1日の枠
+MONTH_FRAME_START = '08:00'
+MONTH_FRAME_END = '23:59'
+
+# 「はい」返答として扱う文言
+_AFFIRMATIVES = frozenset(("はい", "追加", "OK", "Yes", "yes"))
+# AIに問い合わせずに使い方を返す文言
+_HELP_MESSAGES = frozenset(("help", "Help", "ヘルプ", "使い方", "?", "？"))
+# 「11月」「11月の空き時間」のような月だけの入力（場所・移動時間などAIに抽出させる情報を含まない）
+_MONTH_ONLY_RE = re.compile(r'(\d{1,2})月(?:の)?(?:空き時間|空き)?[?？]?')
+
+_GUIDANCE_TEXT = "日時の送信で空き時間が分かります！\n日時と内容の送信で予定を追加します！\n\n例：\n・「明日の空き時間」\n・「7/15 15:00〜16:00の空き時間」\n・「明日の午前9時から会議を追加して」\n・「来週月曜日の14時から打ち合わせ」"
+
+# 空き時間を返す1日の範囲（0:00からの分数。8:00〜23:59）
+DAY_START_MINUTES = 8 * 60
+DAY_END_MINUTES = 23 * 60 + 59
+
+# 空き時間確認の1枠（日付・指定された時間帯・8:00〜23:59に切り詰めた時間帯（分数）と、それぞれのJST日時）
+_Frame = namedtuple('_Frame', 'date start_time end_time slot_start slot_end start_dt end_dt slot_start_dt slot_end_dt')
+
+# pending_eventsに保存する予定の項目（「はい」返答時にこの形式で読み戻す）
+PENDING_EVENT_KEYS = ('title', 'start_datetime', 'end_datetime', 'description')
+
+# 認証済みのユーザー（メッセージごとにDBを引かないよう5分間覚えておく。未認証は認証直後に反映させるためキャッシュしない）
+_AUTH_CACHE = TTLCache(maxsize=10000, ttl=300)
+_AUTH_CACHE_LOCK = threading.Lock()
+
+def _parse_datetime(value):
+    """日時文字列をdatetimeに変換（自前で組み立てたISO形式やGoogleの応答は標準ライブラリで高速に変換し、
+    "9:00" のような桁数の足りない形式だけdateutilで解析する）"""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return parser.parse(value)
+
+@functools.lru_cache(maxsize=1024)
+def _jst_midnight(date_str):
+    """"YYYY-MM-DD" からその日の0:00（JST）のdatetimeを返す。不正な日付ならNone（同じ日付を何度も変換するためキャッシュする。datetimeは不変なので共有してよい）"""
+    match = _FRAME_DATE_RE.fullmatch(date_str)
+    if not match:
+        return None
+    year, month, day = map(int, match.groups())
+    # 2月30日のような存在しない日付だけはdatetimeの検証に任せる
+    try:
+        return datetime(year, month, day, tzinfo=JST)
+    except ValueError:
+        return None
+
+def _to_minutes(time_str):
+    """"HH:MM" を0:00からの分数に変換（時刻の比較・切り詰めを整数で行うため）。不正な時刻ならNone"""
+    match = _FRAME_TIME_RE.fullmatch(time_str)
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if not (hour < 24 and minute < 60):
+        return None
+    return hour * 60 + minute
+
+def _format_minutes(minutes):
+    """0:00からの分数を "HH:MM" に戻す"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def invalidate_auth(line_user_id):
+    """認証状態のキャッシュを破棄（認証完了時などに呼ぶ）"""
+    with _AUTH_CACHE_LOCK:
+        _AUTH_CACHE.pop(line_user_id, None)
+
+class _BytesSignatureValidator:
+    """X-Line-Signatureの署名検証（SDK標準と同じHMAC-SHA256。本文をデコードせずバイト列のまま検証できる）"""
+    
+    def __init__(self, channel_secret):
+        self.channel_secret = channel_secret.encode('utf-8')
+    
+    def validate(self, body, signature):
+        body_bytes = body if isinstance(body, bytes) else body.encode('utf-8')
+        expected = base64.b64encode(hmac.new(self.channel_secret, body_bytes, hashlib.sha256).digest())
+        return hmac.compare_digest(signature.encode('utf-8'), expected)
+
 class LineBotHandler:
-    def __init__(self):
+    def __init__(self, ai_service=None, calendar_service=None):
+        """ai_service / calendar_service を渡すと、新しく作らずにそれを使う（メッセージ処理のワーカースレッドで共有するため）"""
         # LINE Bot API クライアント初期化（標準）
         if not Config.LINE_CHANNEL_ACCESS_TOKEN:
             raise ValueError("LINE_CHANNEL_ACCESS_TOKEN environment variable is not set")
         if not Config.LINE_CHANNEL_SECRET:
             raise ValueError("LINE_CHANNEL_SECRET environment variable is not set")
             
-        self.line_bot_api = LineBotApi(Config.LINE_CHANNEL_ACCESS_TOKEN)
+        self.line_bot_api = create_line_bot_api()
         self.handler = WebhookHandler(Config.LINE_CHANNEL_SECRET)
-        
-        # カスタムセッション設定をグローバルに適用
-        import requests
-        from requests.adapters import HTTPAdapter
-        from urllib3.util.retry import Retry
-        
-        # リトライ戦略を設定（より詳細な設定）
-        retry_strategy = Retry(
-            total=5,  # 最大リトライ回数を増加
-            backoff_factor=2,  # バックオフ係数を増加
-            status_forcelist=[429, 500, 502, 503, 504, 520, 521, 522, 523, 524],  # リトライするHTTPステータスコードを拡張
-            allowed_methods=["HEAD", "GET", "PUT", "DELETE", "OPTIONS", "TRACE", "POST"],  # 全HTTPメソッドでリトライ
-            raise_on_status=False,  # ステータスエラーで例外を発生させない
-        )
-        
-        # アダプターを設定
-        adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=10, pool_maxsize=20)
-        
-        # グローバルセッション設定
-        session = requests.Session()
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        session.timeout = (15, 45)  # (接続タイムアウト, 読み取りタイムアウト) を増加
-        
-        # LINE Bot SDKの内部セッションを置き換え
-        self.line_bot_api._session = session
+        self.handler.parser.signature_validator = _BytesSignatureValidator(Config.LINE_CHANNEL_SECRET)
         
         # DBヘルパーの初期化
         self.db_helper = DBHelper()
         
-        try:
-            self.calendar_service = GoogleCalendarService()
-        except Exception as e:
-            print(f"Google Calendarサービス初期化エラー: {e}")
-            self.calendar_service = None
-            
-        try:
-            self.ai_service = AIService()
-        except Exception as e:
-            print(f"AIサービス初期化エラー: {e}")
-            self.ai_service = None
-            
-        self.jst = pytz.timezone('Asia/Tokyo')
+        if calendar_service is not None:
+            self.calendar_service = calendar_service
+        else:
+            try:
+                self.calendar_service = GoogleCalendarService()
+            except Exception as e:
+                print(f"Google Calendarサービス初期化エラー: {e}")
+                self.calendar_service = None
+            
+        if ai_service is not None:
+            self.ai_service = ai_service
+        else:
+            try:
+                self.ai_service = AIService()
+            except Exception as e:
+                print(f"AIサービス初期化エラー: {e}")
+                self.ai_service = None
     
     def _check_user_auth(self, line_user_id):
-        """ユーザーの認証状態をチェック"""
-        return self.db_helper.user_exists(line_user_id)
+        """ユーザーの認証状態をチェック（認証済みであれば5分間はDBを引かない）"""
+        with _AUTH_CACHE_LOCK:
+            if line_user_id in _AUTH_CACHE:
+                return True
+        authenticated = self.db_helper.user_exists(line_user_id)
+        if authenticated:
+            with _AUTH_CACHE_LOCK:
+                _AUTH_CACHE[line_user_id] = True
+        return authenticated
     
     def _send_auth_guide(self, line_user_id):
         """認証案内メッセージを送信"""
@@ -77,7 +164,6 @@ class LineBotHandler:
         code = self.db_helper.generate_onetime_code(line_user_id)
         
         # 認証URLを生成（環境変数から取得）
-        import os
         base_url = os.getenv('BASE_URL', 'https://web-production-xxxx.up.railway.app')
         auth_url = f"{base_url}/onetime_login"
         
@@ -107,10 +193,11 @@ class LineBotHandler:
             return self._send_auth_guide(line_user_id)
 
         # 「はい」返答による強制追加判定
-        if user_message.strip() in ["はい", "追加", "OK", "Yes", "yes"]:
-            pending_json = self.db_helper.get_pending_event(line_user_id)
+        stripped_message = user_message.strip()
+        if stripped_message in _AFFIRMATIVES:
+            # 取得と削除を1回のDB操作で行う（追加に失敗しても同じ予定を二重に追加しない）
+            pending_json = self.db_helper.pop_pending_event(line_user_id)
             if pending_json:
-                import json
                 events_data = json.loads(pending_json)
                 
                 # 単一イベントか複数イベントかを判定
@@ -119,17 +206,18 @@ class LineBotHandler:
                     added_events = []
                     failed_events = []
                     
+                    # 保存時に組み立てたISO形式（+09:00付き）なので、日時の変換は1回で済む
+                    to_add = []
                     for event_info in events_data:
                         try:
-                            from dateutil import parser
-                            start_datetime = parser.parse(event_info['start_datetime'])
-                            end_datetime = parser.parse(event_info['end_datetime'])
+                            start_datetime = _parse_datetime(event_info['start_datetime'])
+                            end_datetime = _parse_datetime(event_info['end_datetime'])
                             
                             # 既にタイムゾーンが設定されている場合はそのまま使用、そうでなければJSTを設定
                             if start_datetime.tzinfo is None:
-                                start_datetime = self.jst.localize(start_datetime)
+                                start_datetime = start_datetime.replace(tzinfo=JST)
                             if end_datetime.tzinfo is None:
-                                end_datetime = self.jst.localize(end_datetime)
+                                end_datetime = end_datetime.replace(tzinfo=JST)
                             
                             if not self.calendar_service:
                                 failed_events.append({
@@ -138,109 +226,36 @@ class LineBotHandler:
                                 })
                                 continue
                             
-                            success, message, result = self.calendar_service.add_event(
-                                event_info['title'],
-                                start_datetime,
-                                end_datetime,
-                                event_info.get('description', ''),
-                                line_user_id=line_user_id,
-                                force_add=True
-                            )
-                            
-                            if success:
-                                # 日時をフォーマット
-                                from datetime import datetime
-                                import pytz
-                                jst = pytz.timezone('Asia/Tokyo')
-                                start_dt = start_datetime.astimezone(jst)
-                                end_dt = end_datetime.astimezone(jst)
-                                weekday = "月火水木金土日"[start_dt.weekday()]
-                                date_str = f"{start_dt.month}/{start_dt.day}（{weekday}）"
-                                time_str = f"{start_dt.strftime('%H:%M')}〜{end_dt.strftime('%H:%M')}"
-                                
-                                added_events.append({
-                                    'title': event_info['title'],
-                                    'time': f"{date_str}{time_str}"
-                                })
-                            else:
-                                failed_events.append({
-                                    'title': event_info['title'],
-                                    'reason': message
-                                })
+                            to_add.append((event_info['title'], start_datetime, end_datetime, event_info.get('description', '')))
                         except Exception as e:
                             failed_events.append({
                                 'title': event_info.get('title', '予定'),
                                 'reason': str(e)
                             })
                     
-                    self.db_helper.delete_pending_event(line_user_id)
-                    
-                    # 結果メッセージを構築（移動時間を含む場合は統一形式）
-                    if added_events:
-                        # 移動時間が含まれているかチェック
-                        has_travel = any('移動時間' in event['title'] for event in added_events)
-                        
-                        if has_travel and len(added_events) > 1:
-                            # 移動時間を含む場合は統一形式で表示
-                            response_text = "✅予定を追加しました！\n\n"
-                            
-                            # 日付を取得（最初の予定から）
-                            first_event = added_events[0]
-                            time_str = first_event['time']
-                            # "10/18 (土)19:00〜20:00" から "10/18 (土)" を抽出
-                            date_match = re.search(r'(\d{1,2}/\d{1,2}\s*\([月火水木金土日]\)\s*)', time_str)
-                            date_part = date_match.group(1).strip() if date_match else time_str
-                            response_text += f"{date_part}\n"
-                            response_text += "────────\n"
-                            
-                            # 時間順でソート（開始時間でソート）
-                            def get_start_time(event):
-                                time_str = event['time']
-                                # "10/18 (土)19:00〜20:00" から "19:00〜20:00" を抽出
-                                time_match = re.search(r'(\d{1,2}:\d{2}〜\d{1,2}:\d{2})', time_str)
-                                time_part = time_match.group(1) if time_match else time_str
-                                start_time = time_part.split('〜')[0]  # "19:00〜20:00" -> "19:00"
-                                return start_time
-                            
-                            sorted_events = sorted(added_events, key=get_start_time)
-                            
-                            # 各予定を番号付きで表示
-                            for i, event in enumerate(sorted_events, 1):
-                                # 時間部分を抽出（"10:00~11:00" の形式）
-                                time_str = event['time']
-                                time_match = re.search(r'(\d{1,2}:\d{2}〜\d{1,2}:\d{2})', time_str)
-                                time_part = time_match.group(1) if time_match else time_str
-                                response_text += f"{i}. {event['title']}\n"
-                                response_text += f"🕐 {time_part}\n"
-                            
-                            response_text += "────────"
+                    # 全予定を1回のHTTP通信でまとめて追加
+                    results = self.calendar_service.add_events(to_add, line_user_id) if to_add else []
+                    for (title, start_datetime, end_datetime, _), (success, message, result) in zip(to_add, results):
+                        if success:
+                            added_events.append(self._added_event(title, start_datetime, end_datetime))
                         else:
-                            # 通常の表示形式
-                            response_text = "✅予定を追加しました！\n\n"
-                            for event in added_events:
-                                response_text += f"📅{event['title']}\n{event['time']}\n"
-                        
-                        if failed_events:
-                            response_text += "\n\n⚠️追加できなかった予定:\n"
-                            for event in failed_events:
-                                response_text += f"• {event['title']} - {event['reason']}\n"
-                    else:
-                        response_text = "❌予定を追加できませんでした。\n\n"
-                        for event in failed_events:
-                            response_text += f"• {event['title']} - {event['reason']}\n"
+                            failed_events.append({
+                                'title': title,
+                                'reason': message
+                            })
                     
-                    return TextSendMessage(text=response_text)
+                    # 結果メッセージを構築（移動時間を含む場合は統一形式）
+                    return TextSendMessage(text=self._format_add_result(added_events, failed_events))
                 else:
                     # 単一イベントの場合（従来の処理）
                     event_info = events_data
-                    from dateutil import parser
-                    start_datetime = parser.parse(event_info['start_datetime'])
-                    end_datetime = parser.parse(event_info['end_datetime'])
+                    start_datetime = _parse_datetime(event_info['start_datetime'])
+                    end_datetime = _parse_datetime(event_info['end_datetime'])
                     # 既にタイムゾーンが設定されている場合はそのまま使用、そうでなければJSTを設定
                     if start_datetime.tzinfo is None:
-                        start_datetime = self.jst.localize(start_datetime)
+                        start_datetime = start_datetime.replace(tzinfo=JST)
                     if end_datetime.tzinfo is None:
-                        end_datetime = self.jst.localize(end_datetime)
+                        end_datetime = end_datetime.replace(tzinfo=JST)
                     if not self.calendar_service or not self.ai_service:
                         return TextSendMessage(text="カレンダーサービスまたはAIサービスが初期化されていません。")
                     success, message, result = self.calendar_service.add_event(
@@ -251,14 +266,13 @@ class LineBotHandler:
                         line_user_id=line_user_id,
                         force_add=True
                     )
-                    self.db_helper.delete_pending_event(line_user_id)
                     response_text = self.ai_service.format_event_confirmation(success, message, result)
                     return TextSendMessage(text=response_text)
+            # 保留中の予定がない「はい」は日時を含まないので、AIに問い合わせずに使い方を返す
+            return TextSendMessage(text=_GUIDANCE_TEXT)
         else:
             # 「はい」以外の返答でpending_eventsがあれば削除し、キャンセルメッセージを返す
-            pending_json = self.db_helper.get_pending_event(line_user_id)
-            if pending_json:
-                self.db_helper.delete_pending_event(line_user_id)
+            if self.db_helper.pop_pending_event(line_user_id):
                 return TextSendMessage(text="予定追加をキャンセルしました。")
         
         try:
@@ -266,16 +280,24 @@ class LineBotHandler:
             if not Config.LINE_CHANNEL_ACCESS_TOKEN or not Config.LINE_CHANNEL_SECRET:
                 return TextSendMessage(text="LINE Botの設定が完了していません。環境変数を設定してください。")
             
+            if stripped_message in _HELP_MESSAGES:
+                return TextSendMessage(text=_GUIDANCE_TEXT)
+            
+            # 月だけの入力はAIで解析しても月全体の処理になるだけなので、AIを呼ばずに処理する
+            month_only = _MONTH_ONLY_RE.fullmatch(stripped_message)
+            if month_only and 1 <= int(month_only.group(1)) <= 12:
+                return self._handle_month_availability(int(month_only.group(1)), line_user_id, location='', travel_time_minutes=None)
+            
             if not self.ai_service:
                 return TextSendMessage(text="AIサービスの初期化に失敗しました。OpenAI APIキーを設定してください。")
             
             # AIを使ってメッセージの意図を判断
             ai_result = self.ai_service.extract_dates_and_times(user_message)
-            print(f"[DEBUG] ai_result: {ai_result}")
+            logger.debug("ai_result: %s", ai_result)
             
             # 月のみ入力パターンをチェック
-            month_match = re.search(r'(\d{1,2})月', user_message.strip())
-            if month_match and not re.search(r'\d{1,2}日', user_message):
+            month_match = _MONTH_RE.search(user_message.strip())
+            if month_match and not _DAY_RE.search(user_message):
                 # 「明日」「明後日」「今日」など相対的な指定が含まれる場合は月全体処理をスキップ
                 relative_keywords = ['明日', '明後日', '今日', '本日']
                 if any(keyword in user_message for keyword in relative_keywords):
@@ -290,17 +312,17 @@ class LineBotHandler:
             
             if 'error' in ai_result:
                 # AI処理に失敗した場合、ガイダンスメッセージを返す
-                return TextSendMessage(text="日時の送信で空き時間が分かります！\n日時と内容の送信で予定を追加します！\n\n例：\n・「明日の空き時間」\n・「7/15 15:00〜16:00の空き時間」\n・「明日の午前9時から会議を追加して」\n・「来週月曜日の14時から打ち合わせ」")
+                return TextSendMessage(text=_GUIDANCE_TEXT)
             
             # タスクタイプに基づいて処理
             task_type = ai_result.get('task_type', 'add_event')
             
             if task_type == 'availability_check':
-                print(f"[DEBUG] dates_info: {ai_result.get('dates', [])}")
+                logger.debug("dates_info: %s", ai_result.get('dates', []))
                 location = ai_result.get('location', '')
                 travel_time_minutes = ai_result.get('travel_time_minutes', None)
-                print(f"[DEBUG] location: {location}")
-                print(f"[DEBUG] travel_time_minutes: {travel_time_minutes}")
+                logger.debug("location: %s", location)
+                logger.debug("travel_time_minutes: %s", travel_time_minutes)
                 return self._handle_availability_check(ai_result.get('dates', []), line_user_id, location=location, travel_time_minutes=travel_time_minutes)
             elif task_type == 'add_event':
                 # 予定追加時の重複確認ロジック（複数予定対応）
@@ -315,231 +337,213 @@ class LineBotHandler:
                 return self._handle_multiple_events(dates, line_user_id)
             else:
                 # 未対応コマンドの場合もガイダンスメッセージ
-                return TextSendMessage(text="日時の送信で空き時間が分かります！\n日時と内容の送信で予定を追加します！\n\n例：\n・「明日の空き時間」\n・「7/15 15:00〜16:00の空き時間」\n・「明日の午前9時から会議を追加して」\n・「来週月曜日の14時から打ち合わせ」")
+                return TextSendMessage(text=_GUIDANCE_TEXT)
         except Exception as e:
             return TextSendMessage(text=f"エラーが発生しました: {str(e)}")
     
+    def _added_event(self, title, start, end):
+        """結果メッセージ用の追加済み予定（表示用の "10/18（土）19:00〜20:00" に加え、日付部分・時間部分と並べ替え用の開始時刻も持たせる）"""
+        s = start.astimezone(JST)
+        e = end.astimezone(JST)
+        date_part = f"{s.month}/{s.day}（{_WEEKDAY_JP[s.weekday()]}）"
+        time_part = f"{s:%H:%M}〜{e:%H:%M}"
+        return {
+            'title': title,
+            'time': f"{date_part}{time_part}",
+            'date_part': date_part,
+            'time_part': time_part,
+            'sort_key': f"{s:%H:%M}"
+        }
+    
+    def _format_add_result(self, added_events, failed_events):
+        """予定追加の結果メッセージを構築します（移動時間を含む場合は統一形式。文字列は部品のリストに積んで最後に1回だけ連結する）"""
+        if not added_events:
+            parts = ["❌予定を追加できませんでした。\n\n"]
+            parts.extend(self._format_failed_event(event) for event in failed_events)
+            return "".join(parts)
+        
+        parts = ["✅予定を追加しました！\n\n"]
+        # 移動時間が含まれているかチェック
+        has_travel = any('移動時間' in event['title'] for event in added_events)
+        
+        if has_travel and len(added_events) > 1:
+            # 移動時間を含む場合は統一形式で表示
+            # 日付を取得（最初の予定から）
+            parts.append(f"{added_events[0]['date_part']}\n")
+            parts.append("────────\n")
+            
+            # 時間順でソート（開始時間でソート）
+            sorted_events = sorted(added_events, key=itemgetter('sort_key'))
+            
+            # 各予定を番号付きで表示
+            for i, event in enumerate(sorted_events, 1):
+                parts.append(f"{i}. {event['title']}\n🕐 {event['time_part']}\n")
+            
+            parts.append("────────")
+        else:
+            # 通常の表示形式
+            parts.extend(f"📅{event['title']}\n{event['time']}\n" for event in added_events)
+        
+        if failed_events:
+            parts.append("\n\n⚠️追加できなかった予定:\n")
+            parts.extend(self._format_failed_event(event) for event in failed_events)
+        return "".join(parts)
+    
+    @staticmethod
+    def _format_failed_event(event):
+        if 'time' in event:
+            return f"• {event['title']} ({event['time']}) - {event['reason']}\n"
+        return f"• {event['title']} - {event['reason']}\n"
+    
+    def _prepare_events(self, dates):
+        """AIが抽出した予定情報から開始・終了日時を構築します（戻り値は(構築できた予定のリスト, 構築に失敗した予定のリスト)）
+        各予定はpending_eventsに保存する項目（PENDING_EVENT_KEYS）とパース済みのdatetime（start/end）を持つ"""
+        prepared = []
+        failed_events = []
+        for date_info in dates:
+            try:
+                # 日時を構築
+                date_str = date_info.get('date')
+                time_str = date_info.get('time')
+                end_time_str = date_info.get('end_time')
+                title = date_info.get('title', '予定')
+                description = date_info.get('description', '')
+                
+                if not date_str or not time_str:
+                    logger.debug("不完全な予定情報をスキップ: %s", date_info)
+                    continue
+                
+                # 終了時間が設定されていない場合は1時間後に設定（元の設定を維持）
+                if not end_time_str or end_time_str == time_str:
+                    time_obj = datetime.strptime(time_str, "%H:%M")
+                    end_time_obj = time_obj + timedelta(hours=1)
+                    end_time_str = end_time_obj.strftime("%H:%M")
+                    logger.debug("終了時間を自動設定: %s -> %s", time_str, end_time_str)
+                
+                # 日時文字列を構築
+                start_datetime_str = f"{date_str}T{time_str}:00+09:00"
+                end_datetime_str = f"{date_str}T{end_time_str}:00+09:00"
+                
+                logger.debug("予定追加処理: %s - %s to %s", title, start_datetime_str, end_datetime_str)
+                
+                # 日時をパース（タイムゾーン処理を改善）
+                start_datetime = _parse_datetime(start_datetime_str)
+                end_datetime = _parse_datetime(end_datetime_str)
+                
+                # 既にタイムゾーンが設定されている場合はそのまま使用、そうでなければJSTを設定
+                if start_datetime.tzinfo is None:
+                    start_datetime = start_datetime.replace(tzinfo=JST)
+                if end_datetime.tzinfo is None:
+                    end_datetime = end_datetime.replace(tzinfo=JST)
+                
+                prepared.append({
+                    'title': title,
+                    'start': start_datetime,
+                    'end': end_datetime,
+                    'description': description,
+                    'start_datetime': start_datetime_str,
+                    'end_datetime': end_datetime_str,
+                    'time': time_str,
+                    'end_time': end_time_str
+                })
+            except Exception as e:
+                logger.debug("予定処理エラー: %s", e)
+                failed_events.append({
+                    'title': date_info.get('title', '予定'),
+                    'time': f"{date_info.get('time', '')}-{date_info.get('end_time', '')}",
+                    'reason': str(e)
+                })
+        return prepared, failed_events
+    
     def _handle_multiple_events(self, dates, line_user_id):
         """複数の予定を処理します"""
         try:
-            from dateutil import parser
-            import json
             
             added_events = []
-            failed_events = []
-            
-            for date_info in dates:
-                try:
-                    # 日時を構築
-                    date_str = date_info.get('date')
-                    time_str = date_info.get('time')
-                    end_time_str = date_info.get('end_time')
-                    title = date_info.get('title', '予定')
-                    description = date_info.get('description', '')
-                    
-                    if not date_str or not time_str:
-                        print(f"[DEBUG] 不完全な予定情報をスキップ: {date_info}")
-                        continue
-                    
-                    # 終了時間が設定されていない場合は1時間後に設定（元の設定を維持）
-                    if not end_time_str or end_time_str == time_str:
-                        from datetime import datetime, timedelta
-                        time_obj = datetime.strptime(time_str, "%H:%M")
-                        end_time_obj = time_obj + timedelta(hours=1)
-                        end_time_str = end_time_obj.strftime("%H:%M")
-                        print(f"[DEBUG] 終了時間を自動設定: {time_str} -> {end_time_str}")
-                    
-                    # 日時文字列を構築
-                    start_datetime_str = f"{date_str}T{time_str}:00+09:00"
-                    end_datetime_str = f"{date_str}T{end_time_str}:00+09:00"
-                    
-                    print(f"[DEBUG] 予定追加処理: {title} - {start_datetime_str} to {end_datetime_str}")
-                    
-                    # 日時をパース（タイムゾーン処理を改善）
-                    start_datetime = parser.parse(start_datetime_str)
-                    end_datetime = parser.parse(end_datetime_str)
-                    
-                    # 既にタイムゾーンが設定されている場合はそのまま使用、そうでなければJSTを設定
-                    if start_datetime.tzinfo is None:
-                        start_datetime = self.jst.localize(start_datetime)
-                    if end_datetime.tzinfo is None:
-                        end_datetime = self.jst.localize(end_datetime)
-                    
-                    # 既存予定をチェック
-                    events = self.calendar_service.get_events_for_time_range(start_datetime, end_datetime, line_user_id)
-                    if events:
-                        print(f"[DEBUG] 重複予定を検出: {title}")
-                        # 重複確認メッセージを表示
-                        conflicting_events = []
-                        for event in events:
-                            conflicting_events.append({
-                                'title': event.get('title', '予定なし'),
-                                'start': event.get('start', ''),
-                                'end': event.get('end', '')
-                            })
-                        
-                        # 重複確認メッセージを構築
-                        response_text = "⚠️ この時間帯に既に予定が存在します:\n"
-                        for event in conflicting_events:
-                            # 時間をフォーマット
-                            start_time = event['start']
-                            end_time = event['end']
-                            if 'T' in start_time:
-                                start_dt = parser.parse(start_time)
-                                end_dt = parser.parse(end_time)
-                                start_dt = start_dt.astimezone(self.jst)
-                                end_dt = end_dt.astimezone(self.jst)
-                                time_str = f"{start_dt.strftime('%H:%M')}~{end_dt.strftime('%H:%M')}"
-                            else:
-                                time_str = f"{start_time}~{end_time}"
-                            
-                            response_text += f"- {event['title']}\n({time_str})\n"
-                        
-                        response_text += "\nそれでも追加しますか？\n「はい」と返信してください。"
-                        
-                        # 全イベント（移動時間含む）をpending_eventsに保存
-                        all_events = []
-                        for date_info in dates:
-                            event_date_str = date_info.get('date')
-                            event_time_str = date_info.get('time')
-                            event_end_time_str = date_info.get('end_time')
-                            event_title = date_info.get('title', '予定')
-                            event_description = date_info.get('description', '')
-                            
-                            if not event_date_str or not event_time_str:
-                                continue
-                            
-                            # 終了時間が設定されていない場合は1時間後に設定
-                            if not event_end_time_str or event_end_time_str == event_time_str:
-                                from datetime import datetime, timedelta
-                                time_obj = datetime.strptime(event_time_str, "%H:%M")
-                                end_time_obj = time_obj + timedelta(hours=1)
-                                event_end_time_str = end_time_obj.strftime("%H:%M")
-                            
-                            event_datetime_str = f"{event_date_str}T{event_time_str}:00+09:00"
-                            event_end_datetime_str = f"{event_date_str}T{event_end_time_str}:00+09:00"
-                            
-                            all_events.append({
-                                'title': event_title,
-                                'start_datetime': event_datetime_str,
-                                'end_datetime': event_end_datetime_str,
-                                'description': event_description
-                            })
-                        
-                        import json
-                        self.db_helper.save_pending_event(line_user_id, json.dumps(all_events))
-                        
-                        return TextSendMessage(text=response_text)
-                    
-                    # 予定を追加
-                    success, message, result = self.calendar_service.add_event(
-                        title,
-                        start_datetime,
-                        end_datetime,
-                        description,
-                        line_user_id=line_user_id,
-                        force_add=True
-                    )
-                    
-                    if success:
-                        # 元の表示形式に合わせて日時をフォーマット
-                        from datetime import datetime
-                        import pytz
-                        jst = pytz.timezone('Asia/Tokyo')
-                        start_dt = start_datetime.astimezone(jst)
-                        end_dt = end_datetime.astimezone(jst)
-                        weekday = "月火水木金土日"[start_dt.weekday()]
-                        date_str = f"{start_dt.month}/{start_dt.day}（{weekday}）"
-                        time_str = f"{start_dt.strftime('%H:%M')}〜{end_dt.strftime('%H:%M')}"
-                        
-                        added_events.append({
-                            'title': title,
-                            'time': f"{date_str}{time_str}"
+            
+            # 1. 日時を構築（API呼び出しは後でまとめて行う）
+            prepared, failed_events = self._prepare_events(dates)
+            
+            # 2. 既存予定をチェック（全予定分を1回のHTTP通信で問い合わせる）
+            existing_events = self.calendar_service.get_events_for_time_ranges(
+                [(item['start'], item['end']) for item in prepared], line_user_id
+            )
+            for index, item in enumerate(prepared):
+                events = list(existing_events[index])
+                # 同じメッセージ内で先に追加する予定と重なる場合も重複として扱う
+                for earlier in prepared[:index]:
+                    if earlier['start'] < item['end'] and earlier['end'] > item['start']:
+                        events.append({
+                            'title': earlier['title'],
+                            'start': earlier['start'].isoformat(),
+                            'end': earlier['end'].isoformat()
                         })
-                        print(f"[DEBUG] 予定追加成功: {title}")
-                    else:
-                        failed_events.append({
-                            'title': title,
-                            'time': f"{time_str}-{end_time_str}",
-                            'reason': message
+                if events:
+                    logger.debug("重複予定を検出: %s", item['title'])
+                    # 重複確認メッセージを表示
+                    conflicting_events = []
+                    for event in events:
+                        conflicting_events.append({
+                            'title': event.get('title', '予定なし'),
+                            'start': event.get('start', ''),
+                            'end': event.get('end', '')
                         })
-                        print(f"[DEBUG] 予定追加失敗: {title} - {message}")
-                        
-                except Exception as e:
-                    print(f"[DEBUG] 予定処理エラー: {e}")
-                    failed_events.append({
-                        'title': date_info.get('title', '予定'),
-                        'time': f"{date_info.get('time', '')}-{date_info.get('end_time', '')}",
-                        'reason': str(e)
-                    })
-            
-            # 結果メッセージを構築（移動時間を含む場合は統一形式）
-            if added_events:
-                # 移動時間が含まれているかチェック
-                has_travel = any('移動時間' in event['title'] for event in added_events)
-                
-                if has_travel and len(added_events) > 1:
-                    # 移動時間を含む場合は統一形式で表示
-                    response_text = "✅予定を追加しました！\n\n"
                     
-                    # 日付を取得（最初の予定から）
-                    first_event = added_events[0]
-                    time_str = first_event['time']
-                    # "10/18 (土)19:00〜20:00" から "10/18 (土)" を抽出
-                    date_match = re.search(r'(\d{1,2}/\d{1,2}\s*\([月火水木金土日]\)\s*)', time_str)
-                    date_part = date_match.group(1).strip() if date_match else time_str
-                    response_text += f"{date_part}\n"
-                    response_text += "────────\n"
+                    # 重複確認メッセージを構築
+                    response_text = "⚠️ この時間帯に既に予定が存在します:\n"
+                    for event in conflicting_events:
+                        # 時間をフォーマット
+                        start_time = event['start']
+                        end_time = event['end']
+                        if 'T' in start_time:
+                            start_dt = _parse_datetime(start_time)
+                            end_dt = _parse_datetime(end_time)
+                            start_dt = start_dt.astimezone(JST)
+                            end_dt = end_dt.astimezone(JST)
+                            time_str = f"{start_dt.strftime('%H:%M')}~{end_dt.strftime('%H:%M')}"
+                        else:
+                            time_str = f"{start_time}~{end_time}"
+                        
+                        response_text += f"- {event['title']}\n({time_str})\n"
                     
-                    # 時間順でソート（開始時間でソート）
-                    def get_start_time(event):
-                        time_str = event['time']
-                        # "10/18 (土)19:00〜20:00" から "19:00〜20:00" を抽出
-                        time_match = re.search(r'(\d{1,2}:\d{2}〜\d{1,2}:\d{2})', time_str)
-                        time_part = time_match.group(1) if time_match else time_str
-                        start_time = time_part.split('〜')[0]  # "19:00〜20:00" -> "19:00"
-                        return start_time
+                    response_text += "\nそれでも追加しますか？\n「はい」と返信してください。"
                     
-                    sorted_events = sorted(added_events, key=get_start_time)
+                    # 全イベント（移動時間含む）をpending_eventsに保存（構築済みの日時文字列をそのまま使う）
+                    all_events = [{key: item[key] for key in PENDING_EVENT_KEYS} for item in prepared]
                     
-                    # 各予定を番号付きで表示
-                    for i, event in enumerate(sorted_events, 1):
-                        # 時間部分を抽出（"10:00~11:00" の形式）
-                        # 日付と時間の区切りを正しく処理
-                        time_str = event['time']
-                        # "10/18 (土)19:00〜20:00" から "19:00〜20:00" を抽出
-                        time_match = re.search(r'(\d{1,2}:\d{2}〜\d{1,2}:\d{2})', time_str)
-                        time_part = time_match.group(1) if time_match else time_str
-                        response_text += f"{i}. {event['title']}\n"
-                        response_text += f"🕐 {time_part}\n"
+                    self.db_helper.save_pending_event(line_user_id, json.dumps(all_events))
                     
-                    response_text += "────────"
+                    return TextSendMessage(text=response_text)
+            
+            # 3. 予定を追加（重複がなければ全予定を1回のHTTP通信で追加する）
+            results = self.calendar_service.add_events(
+                [(item['title'], item['start'], item['end'], item['description']) for item in prepared],
+                line_user_id
+            )
+            for item, (success, message, result) in zip(prepared, results):
+                title = item['title']
+                if success:
+                    added_events.append(self._added_event(title, item['start'], item['end']))
+                    logger.debug("予定追加成功: %s", title)
                 else:
-                    # 通常の表示形式
-                    response_text = "✅予定を追加しました！\n\n"
-                    for event in added_events:
-                        response_text += f"📅{event['title']}\n{event['time']}\n"
-                
-                if failed_events:
-                    response_text += "\n\n⚠️追加できなかった予定:\n"
-                    for event in failed_events:
-                        response_text += f"• {event['title']} ({event['time']}) - {event['reason']}\n"
-            else:
-                response_text = "❌予定を追加できませんでした。\n\n"
-                for event in failed_events:
-                    response_text += f"• {event['title']} ({event['time']}) - {event['reason']}\n"
+                    failed_events.append({
+                        'title': title,
+                        'time': f"{item['time']}-{item['end_time']}",
+                        'reason': message
+                    })
+                    logger.debug("予定追加失敗: %s - %s", title, message)
             
-            return TextSendMessage(text=response_text)
+            # 結果メッセージを構築（移動時間を含む場合は統一形式）
+            return TextSendMessage(text=self._format_add_result(added_events, failed_events))
             
         except Exception as e:
-            print(f"[DEBUG] 複数予定処理エラー: {e}")
+            logger.debug("複数予定処理エラー: %s", e)
             return TextSendMessage(text=f"予定の処理中にエラーが発生しました: {str(e)}")
     
     def _handle_month_availability(self, month_num, line_user_id, location=None, travel_time_minutes=None):
         """月全体の空き時間を処理します"""
-        import calendar
         try:
-            now_jst = datetime.now(self.jst)
+            now_jst = datetime.now(JST)
             
             # 現在年を取得、過去月の場合は来年
             year = now_jst.year
@@ -550,208 +554,224 @@ class LineBotHandler:
             
             # 月の日数と最初・最後の日を取得
             _, last_day = calendar.monthrange(year, month_num)
-            first_date = datetime(year, month_num, 1)
-            last_date = datetime(year, month_num, last_day)
-            
-            # dates_infoを作成（その月の全日付）
-            dates_info = []
-            current_date = first_date.date()
-            while current_date <= last_date.date():
-                date_str = current_date.isoformat()
-                dates_info.append({
-                    'date': date_str,
-                    'time': '08:00',
-                    'end_time': '23:59'
-                })
-                current_date += timedelta(days=1)
+            first_ordinal = date(year, month_num, 1).toordinal()
+            
+            # dates_infoを作成（その月の全日付。枠は毎日同じ8:00〜23:59）
+            dates_info = [
+                {'date': date.fromordinal(first_ordinal + i).isoformat(), 'time': MONTH_FRAME_START, 'end_time': MONTH_FRAME_END}
+                for i in range(last_day)
+            ]
             
-            print(f"[DEBUG] 月全体の空き時間処理: {year}年{month_num}月 ({len(dates_info)}日), location: {location}, travel_time_minutes: {travel_time_minutes}")
+            logger.debug("月全体の空き時間処理: %s年%s月 (%s日), location: %s, travel_time_minutes: %s", year, month_num, len(dates_info), location, travel_time_minutes)
             
             # 通常の空き時間チェック処理を呼び出し
             return self._handle_availability_check(dates_info, line_user_id, location=location, travel_time_minutes=travel_time_minutes)
             
         except Exception as e:
-            print(f"[DEBUG] 月全体の空き時間処理でエラー: {e}")
-            import traceback
+            logger.debug("月全体の空き時間処理でエラー: %s", e)
             traceback.print_exc()
             return TextSendMessage(text=f"月の空き時間確認でエラーが発生しました: {str(e)}")
     
     def _handle_availability_check(self, dates_info, line_user_id, location=None, travel_time_minutes=None):
         """空き時間確認を処理します"""
         try:
-            print(f"[DEBUG] _handle_availability_check開始")
-            print(f"[DEBUG] dates_info: {dates_info}")
-            print(f"[DEBUG] line_user_id: {line_user_id}")
-            print(f"[DEBUG] location: {location}")
-            print(f"[DEBUG] travel_time_minutes: {travel_time_minutes}")
+            logger.debug("_handle_availability_check開始")
+            logger.debug("dates_info: %s", dates_info)
+            logger.debug("line_user_id: %s", line_user_id)
+            logger.debug("location: %s", location)
+            logger.debug("travel_time_minutes: %s", travel_time_minutes)
             
             # ユーザーの認証状態をチェック
             if not self._check_user_auth(line_user_id):
-                print(f"[DEBUG] ユーザー認証未完了")
+                logger.debug("ユーザー認証未完了")
                 return self._send_auth_guide(line_user_id)
             
             if not self.calendar_service:
-                print(f"[DEBUG] カレンダーサービス未初期化")
+                logger.debug("カレンダーサービス未初期化")
                 return TextSendMessage(text="Google Calendarサービスが初期化されていません。認証ファイルを確認してください。")
             
             if not self.ai_service:
-                print(f"[DEBUG] AIサービス未初期化")
+                logger.debug("AIサービス未初期化")
                 return TextSendMessage(text="AIサービスが初期化されていません。")
             
             if not dates_info:
-                print(f"[DEBUG] dates_infoが空")
+                logger.debug("dates_infoが空")
                 return TextSendMessage(text="日付を正しく認識できませんでした。\n\n例: 「明日7/7 15:00〜15:30の空き時間を教えて」")
             
-            print(f"[DEBUG] 空き時間計算開始")
-            free_slots_by_frame = []
+            logger.debug("空き時間計算開始")
+            # 1. 全枠の日時を先に変換・検証する（必須項目が不足している枠は除き、変換できない枠は空き時間なしとして残す）
+            frames = []
             for i, date_info in enumerate(dates_info):
-                print(f"[DEBUG] 日付{i+1}処理開始: {date_info}")
+                logger.debug("日付%s処理開始: %s", i+1, date_info)
                 date_str = date_info.get('date')
                 start_time = date_info.get('time')
                 end_time = date_info.get('end_time')
                 
-                print(f"[DEBUG] 日付{i+1}の抽出値: date={date_str}, start_time={start_time}, end_time={end_time}")
+                logger.debug("日付%sの抽出値: date=%s, start_time=%s, end_time=%s", i+1, date_str, start_time, end_time)
                 
-                if date_str and start_time and end_time:
-                    try:
-                        jst = pytz.timezone('Asia/Tokyo')
-                        start_dt = jst.localize(datetime.strptime(f"{date_str} {start_time}", "%Y-%m-%d %H:%M"))
-                        end_dt = jst.localize(datetime.strptime(f"{date_str} {end_time}", "%Y-%m-%d %H:%M"))
-                        
-                        print(f"[DEBUG] 日付{i+1}のdatetime: start_dt={start_dt}, end_dt={end_dt}")
-                        
-                        # 枠内の予定を取得
-                        print(f"[DEBUG] 日付{i+1}の予定取得開始")
-                        all_events = self.calendar_service.get_events_for_time_range(start_dt, end_dt, line_user_id)
-                        print(f"[DEBUG] 日付{i+1}の取得予定: {all_events}")
-                        
-                        # 場所フィルタリング
-                        if location:
-                            print(f"[DEBUG] 場所フィルタ適用: {location}")
-                            # その日付に「場所」を含む終日予定があるかチェック
-                            has_location_event = False
-                            filtered_events = []
-                            for event in all_events:
-                                event_location = event.get('location', '')
-                                event_title = event.get('title', '')
-                                is_all_day = event.get('is_all_day', False)
-                                # 終日予定のタイトルに場所が含まれている場合のみ
-                                if is_all_day and (location in event_location or location in event_title):
-                                    has_location_event = True
-                                    print(f"[DEBUG] 場所を含む終日予定を発見: {event}")
-                                    # 終日マーカーは空き時間計算から除外
-                                else:
-                                    # 終日マーカー以外の予定は空き時間計算に含める
-                                    filtered_events.append(event)
-                            
-                            # その日に「場所」を含む終日予定がない場合はスキップ
-                            if not has_location_event:
-                                print(f"[DEBUG] 日付{i+1}には場所を含む終日予定がないためスキップ")
-                                continue
-                            
-                            # 場所を含む終日予定がある場合、終日マーカーを除いた予定を使う
-                            events = filtered_events
-                            print(f"[DEBUG] 場所フィルタ通過、終日マーカーを除いた予定を使用: {len(events)}件")
-                        else:
-                            # 場所フィルタがない場合でも、終日マーカーは空き時間計算から除外
-                            filtered_events = []
-                            for event in all_events:
-                                is_all_day = event.get('is_all_day', False)
-                                # 終日予定は場所マーカーとして空き時間計算から除外
-                                if not is_all_day:
-                                    filtered_events.append(event)
-                                else:
-                                    print(f"[DEBUG] 終日マーカーを除外: {event}")
-                            events = filtered_events
-                            print(f"[DEBUG] 終日マーカーを除いた予定を使用: {len(events)}件")
-                        
-                        # 8:00〜24:00の間で空き時間を返す
-                        day_start = "08:00"
-                        day_end = "23:59"
-                        # 枠の範囲と8:00〜24:00の重なり部分だけを対象にする
-                        slot_start = max(start_time, day_start)
-                        slot_end = min(end_time, day_end)
-                        
-                        print(f"[DEBUG] 日付{i+1}のスロット範囲: slot_start={slot_start}, slot_end={slot_end}")
-                        
-                        slot_start_dt = jst.localize(datetime.strptime(f"{date_str} {slot_start}", "%Y-%m-%d %H:%M"))
-                        slot_end_dt = jst.localize(datetime.strptime(f"{date_str} {slot_end}", "%Y-%m-%d %H:%M"))
-                        
-                        print(f"[DEBUG] 日付{i+1}のスロットdatetime: slot_start_dt={slot_start_dt}, slot_end_dt={slot_end_dt}")
-                        
-                        if slot_start < slot_end:
-                            print(f"[DEBUG] 日付{i+1}の空き時間計算開始")
-                            free_slots = self.calendar_service.find_free_slots_for_day(slot_start_dt, slot_end_dt, events)
-                            print(f"[DEBUG] 日付{i+1}の空き時間結果: {free_slots}")
-                            
-                            # 移動時間が指定されている場合、前後に移動時間分の余裕が必要な空き時間のみ抽出
-                            if travel_time_minutes and travel_time_minutes > 0:
-                                print(f"[DEBUG] 移動時間フィルタ適用: {travel_time_minutes}分")
-                                filtered_free_slots = []
-                                travel_delta = timedelta(minutes=travel_time_minutes)
-                                for slot in free_slots:
-                                    slot_start_str = slot['start']
-                                    slot_end_str = slot['end']
-                                    # 開始時刻と終了時刻をdatetimeに変換
-                                    slot_start_parsed = jst.localize(datetime.strptime(f"{date_str} {slot_start_str}", "%Y-%m-%d %H:%M"))
-                                    slot_end_parsed = jst.localize(datetime.strptime(f"{date_str} {slot_end_str}", "%Y-%m-%d %H:%M"))
-                                    # 実際に予定を入れられる時間を計算（移動時間を除く）
-                                    available_start = slot_start_parsed + travel_delta
-                                    available_end = slot_end_parsed - travel_delta
-                                    
-                                    # 利用可能時間があるかチェック
-                                    if available_start < available_end:
-                                        # 利用可能時間を作成
-                                        available_slot = {
-                                            'start': available_start.strftime('%H:%M'),
-                                            'end': available_end.strftime('%H:%M')
-                                        }
-                                        filtered_free_slots.append(available_slot)
-                                        print(f"[DEBUG] 移動時間考慮後の利用可能時間: {available_slot} (元の空き時間: {slot_start_str}〜{slot_end_str})")
-                                    else:
-                                        print(f"[DEBUG] 移動時間不足で除外: {slot_start_str}〜{slot_end_str}")
-                                free_slots = filtered_free_slots
-                                print(f"[DEBUG] 移動時間フィルタ後: {len(free_slots)}件")
-                        else:
-                            print(f"[DEBUG] 日付{i+1}のスロット範囲が無効: {slot_start} >= {slot_end}")
-                            free_slots = []
-                        
-                        free_slots_by_frame.append({
-                            'date': date_str,
-                            'start_time': slot_start,
-                            'end_time': slot_end,
-                            'free_slots': free_slots
-                        })
-                        print(f"[DEBUG] 日付{i+1}のfree_slots_by_frame追加完了")
-                    
-                    except Exception as e:
-                        print(f"[DEBUG] 日付{i+1}処理でエラー: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        # エラーが発生しても他の日付は処理を続行
-                        free_slots_by_frame.append({
-                            'date': date_str,
-                            'start_time': start_time,
-                            'end_time': end_time,
-                            'free_slots': []
-                        })
+                if not (date_str and start_time and end_time):
+                    logger.debug("日付%sの必須項目が不足: date_str=%s, start_time=%s, end_time=%s", i+1, date_str, start_time, end_time)
+                    continue
+                
+                # 形式を先に検証し、変換できない枠は例外を使わずに空き時間なしとして残す
+                if isinstance(date_str, str) and isinstance(start_time, str) and isinstance(end_time, str):
+                    start_minutes = _to_minutes(start_time)
+                    end_minutes = _to_minutes(end_time)
+                    midnight = _jst_midnight(date_str) if start_minutes is not None and end_minutes is not None else None
                 else:
-                    print(f"[DEBUG] 日付{i+1}の必須項目が不足: date_str={date_str}, start_time={start_time}, end_time={end_time}")
-            
-            print(f"[DEBUG] 全日付処理完了、free_slots_by_frame: {free_slots_by_frame}")
-            
-            print(f"[DEBUG] format_free_slots_response_by_frame呼び出し")
+                    midnight = None
+                if midnight is None:
+                    logger.debug("日付%sの日時が不正: date_str=%s, start_time=%s, end_time=%s", i+1, date_str, start_time, end_time)
+                    frames.append(_Frame(date_str, start_time, end_time, None, None, None, None, None, None))
+                    continue
+                
+                # 8:00〜24:00の間で空き時間を返す（枠の範囲と8:00〜24:00の重なり部分だけを対象にする）
+                # 時刻は分数（整数）で比較・切り詰め、datetimeはその日の0:00に分数を足して作る
+                slot_start = max(start_minutes, DAY_START_MINUTES)
+                slot_end = min(end_minutes, DAY_END_MINUTES)
+                # 8:00〜23:59と重ならない枠は空き時間を計算しないので、切り詰めた時間帯のdatetimeは作らない
+                if slot_start < slot_end:
+                    slot_start_dt = midnight + timedelta(minutes=slot_start)
+                    slot_end_dt = midnight + timedelta(minutes=slot_end)
+                else:
+                    slot_start_dt = slot_end_dt = None
+                frame = _Frame(
+                    date_str, start_time, end_time, slot_start, slot_end,
+                    midnight + timedelta(minutes=start_minutes), midnight + timedelta(minutes=end_minutes),
+                    slot_start_dt, slot_end_dt
+                )
+                logger.debug("日付%sの枠: %s", i+1, frame)
+                frames.append(frame)
+            
+            # 同じ日付・時間帯の枠は1回だけ取得・計算し、結果を元の順番に当てはめ直す
+            # （場所・移動時間はリクエスト内で共通なので、日付・開始・終了が同じなら結果も同じ。変換できなかった枠はそれぞれ別扱い）
+            def frame_key(frame):
+                return frame[:3] if frame.start_dt is not None else id(frame)
+            unique_frames = {frame_key(frame): frame for frame in frames}
+            
+            # 2. 全枠の予定をまとめて取得（枠ごとにAPIを呼ばず、近い枠は1回のevents.list、離れた枠は1回のバッチで問い合わせる）
+            # 空き時間を計算しない枠（8:00〜23:59と重ならない枠）は、場所フィルタで終日予定を見る必要があるときだけ取得する
+            valid_frames = [
+                frame for frame in unique_frames.values()
+                if frame.start_dt is not None and (location or frame.slot_start_dt is not None)
+            ]
+            prefetched_events = dict(zip(
+                map(frame_key, valid_frames),
+                self.calendar_service.get_events_for_time_ranges([(frame.start_dt, frame.end_dt) for frame in valid_frames], line_user_id)
+            )) if valid_frames else {}
+            
+            # 3. 枠ごとに空き時間を計算（移動時間と必要な空き幅は全枠で共通なので先に求めておく）
+            if travel_time_minutes and travel_time_minutes > 0:
+                travel_delta = timedelta(minutes=travel_time_minutes)
+                required = 2 * travel_delta
+            else:
+                travel_delta = required = None
+            results_by_key = {
+                key: self._process_availability_frame(
+                    frame, prefetched_events.get(key, []), location, travel_time_minutes, travel_delta, required
+                ) if frame.start_dt is not None else self._failed_frame_result(frame)
+                for key, frame in unique_frames.items()
+            }
+            # 元の順番で並べる（変換できなかった枠は空き時間なし、場所フィルタで対象外になった枠(None)は除く）
+            free_slots_by_frame = [
+                frame_result
+                for frame_result in (results_by_key[frame_key(frame)] for frame in frames)
+                if frame_result is not None
+            ]
+            
+            logger.debug("全日付処理完了、free_slots_by_frame: %s", free_slots_by_frame)
+            
+            logger.debug("format_free_slots_response_by_frame呼び出し")
             response_text = self.ai_service.format_free_slots_response_by_frame(free_slots_by_frame)
-            print(f"[DEBUG] レスポンス生成完了: {response_text}")
+            logger.debug("レスポンス生成完了: %s", response_text)
             
             return TextSendMessage(text=response_text)
             
         except Exception as e:
-            print(f"[DEBUG] _handle_availability_checkで例外発生: {e}")
-            import traceback
+            logger.debug("_handle_availability_checkで例外発生: %s", e)
             traceback.print_exc()
             return TextSendMessage(text=f"空き時間確認でエラーが発生しました: {str(e)}")
     
+    def _process_availability_frame(self, frame, all_events, location, travel_time_minutes, travel_delta, required):
+        """1枠分の空き時間を計算し、free_slots_by_frameの1要素を返します（場所フィルタで対象外になった枠はNone）"""
+        try:
+            logger.debug("日付%sの取得予定: %s", frame.date, all_events)
+            
+            # 場所フィルタリング（終日予定は場所マーカーとして扱い、空き時間計算から除外する）
+            if location:
+                logger.debug("場所フィルタ適用: %s", location)
+                # 終日予定のタイトル・場所に指定の場所が含まれているものだけがマーカー
+                # （タイトルと場所を区切り文字でつないで小文字化し、大文字小文字を区別せず1回の検索で判定する）
+                location_lower = location.lower()
+                is_marker = [
+                    event.get('is_all_day', False)
+                    and location_lower in f"{event.get('title', '')}\x00{event.get('location', '')}".lower()
+                    for event in all_events
+                ]
+                
+                # その日に「場所」を含む終日予定がない場合はスキップ
+                if not any(is_marker):
+                    logger.debug("日付%sには場所を含む終日予定がないためスキップ", frame.date)
+                    return None
+                
+                # 場所を含む終日予定がある場合、そのマーカーを除いた予定を使う
+                events = [event for event, marker in zip(all_events, is_marker) if not marker]
+                logger.debug("場所フィルタ通過、終日マーカーを除いた予定を使用: %s件", len(events))
+            else:
+                # 場所フィルタがない場合でも、終日マーカーは空き時間計算から除外
+                events = [event for event in all_events if not event.get('is_all_day', False)]
+                logger.debug("終日マーカーを除いた予定を使用: %s件", len(events))
+            
+            if frame.slot_start < frame.slot_end:
+                logger.debug("日付%sの空き時間計算開始", frame.date)
+                if events:
+                    free_spans = self.calendar_service.find_free_spans_for_day(frame.slot_start_dt, frame.slot_end_dt, events)
+                else:
+                    # 予定がなければ枠全体が空き時間（サービスを呼ばずに済ませる）
+                    free_spans = [(frame.slot_start_dt, frame.slot_end_dt)]
+                
+                # 移動時間が指定されている場合、前後に移動時間分の余裕が必要な空き時間のみ抽出
+                if travel_delta:
+                    logger.debug("移動時間フィルタ適用: %s分", travel_time_minutes)
+                    # 前後に移動時間を取っても時間が残る空き時間だけを残し、その分だけ縮める（幅の比較1回で判定し、要素ごとの分岐をしない）
+                    free_spans = [
+                        (span_start + travel_delta, span_end - travel_delta)
+                        for span_start, span_end in free_spans
+                        if span_end - span_start > required
+                    ]
+                    logger.debug("移動時間フィルタ後: %s件", len(free_spans))
+                
+                free_slots = [
+                    {'start': span_start.strftime('%H:%M'), 'end': span_end.strftime('%H:%M')}
+                    for span_start, span_end in free_spans
+                ]
+                logger.debug("日付%sの空き時間結果: %s", frame.date, free_slots)
+            else:
+                logger.debug("日付%sのスロット範囲が無効: %s >= %s", frame.date, _format_minutes(frame.slot_start), _format_minutes(frame.slot_end))
+                free_slots = []
+            
+            return {
+                'date': frame.date,
+                'start_time': _format_minutes(frame.slot_start),
+                'end_time': _format_minutes(frame.slot_end),
+                'free_slots': free_slots
+            }
+        
+        except Exception as e:
+            logger.exception("日付%s処理でエラー: %s", frame.date, e)
+            # エラーが発生しても他の日付は処理を続行
+            return self._failed_frame_result(frame)
+    
+    @staticmethod
+    def _failed_frame_result(frame):
+        """処理できなかった枠を、指定された時間帯のまま空き時間なしとして返します"""
+        return {
+            'date': frame.date,
+            'start_time': frame.start_time,
+            'end_time': frame.end_time,
+            'free_slots': []
+        }
+    
     def _handle_event_addition(self, user_message, line_user_id):
         """イベント追加を処理します"""
         try:
@@ -777,12 +797,12 @@ class LineBotHandler:
                 return TextSendMessage(text="・日時を打つと空き時間を返します\n・予定を打つとカレンダーに追加します\n\n例：\n・「明日の空き時間」\n・「7/15 15:00〜16:00の空き時間」\n・「明日の午前9時から会議を追加して」\n・「来週月曜日の14時から打ち合わせ」")
             
             # 日時をパース
-            start_datetime = parser.parse(event_info['start_datetime'])
-            end_datetime = parser.parse(event_info['end_datetime'])
+            start_datetime = _parse_datetime(event_info['start_datetime'])
+            end_datetime = _parse_datetime(event_info['end_datetime'])
             
             # タイムゾーンを設定
-            start_datetime = self.jst.localize(start_datetime)
-            end_datetime = self.jst.localize(end_datetime)
+            start_datetime = start_datetime.replace(tzinfo=JST)
+            end_datetime = end_datetime.replace(tzinfo=JST)
             
             # カレンダーにイベントを追加
             success, message, result = self.calendar_service.add_event(
@@ -793,7 +813,7 @@ class LineBotHandler:
                 line_user_id=line_user_id,
                 force_add=True
             )
-            logger.info(f"[DEBUG] add_event result: success={success}, message={message}, result={result}")
+            logger.debug("add_event result: success=%s, message=%s, result=%s", success, message, result)
             
             # AIを使ってレスポンスをフォーマット
             response_text = self.ai_service.format_event_confirmation(success, message, result)
@@ -2,9 +2,8 @@ from datetime import datetime, timedelta
 import pytz
 from calendar_service import GoogleCalendarService
 from db import DBHelper
-from linebot import LineBotApi
+from http_session import create_line_bot_api
 from linebot.models import TextSendMessage
-from config import Config
 import logging
 logging.basicConfig(level=logging.INFO)
 
@@ -33,7 +32,7 @@ def send_daily_agenda():
     logging.info(f"日次予定送信開始")
     db = DBHelper()
     calendar_service = GoogleCalendarService()
-    line_bot_api = LineBotApi(Config.LINE_CHANNEL_ACCESS_TOKEN)
+    line_bot_api = create_line_bot_api()
     
     # JST基準で「明日」を取得
     now_jst = datetime.now(JST)